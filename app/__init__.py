@@ -4,7 +4,7 @@ from pathlib import Path
 from flask import Flask, request
 from flask_cors import CORS
 
-from app.constants import API_PREFIX
+from app.constants import API_PREFIX, NEXT_CURSOR_HEADER
 from app.routes.api import bp as api_bp
 from app.routes.main import bp as main_bp
 from app.utils.api_response import api_response
@@ -29,7 +29,8 @@ app = Flask(
     static_folder=Path("../frontend") / "static",
 )
 
-CORS(app)  # Enable CORS for all routes
+# Enable CORS for all routes
+CORS(app, expose_headers=[NEXT_CURSOR_HEADER])
 
 
 app.register_blueprint(main_bp)
@@ -9,6 +9,7 @@ class DownloadStatus(IntEnum):
     DONE        = 3
     FAILED      = 4
     MIXED       = 5
+    CANCELLED   = 6
 # fmt: on
 
 
@@ -31,6 +32,18 @@ class EventType(IntEnum):
 # fmt: on
 
 
+# fmt: off
+class QueueStage(IntEnum):
+    EXPAND      = 1
+    DOWNLOAD    = 2
+# fmt: on
+
+
+class RecoveryPolicy:
+    RESUME = "resume"
+    FAIL = "fail"
+
+
 class ScraperConfig:
     TIMEOUT = 10
     USER_AGENT = (
@@ -38,11 +51,33 @@ class ScraperConfig:
         "AppleWebKit/537.36 (KHTML, like Gecko) "
         "Chrome/120.0.0.0 Safari/537.36"
     )
-    MAX_BYTES_TO_READ = 20 * 1024  # Search for a title within this range
+    MAX_BYTES_TO_READ = 512 * 1024  # Search for a title within this range
+    MAX_BYTES_TO_DRAIN = 64 * 1024  # Read past the title to keep the connection
+    MAX_EXPANSION_DEPTH = 3
+    EXPANSION_WORKERS = 8  # Concurrent gallery-dl simulations per level
+    BULK_CONCURRENCY = 200  # Concurrent requests of a bulk title scrape
+    BULK_PER_HOST_LIMIT = 8
+    BULK_TIME_BUDGET = 5 * 60  # Seconds, the rest falls back to filenames
+    BULK_TITLE_THRESHOLD = 50  # Titles scraped in bulk from this many items on
 
 
 MAX_TITLE_LENGTH = 255
 
+# Higher priority downloads are started first
+MIN_PRIORITY = -100
+MAX_PRIORITY = 100
+
+# Columns downloads can be sorted and paginated by, keyed by their API name.
+# They must be indexed and NOT NULL, see keyset_page. Only pages of the
+# immutable ones, id and startTime, are stable while downloads get updated.
+DOWNLOAD_SORT_FIELDS = {
+    "id": "id",
+    "startTime": "start_time",
+    "priority": "priority",
+    "status": "status",
+}
+MAX_PAGE_SIZE = 1000
+
 
 # Common direct media extensions
 # fmt: off
@@ -71,10 +106,16 @@ NON_COLLECTION_PATTERNS = [
 API_PREFIX = "/api"
 
 # fmt: off
-API_DOWNLOADS       = f"{API_PREFIX}/downloads"
-API_EVENTS          = f"{API_PREFIX}/events"
-API_HEALTH          = f"{API_PREFIX}/health"
-API_MEDIA_DOWNLOAD  = f"{API_PREFIX}/media/download"
+API_DOWNLOADS        = f"{API_PREFIX}/downloads"
+API_DOWNLOADS_CANCEL = f"{API_PREFIX}/downloads/cancel"
+API_DOWNLOADS_SEARCH = f"{API_PREFIX}/downloads/search"
+API_EVENTS           = f"{API_PREFIX}/events"
+API_HEALTH           = f"{API_PREFIX}/health"
+API_MEDIA_DOWNLOAD   = f"{API_PREFIX}/media/download"
+API_STATS            = f"{API_PREFIX}/stats"
 # fmt: on
 
 PAGE_DASHBOARD = "/dashboard"
+
+# Response header with the cursor of the next page of a paginated list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
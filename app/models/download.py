@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 
 from app.constants import MAX_TITLE_LENGTH, DownloadStatus
 from app.extensions import db
+from app.utils.tools import get_host
 
 
 class Download(db.Model):  # type: ignore[name-defined]
@@ -9,19 +10,31 @@ class Download(db.Model):  # type: ignore[name-defined]
 
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String, nullable=False)
+    # Derived from the URL, so downloads can be filtered by host with an index
+    host = db.Column(
+        db.String,
+        default=lambda context: get_host(context.get_current_parameters()["url"]),
+        nullable=True,
+        index=True,
+    )
     title = db.Column(db.String(MAX_TITLE_LENGTH), nullable=True)
-    media_type = db.Column(db.Integer, nullable=True)
+    media_type = db.Column(db.Integer, nullable=True, index=True)
 
     order_number = db.Column(db.Integer, default=0)
+    # Higher goes first, see DownloadPool
+    priority = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False, index=True
+    )
 
     # Storing as seconds (BigInt) avoids Year 2038 issues
     start_time = db.Column(
         db.BigInteger,
         default=lambda: int(datetime.now(timezone.utc).timestamp()),
         nullable=False,
+        index=True,
     )
 
-    end_time = db.Column(db.BigInteger, nullable=True)
+    end_time = db.Column(db.BigInteger, nullable=True, index=True)
 
     update_time = db.Column(
         db.BigInteger,
@@ -29,5 +42,11 @@ class Download(db.Model):  # type: ignore[name-defined]
         onupdate=lambda: int(datetime.now(timezone.utc).timestamp()),
     )
 
-    status = db.Column(db.Integer, default=DownloadStatus.PENDING, nullable=False)
+    status = db.Column(
+        db.Integer, default=DownloadStatus.PENDING, nullable=False, index=True
+    )
     status_message = db.Column(db.Text, nullable=True)
+
+    # Automatic retries of a failed download, see RetryScheduler
+    retry_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    next_retry_time = db.Column(db.BigInteger, nullable=True, index=True)
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from app.extensions import db
+
+
+class ExpansionCacheEntry(db.Model):  # type: ignore[name-defined]
+    __tablename__ = "expansion_cache"
+
+    url = db.Column(db.String, primary_key=True)
+
+    # JSON list of the direct children, in gallery-dl order
+    children = db.Column(db.Text, nullable=False)
+
+    create_time = db.Column(
+        db.BigInteger,
+        default=lambda: int(datetime.now(timezone.utc).timestamp()),
+        nullable=False,
+    )
+
+    # Used for the LRU eviction
+    access_time = db.Column(
+        db.BigInteger,
+        default=lambda: int(datetime.now(timezone.utc).timestamp()),
+        nullable=False,
+        index=True,
+    )
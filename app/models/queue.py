@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from app.constants import MAX_TITLE_LENGTH, QueueStage
+from app.extensions import db
+
+
+class QueuedDownload(db.Model):  # type: ignore[name-defined]
+    """
+    What's left to do for a download that hasn't been finalized yet, kept so
+    the work can be resumed after a restart.
+    """
+
+    __tablename__ = "download_queue"
+
+    download_id = db.Column(
+        db.Integer,
+        db.ForeignKey("downloads.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    # Collections still have to be expanded, their children only downloaded
+    stage = db.Column(db.Integer, default=QueueStage.EXPAND, nullable=False)
+
+    # Provided with the request, applied once the download is finalized
+    title = db.Column(db.String(MAX_TITLE_LENGTH), nullable=True)
+
+    range_start = db.Column(db.Integer, nullable=True)
+    range_end = db.Column(db.Integer, nullable=True)
+
+    parent_id = db.Column(db.Integer, nullable=True)
+
+    create_time = db.Column(
+        db.BigInteger,
+        default=lambda: int(datetime.now(timezone.utc).timestamp()),
+        nullable=False,
+    )
@@ -0,0 +1,59 @@
+from sqlalchemy import event
+
+from app.models.download import Download
+
+SEARCH_TABLE = "downloads_fts"
+
+# The searchable columns of downloads, along with their weight in the ranking
+SEARCH_COLUMNS = {"title": 10.0, "url": 2.0, "status_message": 1.0}
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+# An external content FTS5 table, which only stores the index. The triggers
+# keep it in sync with every write to downloads, bulk ones included.
+SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {_columns}, content='downloads', content_rowid='id', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON downloads
+    BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, {_columns})
+        VALUES (new.id, {_new_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON downloads
+    BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {_columns})
+        VALUES ('delete', old.id, {_old_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF {_columns} ON downloads
+    BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {_columns})
+        VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {SEARCH_TABLE} (rowid, {_columns})
+        VALUES (new.id, {_new_values});
+    END
+    """,
+]
+
+
+def create_search_index(connection) -> None:
+    """Creates the search table and its triggers, if they don't exist yet."""
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Download.__table__, "after_create")
+def _create_search_index(target, connection, **kwargs) -> None:
+    # FTS5 is specific to SQLite
+    if connection.dialect.name == "sqlite":
+        create_search_index(connection)
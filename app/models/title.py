@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from app.extensions import db
+
+
+class TitleCacheEntry(db.Model):  # type: ignore[name-defined]
+    __tablename__ = "title_cache"
+
+    url = db.Column(db.String, primary_key=True)
+
+    # Empty for failed lookups, which are only kept for a short while
+    title = db.Column(db.String, nullable=True)
+    failed = db.Column(db.Boolean, default=False, nullable=False)
+
+    create_time = db.Column(
+        db.BigInteger,
+        default=lambda: int(datetime.now(timezone.utc).timestamp()),
+        nullable=False,
+    )
@@ -3,13 +3,21 @@ from typing import Tuple
 from flask import Response, current_app, request
 from marshmallow import ValidationError
 
-from app.constants import API_DOWNLOADS, EventType
+from app.constants import (
+    API_DOWNLOADS,
+    API_DOWNLOADS_CANCEL,
+    API_DOWNLOADS_SEARCH,
+    NEXT_CURSOR_HEADER,
+    EventType,
+)
 from app.routes.api import bp
 from app.schemas.download import (
+    CancelDownloadsSchema,
     DeleteDownloadsSchema,
     DownloadSchema,
     DownloadUpdateSchema,
     GetDownloadsQuerySchema,
+    SearchDownloadsQuerySchema,
 )
 from app.services import download_service
 from app.utils.api_response import api_response
@@ -18,16 +26,60 @@ from app.utils.logger import logger
 
 @bp.route(API_DOWNLOADS, methods=["GET"])
 def get_downloads() -> Tuple[Response, int]:
+    """
+    List downloads, filtered and sorted, a page at a time.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+
+    Known limitation: status and priority change while a client pages through
+    the results. A download whose value changes in the meantime moves across
+    the cursor, so it may be skipped or returned twice. Pages sorted by id or
+    startTime are stable.
+    """
     try:
         args = GetDownloadsQuerySchema().load(request.args)
     except ValidationError as err:
         return api_response(error=str(err.messages), status_code=400)
 
     id_list: list[int] | None = args.get("ids")  # type: ignore
-    downloads = download_service.get_downloads(id_list)
+    downloads, next_cursor = download_service.get_downloads(
+        id_list,
+        limit=args.get("limit"),
+        sort_by=args["sort_by"],
+        descending=args["descending"],
+        after=args.get("after"),
+        filters=args["filters"],
+    )
+
+    data = DownloadSchema(many=True).dump(downloads)
+    response, status_code = api_response(data=data)
+
+    # The data stays a plain list, the next page is found through the header
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return response, status_code
+
+
+@bp.route(API_DOWNLOADS_SEARCH, methods=["GET"])
+def search_downloads() -> Tuple[Response, int]:
+    try:
+        args = SearchDownloadsQuerySchema().load(request.args)
+    except ValidationError as err:
+        return api_response(error=str(err.messages), status_code=400)
+
+    downloads, next_cursor = download_service.search_downloads(
+        args["q"],
+        args["limit"],
+        args["offset"],
+    )
 
     data = DownloadSchema(many=True).dump(downloads)
-    return api_response(data=data)
+    response, status_code = api_response(data=data)
+
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return response, status_code
 
 
 @bp.route(API_DOWNLOADS, methods=["PATCH"])
@@ -89,3 +141,24 @@ def delete_downloads() -> Tuple[Response, int]:
     except Exception as e:
         logger.error(f"Download delete error: {e}")
         return api_response(error=str(e), status_code=500)
+
+
+@bp.route(API_DOWNLOADS_CANCEL, methods=["POST"])
+def cancel_downloads() -> Tuple[Response, int]:
+    json_data = request.get_json(silent=True)
+
+    if not json_data:
+        return api_response(error="Missing JSON body", status_code=400)
+
+    try:
+        data = CancelDownloadsSchema().load(json_data)
+        cancelled_ids = download_service.cancel_downloads(data["ids"])  # type: ignore
+
+        return api_response(data={"ids": cancelled_ids})
+
+    except ValidationError as err:
+        return api_response(error=str(err.messages), status_code=400)
+
+    except Exception as e:
+        logger.error(f"Download cancel error: {e}")
+        return api_response(error=str(e), status_code=500)
@@ -1,20 +1,20 @@
 from typing import Tuple
 
-from flask import Response, current_app, request
+from flask import Response, request
 from marshmallow import ValidationError
 
-from app.constants import API_MEDIA_DOWNLOAD, EventType
+from app.constants import API_MEDIA_DOWNLOAD
 from app.routes.api import bp
 from app.schemas.execution import DownloadRequestSchema
 from app.services import execution_service
 from app.utils.api_response import api_response
-from app.utils.logger import logger
 
 
 @bp.route(API_MEDIA_DOWNLOAD, methods=["POST"])
 def execute_download() -> Tuple[Response, int]:
     """
-    Trigger a media download.
+    Queue a media download.
+    Returns the created records right away, the work happens in the background.
     """
     json_data = request.get_json(silent=True)
     if not json_data:
@@ -26,18 +26,10 @@ def execute_download() -> Tuple[Response, int]:
         range_start = data.get("range_start")
         range_end = data.get("range_end")
 
-        report, finalized_records = execution_service.process_download_request(
+        report = execution_service.enqueue_download_request(
             items, range_start, range_end
         )
 
-        if finalized_records:
-            try:
-                current_app.config["ANNOUNCER"].announce(
-                    EventType.UPDATE, finalized_records
-                )
-            except Exception as e:
-                logger.warning(f"Announcer failed: {e}")
-
         return api_response(data=report)
 
     except ValidationError as err:
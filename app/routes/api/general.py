@@ -4,9 +4,12 @@ from typing import Tuple
 
 from flask import Response, current_app, request
 
-from app.constants import API_EVENTS, API_HEALTH
+from app.constants import API_EVENTS, API_HEALTH, API_STATS
 from app.routes.api import bp
 from app.utils.api_response import api_response
+from app.utils.gallery_engine import engine as gallery_engine
+from app.utils.http_client import http_client
+from app.utils.rate_limiter import rate_limiter
 
 # AUTH
 
@@ -54,6 +57,27 @@ def health_check() -> Tuple[Response, int]:
     )
 
 
+@bp.route(API_STATS, methods=["GET"])
+def stats() -> Tuple[Response, int]:
+    """
+    Runtime statistics of the background workers.
+    """
+    return api_response(
+        data={
+            "pool": current_app.config["DOWNLOAD_POOL"].stats(),
+            "titles": current_app.config["TITLE_POOL"].stats(),
+            "queue": {"pending": current_app.config["DOWNLOAD_QUEUE"].pending_count},
+            "writer": current_app.config["DOWNLOAD_WRITER"].stats(),
+            "retries": current_app.config["RETRY_SCHEDULER"].stats(),
+            "engine": gallery_engine.stats(),
+            "expansion_cache": current_app.config["EXPANSION_CACHE"].stats(),
+            "title_cache": current_app.config["TITLE_CACHE"].stats(),
+            "http": http_client.stats(),
+            "rate_limits": rate_limiter.stats(),
+        }
+    )
+
+
 @bp.route(API_EVENTS)
 def events():
     announcer = current_app.config["ANNOUNCER"]
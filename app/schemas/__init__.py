@@ -1,6 +1,12 @@
 from marshmallow import fields, validate
 
-from app.constants import MAX_TITLE_LENGTH, DownloadStatus, MediaType
+from app.constants import (
+    MAX_PRIORITY,
+    MAX_TITLE_LENGTH,
+    MIN_PRIORITY,
+    DownloadStatus,
+    MediaType,
+)
 
 
 class TitleField(fields.Str):
@@ -35,6 +41,15 @@ class DownloadStatusField(fields.Int):
         super().__init__(**kwargs)
 
 
+class PriorityField(fields.Int):
+    """A reusable field for download priority validation."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("validate", validate.Range(MIN_PRIORITY, MAX_PRIORITY))
+        kwargs.setdefault("strict", True)
+        super().__init__(**kwargs)
+
+
 class RangeField(fields.Int):
     """A reusable field for range validation."""
 
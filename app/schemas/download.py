@@ -1,6 +1,22 @@
-from marshmallow import EXCLUDE, Schema, fields, pre_load, validate
-
-from app.schemas import DownloadStatusField, MediaTypeField, TitleField
+from marshmallow import (
+    EXCLUDE,
+    Schema,
+    ValidationError,
+    fields,
+    post_load,
+    pre_load,
+    validate,
+    validates_schema,
+)
+
+from app.constants import DOWNLOAD_SORT_FIELDS, MAX_PAGE_SIZE
+from app.schemas import (
+    DownloadStatusField,
+    MediaTypeField,
+    PriorityField,
+    TitleField,
+)
+from app.utils.pagination import decode_cursor, is_cursor_int
 
 
 class DownloadUpdateSchema(Schema):
@@ -9,6 +25,7 @@ class DownloadUpdateSchema(Schema):
     id = fields.Int(required=True, strict=True)
     title = TitleField()
     media_type = MediaTypeField()
+    priority = PriorityField()
 
     status = DownloadStatusField()
     status_message = fields.Str(data_key="statusMessage", allow_none=True)
@@ -26,6 +43,9 @@ class DownloadSchema(DownloadUpdateSchema):
     end_time = fields.Int(data_key="endTime", allow_none=True, strict=True)
     update_time = fields.Int(data_key="updateTime", allow_none=True, strict=True)
 
+    retry_count = fields.Int(data_key="retryCount", strict=True)
+    next_retry_time = fields.Int(data_key="nextRetryTime", allow_none=True, strict=True)
+
 
 class GetDownloadsQuerySchema(Schema):
     """Schema for validating query parameters when getting Downloads."""
@@ -34,22 +54,142 @@ class GetDownloadsQuerySchema(Schema):
     class Meta:
         unknown = EXCLUDE
 
+    # Query parameters given as comma-separated lists
+    LIST_FIELDS = ("ids", "status", "mediaType")
+    # Loaded fields that narrow down the downloads, see download_service
+    FILTER_FIELDS = (
+        "status",
+        "media_type",
+        "host",
+        "start_time_min",
+        "start_time_max",
+        "end_time_min",
+        "end_time_max",
+    )
+
     ids = fields.List(fields.Int(), required=False)
 
+    # Filters
+    status = fields.List(DownloadStatusField(allow_none=False, strict=False))
+    media_type = fields.List(
+        MediaTypeField(allow_none=False, strict=False), data_key="mediaType"
+    )
+    host = fields.Str(validate=validate.Length(min=1))
+    # Inclusive bounds, in seconds since the epoch
+    start_time_min = fields.Int(data_key="startTimeMin")
+    start_time_max = fields.Int(data_key="startTimeMax")
+    end_time_min = fields.Int(data_key="endTimeMin")
+    end_time_max = fields.Int(data_key="endTimeMax")
+
+    # Keyset pagination, every row is returned without a limit
+    limit = fields.Int(validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str()
+    sort_by = fields.Str(
+        data_key="sortBy",
+        load_default="id",
+        validate=validate.OneOf(DOWNLOAD_SORT_FIELDS),
+    )
+    order = fields.Str(load_default="desc", validate=validate.OneOf(["asc", "desc"]))
+
     @pre_load
-    def parse_comma_separated_ids(self, in_data, **kwargs):
-        """Splits a comma-separated string into a list before validation."""
+    def parse_comma_separated_lists(self, in_data, **kwargs):
+        """Splits comma-separated strings into lists before validation."""
         # request.args in Flask is an ImmutableMultiDict, so we convert it to
         # a standard dict
         data = in_data.to_dict() if hasattr(in_data, "to_dict") else in_data.copy()
 
-        if "ids" in data and isinstance(data["ids"], str):
-            # Handle edge cases where the user passes an empty string like "?ids="
-            if not data["ids"].strip():
-                data["ids"] = []
-            else:
-                data["ids"] = data["ids"].split(",")
+        for key in self.LIST_FIELDS:
+            if key in data and isinstance(data[key], str):
+                # Handle edge cases where the user passes an empty string like
+                # "?ids="
+                if not data[key].strip():
+                    data[key] = []
+                else:
+                    data[key] = data[key].split(",")
+
+        return data
 
+    @validates_schema
+    def validate_time_ranges(self, data, **kwargs):
+        for bound in ("start_time", "end_time"):
+            low, high = data.get(f"{bound}_min"), data.get(f"{bound}_max")
+            if low is not None and high is not None and low > high:
+                raise ValidationError(
+                    "Must not be before the minimum.",
+                    field_name=self.fields[f"{bound}_max"].data_key,
+                )
+
+    @post_load
+    def resolve_page(self, data, **kwargs):
+        """
+        Gathers the filters, maps the sort field to its column, and the cursor
+        to the position the page starts after. A cursor only applies to the
+        sort and order it was made for.
+        """
+        data["filters"] = {
+            key: data.pop(key) for key in self.FILTER_FIELDS if key in data
+        }
+        if "host" in data["filters"]:
+            data["filters"]["host"] = data["filters"]["host"].lower()
+
+        data["sort_by"] = DOWNLOAD_SORT_FIELDS[data["sort_by"]]
+        data["descending"] = data.pop("order") == "desc"
+
+        cursor = data.pop("cursor", None)
+        if cursor is None:
+            return data
+
+        try:
+            position = decode_cursor(cursor)
+            after = position["after"]
+            valid = (
+                position["sort_by"] == data["sort_by"]
+                and position["descending"] == data["descending"]
+                and isinstance(after, list)
+                and len(after) == 2
+                # Every sort column is a NOT NULL integer, and so is the ID
+                and all(is_cursor_int(value) for value in after)
+            )
+        except (ValueError, KeyError, TypeError):
+            valid = False
+
+        if not valid:
+            raise ValidationError("Invalid cursor.", field_name="cursor")
+
+        data["after"] = tuple(after)
+        return data
+
+
+class SearchDownloadsQuerySchema(Schema):
+    """Schema for validating query parameters when searching Downloads."""
+
+    class Meta:
+        unknown = EXCLUDE
+
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+    limit = fields.Int(load_default=50, validate=validate.Range(1, MAX_PAGE_SIZE))
+    cursor = fields.Str()
+
+    @post_load
+    def resolve_page(self, data, **kwargs):
+        """Maps the cursor to an offset, it only applies to its own query."""
+        data["offset"] = 0
+
+        cursor = data.pop("cursor", None)
+        if cursor is None:
+            return data
+
+        try:
+            position = decode_cursor(cursor)
+            offset = position["offset"]
+            valid = position["q"] == data["q"] and is_cursor_int(offset) and offset >= 0
+        except (ValueError, KeyError, TypeError):
+            valid = False
+
+        if not valid:
+            raise ValidationError("Invalid cursor.", field_name="cursor")
+
+        data["offset"] = offset
         return data
 
 
@@ -57,3 +197,7 @@ class DeleteDownloadsSchema(Schema):
     ids = fields.List(
         fields.Int(strict=True), required=True, validate=validate.Length(min=1)
     )
+
+
+class CancelDownloadsSchema(DeleteDownloadsSchema):
+    pass
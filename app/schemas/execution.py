@@ -1,6 +1,6 @@
 from marshmallow import Schema, fields, validate
 
-from app.schemas import MediaTypeField, RangeField, TitleField
+from app.schemas import MediaTypeField, PriorityField, RangeField, TitleField
 
 
 class DownloadItemSchema(Schema):
@@ -9,6 +9,7 @@ class DownloadItemSchema(Schema):
     url = fields.URL(required=True)
     title = TitleField()
     media_type = MediaTypeField()
+    priority = PriorityField(load_default=0)
 
 
 class DownloadRequestSchema(Schema):
@@ -1,7 +1,9 @@
+import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple, cast
 
 from flask import current_app
+from sqlalchemy import func, or_, text
 
 from app.constants import (
     DownloadStatus,
@@ -9,22 +11,103 @@ from app.constants import (
 )
 from app.extensions import db
 from app.models.download import Download
+from app.models.queue import QueuedDownload
+from app.models.search import SEARCH_COLUMNS, SEARCH_TABLE
 from app.schemas.download import DownloadSchema
 from app.utils.logger import logger
+from app.utils.pagination import encode_cursor, keyset_page
 
+CANCELLED_MESSAGE = "Cancelled by the user."
 
-def get_downloads(ids: Optional[List[int]] = None) -> List[Download]:
+
+def get_downloads(
+    ids: Optional[List[int]] = None,
+    limit: Optional[int] = None,
+    sort_by: str = "id",
+    descending: bool = True,
+    after: Optional[Tuple[Any, int]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Download], Optional[str]]:
     """
-    Fetches downloads, ordered by ID descending.
+    Fetches a page of downloads, ordered by a column, then by ID.
     If a list of IDs is provided, fetches only those specific downloads.
-    Otherwise, fetches all downloads.
+    Without a limit, fetches all of them.
+
+    Pages are only stable for columns that never change, like id and
+    start_time. A download whose status or priority changes between two
+    pages moves across the cursor, and may be skipped or fetched twice.
+
+    Args:
+        sort_by: The column to order by, one of DOWNLOAD_SORT_FIELDS.
+        after: The (sort value, ID) of the last download of the previous page.
+        filters: Narrow down the downloads, see _filter_downloads.
+
+    Returns:
+        A tuple of (downloads, next_cursor). The cursor is None on the last page.
     """
-    query = Download.query
+    query = _filter_downloads(Download.query, filters or {})
 
     if ids:
         query = query.filter(Download.id.in_(ids))
 
-    return query.order_by(Download.id.desc()).all()
+    column = getattr(Download, sort_by)
+    downloads, has_more = keyset_page(
+        query, column, Download.id, limit, after, descending
+    )
+
+    next_cursor = None
+    if has_more:
+        last = downloads[-1]
+        next_cursor = encode_cursor(
+            {
+                "sort_by": sort_by,
+                "descending": descending,
+                "after": [getattr(last, sort_by), last.id],
+            }
+        )
+
+    return downloads, next_cursor
+
+
+def search_downloads(
+    query: str, limit: int, offset: int = 0
+) -> Tuple[List[Download], Optional[str]]:
+    """
+    Finds the downloads whose title, URL or status message contain every word
+    of a query, as a prefix, best matches first.
+
+    The ranking changes along with the matches, so pages are taken by offset.
+
+    Returns:
+        A tuple of (downloads, next_cursor). The cursor is None on the last page.
+    """
+    match = _match_query(query)
+    if match is None:
+        return [], None
+
+    weights = ", ".join(str(weight) for weight in SEARCH_COLUMNS.values())
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+            f"ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid DESC "
+            "LIMIT :limit OFFSET :offset"
+        ),
+        # One extra row tells whether there is a next page
+        {"match": match, "limit": limit + 1, "offset": offset},
+    ).all()
+
+    ids = [download_id for (download_id,) in rows[:limit]]
+    records = {
+        record.id: record
+        for record in Download.query.filter(Download.id.in_(ids)).all()
+    }
+    downloads = [records[download_id] for download_id in ids if download_id in records]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor({"q": query, "offset": offset + limit})
+
+    return downloads, next_cursor
 
 
 def update_downloads(updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -87,6 +170,15 @@ def update_downloads(updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     if session_dirty:
         db.session.commit()
 
+    # Queued work follows the new priority right away, whether it's still
+    # waiting for its job to start or for a download worker
+    job_queue = current_app.config["DOWNLOAD_QUEUE"]
+    pool = current_app.config["DOWNLOAD_POOL"]
+    for result in results:
+        if result["updates"] and "priority" in result["updates"]:
+            job_queue.reprioritize(result["id"], result["updates"]["priority"])
+            pool.reprioritize(result["id"], result["updates"]["priority"])
+
     return results
 
 
@@ -107,6 +199,9 @@ def delete_downloads(ids: List[int]) -> List[int]:
     Download.query.filter(Download.id.in_(existing_ids)).delete(
         synchronize_session=False
     )
+    QueuedDownload.query.filter(QueuedDownload.download_id.in_(existing_ids)).delete(
+        synchronize_session=False
+    )
     db.session.commit()
 
     return existing_ids
@@ -121,57 +216,410 @@ def initialize_download(
     Returns:
         A tuple of (success_status, error_message, record_dict).
     """
+    success, error, record_dicts = initialize_downloads([(url, media_type)])
+    return success, error, record_dicts[0] if success else None
+
+
+def initialize_downloads(
+    items: List[Tuple[str, Optional[int]]],
+    queue_state: Optional[List[Dict[str, Any]]] = None,
+    priorities: Optional[List[int]] = None,
+) -> Tuple[bool, Optional[str], List[Dict[str, Any]]]:
+    """
+    Initializes several download records in a single transaction, and
+    announces them all at once.
+
+    Args:
+        items: The (url, media_type) of each record.
+        queue_state: The QueuedDownload values of each record, persisted
+            along with it so its download can be resumed after a restart.
+        priorities: The priority of each record, 0 by default.
+
+    Returns:
+        A tuple of (success_status, error_message, record_dicts), the records
+        being in the same order as the items.
+    """
+    if not items:
+        return True, None, []
+
     try:
-        record = Download(url=url, media_type=media_type)
-        db.session.add(record)
+        records = _add_downloads(items, queue_state, priorities)
         db.session.commit()
 
-        raw_dump = DownloadSchema().dump(record)
-        record_dict = cast(Dict[str, Any], raw_dump)
-
-        try:
-            current_app.config["ANNOUNCER"].announce(EventType.CREATE, [record_dict])
-        except Exception as e:
-            logger.warning(f"Announcer failed: {e}")
+        record_dicts = _dump_records(records)
+        _announce(EventType.CREATE, record_dicts)
 
-        return True, None, record_dict
+        return True, None, record_dicts
 
     except Exception as e:
         db.session.rollback()
 
-        err_msg = f"Failed to initialize download record: {e}"
+        err_msg = f"Failed to initialize download records: {e}"
         logger.error(err_msg)
-        return False, err_msg, None
+        return False, err_msg, []
 
 
-def finalize_download(
-    download_id: int, title: Optional[str], status: DownloadStatus
-) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+def record_expansion(
+    parent_id: int,
+    items: List[Tuple[str, Optional[int]]],
+    queue_state: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[bool, Optional[str], List[Dict[str, Any]]]:
     """
-    Updates a download record with final data.
+    Initializes the records of a collection's children, and finalizes the
+    collection itself, in a single transaction. A restart then either
+    expands the collection again, or only downloads its children.
+
+    The children inherit the priority of the collection. A collection that got
+    cancelled while it was being expanded stays cancelled, and gets none.
 
     Returns:
-        A tuple of (success_status, error_message, record_dict).
+        A tuple of (success_status, error_message, child_record_dicts). The
+        error is CANCELLED_MESSAGE if the collection was cancelled.
     """
+    cancellations = current_app.config["CANCELLATIONS"]
+
     try:
-        record = db.session.get(Download, download_id)
-        if not record:
-            return False, f"Download ID {download_id} not found.", None
+        with cancellations.guard():
+            # The cancellation may have been committed since it was loaded
+            parent = db.session.get(Download, parent_id, populate_existing=True)
+            if cancellations.is_cancelled(parent_id) or (
+                parent is not None and parent.status == DownloadStatus.CANCELLED
+            ):
+                db.session.rollback()
+                return False, CANCELLED_MESSAGE, []
 
-        record.title = title
-        record.end_time = int(datetime.now(timezone.utc).timestamp())
-        record.status = status
+            priority = parent.priority if parent is not None else 0
 
-        db.session.commit()
+            records = _add_downloads(items, queue_state, [priority] * len(items))
+
+            if parent is not None:
+                parent.end_time = int(datetime.now(timezone.utc).timestamp())
+                parent.status = DownloadStatus.DONE
+                parent.status_message = f"Expanded into {len(items)} new items."
 
-        raw_dump = DownloadSchema().dump(record)
-        record_dict = cast(Dict[str, Any], raw_dump)
+            QueuedDownload.query.filter_by(download_id=parent_id).delete()
+            db.session.commit()
 
-        return True, None, record_dict
+        record_dicts = _dump_records(records)
+        if record_dicts:
+            _announce(EventType.CREATE, record_dicts)
+        if parent is not None:
+            _announce(EventType.UPDATE, _dump_records([parent]))
+
+        return True, None, record_dicts
 
     except Exception as e:
         db.session.rollback()
 
+        err_msg = f"Failed to record the expansion of #{parent_id}: {e}"
+        logger.error(err_msg)
+        return False, err_msg, []
+
+
+def get_priorities(ids: List[int]) -> Dict[int, int]:
+    """Fetches the current priority of the given downloads."""
+    if not ids:
+        return {}
+
+    return dict(
+        db.session.query(Download.id, Download.priority).filter(Download.id.in_(ids))
+    )
+
+
+def get_retry_counts(ids: List[int]) -> Dict[int, int]:
+    """Fetches how many times the given downloads have been retried."""
+    if not ids:
+        return {}
+
+    return dict(
+        db.session.query(Download.id, Download.retry_count).filter(Download.id.in_(ids))
+    )
+
+
+def get_next_retry_time() -> Optional[int]:
+    """The earliest time a failed download is due to be retried, if any."""
+    return (
+        db.session.query(func.min(Download.next_retry_time))
+        .filter(Download.status == DownloadStatus.FAILED)
+        .scalar()
+    )
+
+
+def start_retries(now: int) -> Tuple[List[Download], List[QueuedDownload]]:
+    """
+    Resets the failed downloads whose retry is due to PENDING, counting the
+    attempt, and announces them.
+
+    Returns:
+        A tuple of (downloads, queue_state), like requeue_downloads.
+    """
+    downloads = (
+        Download.query.filter(
+            Download.status == DownloadStatus.FAILED,
+            Download.next_retry_time <= now,
+        )
+        .order_by(Download.id)
+        .all()
+    )
+    if not downloads:
+        return [], []
+
+    for download in downloads:
+        download.retry_count += 1
+        download.next_retry_time = None
+        download.end_time = None
+        download.status_message = f"Retry #{download.retry_count}."
+
+    queue_state = requeue_downloads(downloads)
+    _announce(EventType.UPDATE, _dump_records(downloads))
+
+    return downloads, queue_state
+
+
+def get_unfinished_downloads() -> List[Download]:
+    """Fetches the downloads that were never finalized, ordered by ID."""
+    return (
+        Download.query.filter(
+            Download.status.in_([DownloadStatus.PENDING, DownloadStatus.IN_PROGRESS])
+        )
+        .order_by(Download.id)
+        .all()
+    )
+
+
+def requeue_downloads(downloads: List[Download]) -> List[QueuedDownload]:
+    """
+    Resets unfinished downloads to PENDING, giving the ones that lost their
+    queue state a fresh one, as if they had just been requested.
+
+    Returns:
+        The queue state of every download, in the same order.
+    """
+    ids = [download.id for download in downloads]
+    existing = {
+        queued.download_id: queued
+        for queued in QueuedDownload.query.filter(
+            QueuedDownload.download_id.in_(ids)
+        ).all()
+    }
+
+    queue_state = []
+    for download in downloads:
+        download.status = DownloadStatus.PENDING
+
+        queued = existing.get(download.id)
+        if queued is None:
+            queued = QueuedDownload(download_id=download.id)
+            db.session.add(queued)
+
+        queue_state.append(queued)
+
+    db.session.commit()
+
+    return queue_state
+
+
+def fail_downloads(ids: List[int], status_message: str) -> None:
+    """Marks unfinished downloads as failed, dropping their queue state."""
+    if not ids:
+        return
+
+    Download.query.filter(Download.id.in_(ids)).update(
+        {
+            "status": DownloadStatus.FAILED,
+            "status_message": status_message,
+            "end_time": int(datetime.now(timezone.utc).timestamp()),
+        },
+        synchronize_session=False,
+    )
+    QueuedDownload.query.filter(QueuedDownload.download_id.in_(ids)).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+
+    records = Download.query.filter(Download.id.in_(ids)).all()
+    _announce(EventType.UPDATE, _dump_records(records))
+
+
+def cancel_downloads(ids: List[int]) -> List[int]:
+    """
+    Cancels unfinished downloads, along with the queued children of the
+    collections among them. Running downloads are stopped by their workers,
+    which finalize them as cancelled as well.
+    Failed downloads waiting for a retry are cancelled too, dropping it.
+    Ignores records that are finished or don't exist.
+
+    Returns:
+        List[int]: The IDs of every download that got cancelled.
+    """
+    unfinished_statuses = [DownloadStatus.PENDING, DownloadStatus.IN_PROGRESS]
+    child_ids = db.session.query(QueuedDownload.download_id).filter(
+        QueuedDownload.parent_id.in_(ids)
+    )
+    query = (
+        db.session.query(Download.id, Download.status)
+        .filter(
+            or_(Download.id.in_(ids), Download.id.in_(child_ids)),
+            or_(
+                Download.status.in_(unfinished_statuses),
+                Download.next_retry_time.isnot(None),
+            ),
+        )
+        .order_by(Download.id)
+    )
+
+    cancellations = current_app.config["CANCELLATIONS"]
+    with cancellations.guard():
+        rows = query.all()
+
+        # Workers check the registry, so it's told before the records change
+        cancellations.cancel(
+            download_id for download_id, status in rows if status in unfinished_statuses
+        )
+
+    if not rows:
+        return []
+
+    # Goes through the writer, behind any status write still pending for them
+    changes = {
+        "status": DownloadStatus.CANCELLED,
+        "status_message": CANCELLED_MESSAGE,
+        "end_time": int(datetime.now(timezone.utc).timestamp()),
+        "next_retry_time": None,
+    }
+    writer = current_app.config["DOWNLOAD_WRITER"]
+    unfinished_ids = [download_id for download_id, _ in rows]
+    futures = [
+        writer.write(download_id, changes, announce_record=True, dequeue=True)
+        for download_id in unfinished_ids
+    ]
+
+    cancelled_ids = []
+    for download_id, future in zip(unfinished_ids, futures):
+        success, error, _ = future.result()
+        if success:
+            cancelled_ids.append(download_id)
+        else:
+            logger.error(f"Failed to cancel download #{download_id}: {error}")
+
+    return cancelled_ids
+
+
+def _filter_downloads(query: Any, filters: Dict[str, Any]) -> Any:
+    """
+    Applies the filters of GetDownloadsQuerySchema, each of which has an
+    index to work with: statuses, media types, a host, and inclusive start
+    and end time ranges.
+    """
+    # Like the IDs, an empty list doesn't filter anything
+    if filters.get("status"):
+        query = query.filter(Download.status.in_(filters["status"]))
+    if filters.get("media_type"):
+        query = query.filter(Download.media_type.in_(filters["media_type"]))
+    if "host" in filters:
+        query = query.filter(Download.host == filters["host"])
+
+    for bound in ("start_time", "end_time"):
+        column = getattr(Download, bound)
+        if f"{bound}_min" in filters:
+            query = query.filter(column >= filters[f"{bound}_min"])
+        if f"{bound}_max" in filters:
+            query = query.filter(column <= filters[f"{bound}_max"])
+
+    return query
+
+
+def _match_query(query: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query matching every word as a prefix. The
+    words are quoted, so the FTS5 syntax never gets in the way.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _add_downloads(
+    items: List[Tuple[str, Optional[int]]],
+    queue_state: Optional[List[Dict[str, Any]]],
+    priorities: Optional[List[int]] = None,
+) -> List[Download]:
+    records = [
+        Download(
+            url=url,
+            media_type=media_type,
+            priority=priorities[index] if priorities is not None else 0,
+        )
+        for index, (url, media_type) in enumerate(items)
+    ]
+    db.session.add_all(records)
+    db.session.flush()
+
+    # SQLite hands out the IDs of deleted records again, which must not
+    # inherit a cancellation nobody picked up
+    current_app.config["CANCELLATIONS"].forget(record.id for record in records)
+
+    if queue_state is not None:
+        db.session.add_all(
+            QueuedDownload(download_id=record.id, **state)
+            for record, state in zip(records, queue_state)
+        )
+
+    return records
+
+
+def _dump_records(records: List[Download]) -> List[Dict[str, Any]]:
+    raw_dump = DownloadSchema(many=True).dump(records)
+    return cast(List[Dict[str, Any]], raw_dump)
+
+
+def _announce(event_type: EventType, payload: List[Dict[str, Any]]) -> None:
+    try:
+        current_app.config["ANNOUNCER"].announce(event_type, payload)
+    except Exception as e:
+        logger.warning(f"Announcer failed: {e}")
+
+
+def finalize_download(
+    download_id: int,
+    title: Optional[str],
+    status: DownloadStatus,
+    status_message: Optional[str] = None,
+    retry_time: Optional[int] = None,
+) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Updates a download record with final data.
+    A missing title leaves the current one untouched.
+
+    The write goes through the group commit writer, which also announces the
+    finalized record and drops its queue state. Blocks until it has been
+    committed.
+
+    Args:
+        retry_time: When a failed download is due to be retried. Its queue
+            state is kept until then, so the retry resumes it as it was.
+
+    Returns:
+        A tuple of (success_status, error_message, record_dict).
+    """
+    changes: Dict[str, Any] = {
+        "end_time": int(datetime.now(timezone.utc).timestamp()),
+        "status": status,
+        "status_message": status_message,
+        "next_retry_time": retry_time,
+    }
+    if title is not None:
+        changes["title"] = title
+
+    try:
+        future = current_app.config["DOWNLOAD_WRITER"].write(
+            download_id, changes, announce_record=True, dequeue=retry_time is None
+        )
+        return future.result()
+
+    except Exception as e:
         err_msg = f"Failed to finalize download record #{download_id}: {e}"
         logger.error(err_msg)
         return False, err_msg, None
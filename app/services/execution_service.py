@@ -1,17 +1,52 @@
-from typing import Dict
-
-from app.constants import DownloadStatus, MediaType
+import time
+from concurrent.futures import wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.constants import (
+    DownloadStatus,
+    MediaType,
+    QueueStage,
+    RecoveryPolicy,
+    ScraperConfig,
+)
+from app.models.download import Download
+from app.models.queue import QueuedDownload
 from app.services.download_service import (
+    CANCELLED_MESSAGE,
+    fail_downloads,
     finalize_download,
-    initialize_download,
+    get_next_retry_time,
+    get_priorities,
+    get_retry_counts,
+    get_unfinished_downloads,
+    initialize_downloads,
+    record_expansion,
+    requeue_downloads,
+    start_retries,
 )
-from app.utils.downloaders import Gallery
+from app.utils.cancellation import CancelScope
+from app.utils.downloaders import Audio, Gallery, Video
 from app.utils.logger import logger
-from app.utils.scraper import expand_collection_urls, scrape_title
-from app.utils.tools import DownloadReportItem
+from app.utils.progress import ProgressTracker
+from app.utils.scraper import expand_collection_urls, scrape_title, scrape_titles
+from app.utils.tools import DownloadReportItem, get_host
+
+# (download_id, url, media_type, provided_title)
+QueueEntry = Tuple[Optional[int], str, Optional[int], Optional[str]]
+
 
+def record_download_request(
+    items, range_start: Optional[int] = None, range_end: Optional[int] = None
+) -> Tuple[Dict[str, DownloadReportItem], List[QueueEntry]]:
+    """
+    Deduplicates the requested items and creates their initial records, along
+    with the queue state needed to resume them after a restart.
 
-def process_download_request(items, range_start, range_end):
+    Returns:
+        A tuple of (report, initial_queue).
+    """
     report: Dict[str, DownloadReportItem] = {}
 
     # DEDUPLICATION
@@ -26,22 +61,58 @@ def process_download_request(items, range_start, range_end):
     # INITIAL RECORDING
 
     # We store the initial batch to ensure we have a "paper trail"
-    initial_queue = []
-    for url, item_data in unique_items.items():
-        item_media_type = item_data.get("media_type")
-        provided_title = item_data.get("title")
-
-        success, error, record_dict = initialize_download(url, item_media_type)
-        download_id = record_dict["id"] if success and record_dict else None
-        report[url] = DownloadReportItem(url=url, status=success, error=error)
+    initial_queue: List[QueueEntry] = []
+    success, error, record_dicts = initialize_downloads(
+        [(url, item.get("media_type")) for url, item in unique_items.items()],
+        [
+            {
+                "stage": QueueStage.EXPAND,
+                "title": item.get("title"),
+                "range_start": range_start,
+                "range_end": range_end,
+            }
+            for item in unique_items.values()
+        ],
+        [item.get("priority", 0) for item in unique_items.values()],
+    )
+
+    for index, (url, item_data) in enumerate(unique_items.items()):
+        download_id = record_dicts[index]["id"] if success else None
+        report[url] = DownloadReportItem(
+            url=url, id=download_id, status=success, error=error
+        )
 
         if success:
-            initial_queue.append((download_id, url, item_media_type, provided_title))
+            initial_queue.append(
+                (download_id, url, item_data.get("media_type"), item_data.get("title"))
+            )
+
+    return report, initial_queue
 
+
+def run_download_job(
+    report: Dict[str, DownloadReportItem],
+    initial_queue: List[QueueEntry],
+    range_start: Optional[int],
+    range_end: Optional[int],
+    expanded_queue: Optional[List[QueueEntry]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Expands and downloads previously recorded items, then announces the
+    finalized records.
+
+    Args:
+        expanded_queue: Items that are past the expansion already, like the
+            children of a collection whose job got interrupted.
+
+    Returns:
+        A tuple of (report_list, finalized_records).
+    """
     # EXPANSION
 
-    final_processing_queue = []
-    seen_urls = set(unique_items.keys())
+    final_processing_queue: List[QueueEntry] = list(expanded_queue or [])
+    seen_urls = set(report.keys())
+    cancellations = current_app.config["CANCELLATIONS"]
 
     for parent_id, parent_url, item_media_type, item_title in initial_queue:
         if item_media_type and item_media_type != MediaType.GALLERY:
@@ -53,22 +124,50 @@ def process_download_request(items, range_start, range_end):
 
         expanded_urls = expand_collection_urls(parent_url)
 
+        # Its record has been finalized already, the children are never added
+        if cancellations.is_cancelled(parent_id):
+            report[parent_url].status = False
+            report[parent_url].error = CANCELLED_MESSAGE
+            cancellations.forget([parent_id])
+            continue
+
         if not expanded_urls:
             final_processing_queue.append(
                 (parent_id, parent_url, item_media_type, item_title)
             )
             continue
 
-        report[parent_url].log += f" Expanded into {len(expanded_urls)} items."
+        child_urls = [
+            url for url in dict.fromkeys(expanded_urls) if url not in seen_urls
+        ]
+
+        # All the children of a collection are recorded in one transaction,
+        # which also marks the collection as expanded
+        child_success, child_error, child_records = record_expansion(
+            parent_id,  # type: ignore[arg-type]
+            [(child_url, item_media_type) for child_url in child_urls],
+            [
+                {
+                    "stage": QueueStage.DOWNLOAD,
+                    "range_start": range_start,
+                    "range_end": range_end,
+                    "parent_id": parent_id,
+                }
+                for _ in child_urls
+            ],
+        )
+
+        # Cancelled while it was being expanded, the children were never added
+        if not child_success and child_error == CANCELLED_MESSAGE:
+            report[parent_url].status = False
+            report[parent_url].error = CANCELLED_MESSAGE
+            cancellations.forget([parent_id])
+            continue
 
-        for child_url in expanded_urls:
-            if child_url in seen_urls:
-                continue
+        report[parent_url].log += f" Expanded into {len(expanded_urls)} items."
 
-            child_success, child_error, child_record = initialize_download(
-                child_url, item_media_type
-            )
-            child_id = child_record["id"] if child_success and child_record else None
+        for index, child_url in enumerate(child_urls):
+            child_id = child_records[index]["id"] if child_success else None
 
             # Regardless of success status, we want to keep track of the url,
             # since if it fails and multiple parents expand into lists containing
@@ -78,6 +177,7 @@ def process_download_request(items, range_start, range_end):
 
             report[child_url] = DownloadReportItem(
                 url=child_url,
+                id=child_id,
                 status=child_success,
                 error=child_error,
                 log=f"Child of #{parent_id}",
@@ -90,44 +190,490 @@ def process_download_request(items, range_start, range_end):
 
     # PROCESSING
 
+    entries = [entry for entry in final_processing_queue if entry[0] is not None]
+
+    # Titles are resolved on their own pool, so downloads never wait on them
+    title_pool = current_app.config["TITLE_POOL"]
+    untitled = [
+        (download_id, url)
+        for download_id, url, _, provided_title in entries
+        if not provided_title
+    ]
+
+    if len(untitled) >= ScraperConfig.BULK_TITLE_THRESHOLD:
+        title_futures = [
+            title_pool.submit(untitled[0][1], resolve_titles_in_bulk, untitled)
+        ]
+    else:
+        title_futures = [
+            title_pool.submit(url, resolve_title, download_id, url)
+            for download_id, url in untitled
+        ]
+
+    # Read now, so changes made while the job was expanding are followed
+    priorities = get_priorities(
+        [download_id for download_id, _, _, _ in entries if download_id is not None]
+    )
+
+    pool = current_app.config["DOWNLOAD_POOL"]
+    batch_size = current_app.config.get("GALLERY_BATCH_SIZE", 1)
+    futures = []
+    for batch in plan_batches(entries, batch_size, priorities):
+        batch_ids = [
+            download_id for download_id, _, _, _ in batch if download_id is not None
+        ]
+        futures.append(
+            pool.submit(
+                batch[0][1],
+                process_items,
+                [report[url] for _, url, _, _ in batch],
+                batch,
+                range_start,
+                range_end,
+                priority=max(
+                    priorities.get(download_id, 0) for download_id in batch_ids
+                ),
+                item_ids=batch_ids,
+            )
+        )
+
     finalized_records = []
 
-    for download_id, url, item_media_type, provided_title in final_processing_queue:
-        if download_id is None:
-            continue
+    # Collect in submission order to keep the result stable. The records have
+    # already been announced by the writer, as their batches got committed.
+    for future in futures:
+        try:
+            finalized_records.extend(future.result())
+        except Exception as e:
+            logger.error(f"Download task failed: {e}")
 
-        title = provided_title if provided_title else scrape_title(url)
+    # The job is only done once the title stage has caught up as well
+    wait(title_futures)
 
-        # Download
-        try:
-            match item_media_type:
-                case MediaType.GALLERY | None:
-                    report_result = Gallery.download([url], range_start, range_end)
-                    report[url].output = report_result.output
-                    report[url].status = report_result.status
-                    report[url].error = report_result.error
-                    report[url].files = report_result.files
+    return [item.to_dict() for item in report.values()], finalized_records
 
-        except Exception as e:
-            logger.exception(e)
 
-            report[url].status = False
-            report[url].error = str(e)
+def resolve_title(download_id: int, url: str) -> Optional[str]:
+    """
+    Scrapes the title of a recorded item and patches it into its record.
+    Runs on the title pool, concurrently with the item's download.
+    """
+    title = scrape_title(url)
+    apply_titles({download_id: title})
+
+    return title
+
+
+def resolve_titles_in_bulk(items: List[Tuple[int, str]]) -> Dict[int, str]:
+    """
+    Scrapes the titles of many recorded items at once with the async engine,
+    then patches them into their records in a single update.
+
+    Args:
+        items: The (download_id, url) of each item.
+    """
+    titles = scrape_titles([url for _, url in items])
+    titles_by_id = {download_id: titles[url] for download_id, url in items}
+
+    apply_titles(titles_by_id)
+
+    return titles_by_id
+
+
+def apply_titles(titles_by_id: Dict[int, str]) -> None:
+    """
+    Saves scraped titles through the group commit writer, which announces the
+    records that changed. Blocks until they have been committed.
+    """
+    writer = current_app.config["DOWNLOAD_WRITER"]
+    futures = [
+        writer.write(download_id, {"title": title})
+        for download_id, title in titles_by_id.items()
+    ]
+
+    for future in futures:
+        success, error, _ = future.result()
+        if not success:
+            logger.warning(f"Title update failed: {error}")
+
+
+def plan_batches(
+    entries: List[QueueEntry],
+    batch_size: int,
+    priorities: Optional[Dict[int, int]] = None,
+) -> List[List[QueueEntry]]:
+    """
+    Groups gallery entries of the same host and priority into batches of up to
+    `batch_size` items, which can share a single gallery-dl process.
+    Every other entry gets a batch of its own.
+    """
+    batches: List[List[QueueEntry]] = []
+    open_batches: Dict[Tuple[str, int], List[QueueEntry]] = {}
+
+    for entry in entries:
+        download_id, url, item_media_type, _ = entry
+
+        if batch_size <= 1 or item_media_type not in (MediaType.GALLERY, None):
+            batches.append([entry])
+            continue
+
+        # An urgent item must not wait on a batch of low priority ones
+        priority = priorities.get(download_id, 0) if priorities and download_id else 0
+        batch_key = (get_host(url), priority)
+        batch = open_batches.get(batch_key)
+
+        if batch is None or len(batch) >= batch_size:
+            batch = open_batches[batch_key] = []
+            batches.append(batch)
+
+        batch.append(entry)
+
+    return batches
+
+
+def process_items(
+    report_items: List[DownloadReportItem],
+    entries: List[QueueEntry],
+    range_start: Optional[int],
+    range_end: Optional[int],
+) -> List[Dict[str, Any]]:
+    """
+    Downloads a batch of recorded items and finalizes their records.
+    Runs on a DownloadPool worker.
+
+    Returns:
+        The finalized records that could be saved.
+    """
+    cancellations = current_app.config["CANCELLATIONS"]
+
+    # Items cancelled while they were queued are only finalized
+    active = []
+    for report_item, entry in zip(report_items, entries):
+        if cancellations.is_cancelled(entry[0]):
+            report_item.status = False
+            report_item.error = CANCELLED_MESSAGE
+        else:
+            active.append((report_item, entry))
+
+    # Nobody waits for this one, the writer commits it ahead of the final write
+    writer = current_app.config["DOWNLOAD_WRITER"]
+    for _, (download_id, _, _, _) in active:
+        writer.write(download_id, {"status": DownloadStatus.IN_PROGRESS})
+
+    if active:
+        active_items = [report_item for report_item, _ in active]
+
+        with cancellations.scope(item.id for item in active_items) as cancel:
+            try:
+                if len(active) > 1:
+                    download_gallery_batch(active_items, range_start, range_end, cancel)
+                else:
+                    download_item(
+                        active_items[0], active[0][1][2], range_start, range_end, cancel
+                    )
+
+            except Exception as e:
+                logger.exception(e)
+
+                for report_item in active_items:
+                    report_item.status = False
+                    report_item.error = str(e)
+
+    retry_counts = get_retry_counts(
+        [download_id for download_id, _, _, _ in entries if download_id is not None]
+    )
 
-        # Finalize DB record
-        success, error, record_dict = finalize_download(
+    finalized_records = []
+    for report_item, (download_id, _, _, provided_title) in zip(report_items, entries):
+        record_dict = finalize_item(
+            report_item,
             download_id,  # type: ignore[arg-type]
-            title,
-            DownloadStatus.DONE if report[url].status else DownloadStatus.FAILED,
+            provided_title,
+            retry_counts.get(download_id, 0),  # type: ignore[arg-type]
         )
+        if record_dict:
+            finalized_records.append(record_dict)
 
-        if report[url].status:
-            report[url].status = success
+    return finalized_records
 
-        if error:
-            report[url].error = error
 
-        if record_dict:
-            finalized_records.append(record_dict)
+def download_item(
+    report_item: DownloadReportItem,
+    item_media_type: Optional[int],
+    range_start: Optional[int],
+    range_end: Optional[int],
+    cancel: Optional[CancelScope] = None,
+) -> None:
+    """Downloads a single item, storing the outcome on its report."""
+    url = report_item.url or ""
 
-    return [item.to_dict() for item in report.values()], finalized_records
+    with track_progress([report_item], range_start, range_end) as progress:
+        match item_media_type:
+            case MediaType.GALLERY | None:
+                report_result = Gallery.download(
+                    [url], range_start, range_end, progress, cancel
+                )
+                apply_result(report_item, report_result)
+
+            case MediaType.VIDEO:
+                report_result = Video.download(
+                    [url], range_start, range_end, progress, cancel
+                )
+                apply_result(report_item, report_result)
+
+            case MediaType.AUDIO:
+                report_result = Audio.download(
+                    [url], range_start, range_end, progress, cancel
+                )
+                apply_result(report_item, report_result)
+
+
+def download_gallery_batch(
+    report_items: List[DownloadReportItem],
+    range_start: Optional[int],
+    range_end: Optional[int],
+    cancel: Optional[CancelScope] = None,
+) -> None:
+    """Downloads several gallery items with a single gallery-dl process."""
+    urls = [report_item.url or "" for report_item in report_items]
+
+    with track_progress(report_items, range_start, range_end) as progress:
+        results = Gallery.download_batch(urls, range_start, range_end, progress, cancel)
+
+    for report_item in report_items:
+        apply_result(report_item, results[report_item.url or ""])
+
+
+def track_progress(
+    report_items: List[DownloadReportItem],
+    range_start: Optional[int],
+    range_end: Optional[int],
+) -> ProgressTracker:
+    """
+    Creates the tracker that announces the progress of the given items.
+    The file count, and with it an ETA, is only known for a closed range.
+    """
+    total_files = range_end - (range_start or 1) + 1 if range_end else None
+
+    return ProgressTracker(
+        {
+            report_item.url or "": report_item.id
+            for report_item in report_items
+            if report_item.id is not None
+        },
+        total_files=total_files,
+    )
+
+
+def apply_result(
+    report_item: DownloadReportItem, report_result: DownloadReportItem
+) -> None:
+    report_item.output = report_result.output
+    report_item.status = report_result.status
+    report_item.error = report_result.error
+    report_item.files = report_result.files
+
+
+def finalize_item(
+    report_item: DownloadReportItem,
+    download_id: int,
+    provided_title: Optional[str],
+    retry_count: int = 0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Finalizes the record of a downloaded item. Without a provided title, the
+    record keeps whatever the title stage has patched in so far.
+
+    A cancelled item stays cancelled, whatever its download came up with.
+    A failed one is scheduled for a retry if its error looks transient.
+    """
+    cancellations = current_app.config["CANCELLATIONS"]
+    retry_scheduler = current_app.config["RETRY_SCHEDULER"]
+    retry_time = None
+
+    if cancellations.is_cancelled(download_id):
+        report_item.status = False
+        report_item.error = CANCELLED_MESSAGE
+        status = DownloadStatus.CANCELLED
+    elif report_item.status:
+        status = DownloadStatus.DONE
+    else:
+        status = DownloadStatus.FAILED
+        retry_time = retry_scheduler.get_retry_time(report_item.error, retry_count)
+
+    success, error, record_dict = finalize_download(
+        download_id, provided_title or None, status, report_item.error, retry_time
+    )
+    cancellations.forget([download_id])
+
+    if success and retry_time is not None:
+        retry_scheduler.wake(retry_time)
+
+    if report_item.status:
+        report_item.status = success
+
+    if error:
+        report_item.error = error
+
+    return record_dict
+
+
+def process_download_request(
+    items, range_start, range_end
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Records, expands and downloads the requested items, blocking until every
+    item has been finalized.
+    """
+    report, initial_queue = record_download_request(items, range_start, range_end)
+    return run_download_job(report, initial_queue, range_start, range_end)
+
+
+def enqueue_download_request(items, range_start, range_end) -> List[Dict[str, Any]]:
+    """
+    Records the requested items and hands the expansion and download phases
+    over to the background job queue.
+
+    Returns:
+        The report of the initial records, including their IDs.
+    """
+    report, initial_queue = record_download_request(items, range_start, range_end)
+
+    # Snapshot before the job starts mutating the shared report
+    initial_report = [item.to_dict() for item in report.values()]
+
+    if initial_queue:
+        # An urgent request must not wait behind the jobs queued before it
+        current_app.config["DOWNLOAD_QUEUE"].submit(
+            run_download_job,
+            report,
+            initial_queue,
+            range_start,
+            range_end,
+            priority=max(item.get("priority", 0) for item in items),
+            item_ids=[download_id for download_id, _, _, _ in initial_queue],
+        )
+
+    return initial_report
+
+
+def recover_downloads(policy: str = RecoveryPolicy.RESUME, max_age: int = 0) -> None:
+    """
+    Reconciles the downloads a previous run left unfinished. Meant to be called
+    once at startup, before any new request comes in.
+
+    With the RESUME policy, they're handed over to the job queue again, at the
+    stage they were interrupted at. Collections are expanded anew, children
+    are only downloaded. The rest are marked as failed.
+
+    Args:
+        max_age: Downloads requested longer ago than this many seconds are
+            failed regardless of the policy. 0 means no limit.
+    """
+    unfinished = get_unfinished_downloads()
+    if not unfinished:
+        return
+
+    min_start_time = int(time.time()) - max_age if max_age > 0 else None
+
+    to_resume = []
+    to_fail = []
+    for download in unfinished:
+        too_old = min_start_time is not None and download.start_time < min_start_time
+
+        if policy == RecoveryPolicy.RESUME and not too_old:
+            to_resume.append(download)
+        else:
+            to_fail.append(download.id)
+
+    fail_downloads(to_fail, "Interrupted by a restart.")
+
+    if not to_resume:
+        logger.info(f"Recovery: failed {len(to_fail)} interrupted downloads.")
+        return
+
+    queue_state = requeue_downloads(to_resume)
+    job_count = submit_resumed_jobs(to_resume, queue_state, "Resumed after a restart.")
+
+    logger.info(
+        f"Recovery: resumed {len(to_resume)} downloads in {job_count} jobs, "
+        f"failed {len(to_fail)}."
+    )
+
+
+def retry_failed_downloads() -> Optional[int]:
+    """
+    Hands the failed downloads whose retry is due over to the job queue again.
+    Runs on the RetryScheduler's thread.
+
+    Returns:
+        The time the next retry is due, if any.
+    """
+    downloads, queue_state = start_retries(int(time.time()))
+
+    if downloads:
+        job_count = submit_resumed_jobs(
+            downloads, queue_state, "Retried after a transient error."
+        )
+        current_app.config["RETRY_SCHEDULER"].record_retries(len(downloads))
+
+        logger.info(f"Retrying {len(downloads)} failed downloads in {job_count} jobs.")
+
+    return get_next_retry_time()
+
+
+def submit_resumed_jobs(
+    downloads: List[Download], queue_state: List[QueuedDownload], log: str
+) -> int:
+    """
+    Submits jobs for downloads that were requested before, resuming each one
+    at the stage its queue state tells. Collections are expanded anew,
+    children are only downloaded.
+
+    Returns:
+        The number of jobs submitted.
+    """
+    # Items of a request share their range. A job can't have the same URL twice.
+    jobs: Dict[Tuple[Optional[int], Optional[int]], List[Dict[str, Any]]] = {}
+    for download, queued in zip(downloads, queue_state):
+        job_key = (queued.range_start, queued.range_end)
+        job_list = jobs.setdefault(job_key, [])
+
+        job = next((job for job in job_list if download.url not in job["report"]), None)
+        if job is None:
+            job = {
+                "report": {},
+                "initial_queue": [],
+                "expanded_queue": [],
+                "priority": download.priority,
+            }
+            job_list.append(job)
+
+        job["priority"] = max(job["priority"], download.priority)
+        job["report"][download.url] = DownloadReportItem(
+            url=download.url, id=download.id, log=log
+        )
+
+        entry = (download.id, download.url, download.media_type, queued.title)
+        if queued.stage == QueueStage.DOWNLOAD:
+            job["expanded_queue"].append(entry)
+        else:
+            job["initial_queue"].append(entry)
+
+    job_queue = current_app.config["DOWNLOAD_QUEUE"]
+    job_count = 0
+    for (range_start, range_end), job_list in jobs.items():
+        for job in job_list:
+            job_queue.submit(
+                run_download_job,
+                job["report"],
+                job["initial_queue"],
+                range_start,
+                range_end,
+                job["expanded_queue"],
+                priority=job["priority"],
+                item_ids=[item.id for item in job["report"].values()],
+            )
+            job_count += 1
+
+    return job_count
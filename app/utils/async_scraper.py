@@ -0,0 +1,289 @@
+import asyncio
+import contextlib
+import ssl
+import threading
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, urljoin, urlsplit
+
+from app.constants import ScraperConfig
+from app.utils.html_title import TitleExtractor, get_charset, is_html_content_type
+from app.utils.rate_limiter import is_throttle_status, parse_retry_after, rate_limiter
+from app.utils.tools import get_host
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+MAX_HEADER_LINES = 100
+
+# How often a run checks its cancel event
+POLL_INTERVAL = 0.1
+
+
+@dataclass
+class TitleProbe:
+    """What a bulk scrape found out about a single URL."""
+
+    url: str
+    title: Optional[str] = None
+    content_type: Optional[str] = None
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = None
+    error: Optional[str] = None
+    cancelled: bool = False
+
+
+class AsyncTitleEngine:
+    """
+    Resolves the titles and content types of many URLs concurrently, on a
+    single event loop instead of a thread per request.
+
+    Concurrency is capped globally and per host. A run can be bounded by a
+    total time budget and stopped early through a threading.Event, in which
+    case the unfinished URLs are reported as cancelled.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ScraperConfig.BULK_CONCURRENCY,
+        per_host_limit: int = ScraperConfig.BULK_PER_HOST_LIMIT,
+        timeout: float = ScraperConfig.TIMEOUT,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+
+        self._ssl_context = ssl.create_default_context()
+
+    def resolve(
+        self,
+        urls: Iterable[str],
+        time_budget: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Dict[str, TitleProbe]:
+        """
+        Blocking entry point for synchronous callers, like the worker threads.
+        Runs a fresh event loop, so it must not be called from a running one.
+        """
+        return asyncio.run(self.resolve_async(urls, time_budget, cancel_event))
+
+    async def resolve_async(
+        self,
+        urls: Iterable[str],
+        time_budget: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Dict[str, TitleProbe]:
+        """
+        Returns:
+            A probe for every unique URL, in input order.
+        """
+        probes = {url: TitleProbe(url) for url in dict.fromkeys(urls)}
+        if not probes:
+            return probes
+
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        async def run(probe: TitleProbe) -> None:
+            host = get_host(probe.url)
+            if host not in host_limits:
+                host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+
+            # Waiting on a busy host first keeps the global slots for others
+            async with host_limits[host], global_limit:
+                await self._probe(probe)
+
+        tasks = [asyncio.create_task(run(probe)) for probe in probes.values()]
+        everything = asyncio.gather(*tasks, return_exceptions=True)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + time_budget if time_budget is not None else None
+
+        while not everything.done():
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+            wait_time = POLL_INTERVAL if cancel_event is not None else None
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                wait_time = min(wait_time or remaining, remaining)
+
+            await asyncio.wait({everything}, timeout=wait_time)
+
+        if not everything.done():
+            everything.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await everything
+
+        for probe, task in zip(probes.values(), tasks):
+            if task.cancelled():
+                probe.cancelled = True
+                probe.error = "Cancelled"
+
+        return probes
+
+    async def _probe(self, probe: TitleProbe) -> None:
+        url = probe.url
+
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                # Waiting on the host's rate limit doesn't count as timing out
+                host = get_host(url)
+                wait = rate_limiter.reserve(host)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                async with asyncio.timeout(self.timeout):
+                    location = await self._fetch(url, probe)
+
+                if is_throttle_status(probe.status_code):
+                    rate_limiter.report_throttled(host, probe.retry_after)
+                else:
+                    rate_limiter.report_success(host)
+
+                if location is None:
+                    return
+
+                url = urljoin(url, location)
+
+            probe.error = "Too many redirects"
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            probe.error = f"{e.__class__.__name__}: {e}" if str(e) else repr(e)
+
+    async def _fetch(self, url: str, probe: TitleProbe) -> Optional[str]:
+        """
+        Sends a single ranged GET and parses the title out of the response.
+
+        Returns:
+            Where the response redirects to, if it does.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported URL {url!r}")
+
+        is_https = parts.scheme == "https"
+        port = parts.port or (443 if is_https else 80)
+        hostname = parts.hostname.encode("idna").decode("ascii")
+
+        reader, writer = await asyncio.open_connection(
+            hostname, port, ssl=self._ssl_context if is_https else None
+        )
+
+        try:
+            writer.write(self._build_request(parts, hostname, port, is_https))
+            await writer.drain()
+
+            status_code, headers = await self._read_head(reader)
+            probe.status_code = status_code
+            probe.retry_after = parse_retry_after(headers.get("retry-after"))
+
+            if status_code in REDIRECT_CODES and "location" in headers:
+                return headers["location"]
+
+            if status_code >= 400:
+                probe.error = f"HTTP Error {status_code}"
+                return None
+
+            content_type = headers.get("content-type", "")
+            probe.content_type = content_type or None
+
+            # Non-HTML bodies are never read, the connection just gets closed
+            if is_html_content_type(content_type):
+                probe.title = await self._read_title(reader, headers)
+
+            return None
+
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await asyncio.wait_for(writer.wait_closed(), timeout=1)
+
+    @staticmethod
+    def _build_request(parts, hostname: str, port: int, is_https: bool) -> bytes:
+        path = quote(parts.path or "/", safe="/%:@!$&'()*+,;=~-._")
+        if parts.query:
+            path += f"?{quote(parts.query, safe='=&%+/:;,@!$()*~-._')}"
+
+        host = hostname if port == (443 if is_https else 80) else f"{hostname}:{port}"
+
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host}",
+            f"User-Agent: {ScraperConfig.USER_AGENT}",
+            "Accept: text/html,application/xhtml+xml,*/*;q=0.8",
+            "Accept-Encoding: identity",
+            f"Range: bytes=0-{ScraperConfig.MAX_BYTES_TO_READ - 1}",
+            "Connection: close",
+        ]
+
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("ascii")
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        status_line = (await reader.readline()).decode("latin-1").strip()
+        version, _, rest = status_line.partition(" ")
+        if not version.startswith("HTTP/"):
+            raise ValueError(f"Invalid status line {status_line!r}")
+
+        status_code = int(rest.split(" ", 1)[0])
+
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        return status_code, headers
+
+    async def _read_title(
+        self, reader: asyncio.StreamReader, headers: Dict[str, str]
+    ) -> Optional[str]:
+        extractor = TitleExtractor(get_charset(headers.get("content-type", "")))
+
+        async with contextlib.aclosing(self._iter_body(reader, headers)) as chunks:
+            async for chunk in chunks:
+                if extractor.feed(chunk):
+                    break
+
+        return extractor.title
+
+    @staticmethod
+    async def _iter_body(
+        reader: asyncio.StreamReader, headers: Dict[str, str]
+    ) -> AsyncGenerator[bytes, None]:
+        """Yields the body, up to ScraperConfig.MAX_BYTES_TO_READ bytes."""
+        remaining = ScraperConfig.MAX_BYTES_TO_READ
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while remaining > 0:
+                size_line = (await reader.readline()).split(b";", 1)[0].strip()
+                size = int(size_line or b"0", 16)
+                if size == 0:
+                    return
+
+                chunk = await reader.readexactly(size)
+                await reader.readline()
+
+                remaining -= len(chunk)
+                yield chunk
+
+            return
+
+        if "content-length" in headers:
+            remaining = min(remaining, int(headers["content-length"]))
+
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 8 * 1024))
+            if not chunk:
+                return
+
+            remaining -= len(chunk)
+            yield chunk
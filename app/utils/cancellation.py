@@ -0,0 +1,123 @@
+import contextlib
+import multiprocessing.process
+import subprocess
+import threading
+from typing import Iterable, Iterator, List, Set, Union
+
+from app.utils.logger import logger
+
+# A command, or a warm worker process running a gallery-dl job
+Process = Union[subprocess.Popen, multiprocessing.process.BaseProcess]
+
+
+class CancelScope:
+    """
+    The cancellation state of the items a single worker task downloads
+    together, along with the process it's currently running for them.
+    """
+
+    def __init__(self, ids: Iterable[int]) -> None:
+        self.ids = set(ids)
+
+        self._event = threading.Event()
+        self._processes: List[Process] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+
+        for process in processes:
+            self._kill(process)
+
+    def attach(self, process: Process) -> None:
+        """Ties a process to the scope, it gets killed on cancellation."""
+        with self._lock:
+            self._processes.append(process)
+            cancelled = self.cancelled
+
+        if cancelled:
+            self._kill(process)
+
+    def detach(self, process: Process) -> None:
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+    @staticmethod
+    def _kill(process: Process) -> None:
+        try:
+            process.kill()
+        except OSError as e:
+            logger.warning(f"Failed to kill process {process.pid}: {e}")
+
+
+class CancellationRegistry:
+    """
+    Keeps track of the downloads that were cancelled, and of the scopes that
+    are running, so their work can be stopped.
+
+    A scope is only stopped once all of its items are cancelled. Cancelling
+    part of a gallery-dl batch would kill the other items' downloads as well,
+    so the cancelled ones are just reported as such once it's done.
+    """
+
+    def __init__(self) -> None:
+        self._cancelled: Set[int] = set()
+        self._scopes: List[CancelScope] = []
+        self._lock = threading.Lock()
+        self._guard = threading.Lock()
+
+    def cancel(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            self._cancelled.update(ids)
+            to_cancel = [
+                scope
+                for scope in self._scopes
+                if not scope.cancelled and scope.ids <= self._cancelled
+            ]
+
+        for scope in to_cancel:
+            scope.cancel()
+
+    def is_cancelled(self, download_id: int) -> bool:
+        with self._lock:
+            return download_id in self._cancelled
+
+    def forget(self, ids: Iterable[int]) -> None:
+        """Drops finalized downloads, whose cancellation has been handled."""
+        with self._lock:
+            self._cancelled.difference_update(ids)
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Serializes looking up what to cancel with recording the children of a
+        collection. Either the children are found and cancelled along with it,
+        or they see it cancelled and are never added.
+        """
+        with self._guard:
+            yield
+
+    @contextlib.contextmanager
+    def scope(self, ids: Iterable[int]) -> Iterator[CancelScope]:
+        """Registers a scope for as long as its items are being downloaded."""
+        scope = CancelScope(ids)
+
+        with self._lock:
+            self._scopes.append(scope)
+            already_cancelled = scope.ids <= self._cancelled
+
+        if already_cancelled:
+            scope.cancel()
+
+        try:
+            yield scope
+        finally:
+            with self._lock:
+                self._scopes.remove(scope)
@@ -1,9 +1,16 @@
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from sqlalchemy import inspect, text, update
+
 from app.extensions import db
 from app.models.download import Download
+from app.models.expansion import ExpansionCacheEntry  # noqa: F401
+from app.models.queue import QueuedDownload  # noqa: F401
+from app.models.search import SEARCH_TABLE, create_search_index
+from app.models.title import TitleCacheEntry  # noqa: F401
 from app.utils.logger import logger
+from app.utils.tools import get_host
 from scripts.demo_downloads import get_demo_downloads
 
 
@@ -20,12 +27,112 @@ def init_db(app):
     try:
         with app.app_context():
             db.create_all()
+            add_missing_columns()
+            add_missing_indexes()
+            backfill_hosts()
+            add_search_index()
             logger.debug("SQLAlchemy schema initialized.")
     except Exception as e:
         logger.critical(f"Database initialization failed: {e}")
         raise
 
 
+def add_missing_columns() -> None:
+    """
+    Adds the columns a model gained since its table was created, which
+    create_all leaves alone. Existing rows get the column's server default.
+    """
+    inspector = inspect(db.engine)
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            statement = (
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            )
+
+            # SQLite only takes a NOT NULL column along with a default
+            if column.server_default is not None:
+                default = column.server_default.arg  # type: ignore[attr-defined]
+                statement += f" DEFAULT {default}"
+                if not column.nullable:
+                    statement += " NOT NULL"
+
+            with db.engine.begin() as connection:
+                connection.execute(text(statement))
+
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
+def add_missing_indexes() -> None:
+    """Creates the indexes a model gained since its table was created."""
+    inspector = inspect(db.engine)
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+
+            index.create(db.engine)
+            logger.info(f"Added index {index.name}")
+
+
+def add_search_index() -> None:
+    """
+    Creates the full-text search index of a database made before it existed,
+    indexing the downloads it already holds.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return
+
+    if inspect(db.engine).has_table(SEARCH_TABLE):
+        return
+
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        connection.exec_driver_sql(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')"
+        )
+
+    logger.info(f"Added the {SEARCH_TABLE} search index")
+
+
+def backfill_hosts(batch_size: int = 1000) -> None:
+    """Fills in the host of the downloads recorded before it was stored."""
+    total = 0
+
+    while True:
+        rows = (
+            db.session.query(Download.id, Download.url)
+            .filter(Download.host.is_(None))
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        db.session.execute(
+            update(Download),
+            [{"id": download_id, "host": get_host(url)} for download_id, url in rows],
+        )
+        db.session.commit()
+        total += len(rows)
+
+    if total:
+        logger.info(f"Filled in the host of {total} downloads")
+
+
 def seed_db(
     data: Optional[List[Dict[str, Any]]] = None, row_count: Optional[int] = None
 ):
@@ -1,10 +1,18 @@
+import collections
 import re
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+import yt_dlp
 from flask import current_app
 
-from app.utils.tools import DownloadReportItem, run_command
+from app.utils.cancellation import CancelScope
+from app.utils.gallery_engine import EngineResult, engine
+from app.utils.logger import logger
+from app.utils.progress import ProgressTracker
+from app.utils.rate_limiter import is_throttle_message, rate_limiter
+from app.utils.tools import DownloadReportItem, get_host, run_command
 
 
 class Media(ABC):
@@ -15,6 +23,8 @@ class Media(ABC):
         urls: List[str],
         range_start: Optional[int] = None,
         range_end: Optional[int] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
     ) -> DownloadReportItem:
         pass
 
@@ -35,69 +45,464 @@ class Gallery(Media):
         ),
     ]
 
+    # Warnings and errors, the only lines where gallery-dl reports throttling.
+    # Anything else, like the path of a file, may contain any text.
+    LOG_PROBLEM_PATTERN = re.compile(r"^\[[^\]]+\]\[(?:error|warning)\]")
+
+    # Printed by gallery-dl before each input URL when it gets more than one
+    BATCH_MARKER = "[media-server][batch]"
+    BATCH_MARKER_PATTERN = re.compile(rf"^{re.escape(BATCH_MARKER)} (\S+)$")
+
     @classmethod
-    def download(
+    def get_output_dir(cls):
+        return current_app.config.get("DOWNLOAD_DIR", "") / "Galleries"
+
+    @classmethod
+    def get_range(
+        cls, range_start: Optional[int], range_end: Optional[int]
+    ) -> Optional[str]:
+        if range_start or range_end:
+            return f"{range_start or 0}-{range_end or ''}"
+        return None
+
+    @classmethod
+    def build_command(
         cls,
         urls: List[str],
         range_start: Optional[int] = None,
         range_end: Optional[int] = None,
-    ) -> DownloadReportItem:
-        """
-        Download media using 'gallery-dl'.
-        """
-        output_dir = current_app.config.get("DOWNLOAD_DIR", "") / "Galleries"
-
+    ) -> List[str]:
         command = [
             "gallery-dl",
             "-o",
-            f"base-directory={output_dir}",
+            f"base-directory={cls.get_output_dir()}",
             "--no-colors",
             *urls,
         ]
 
-        if range_start or range_end:
-            command += ["--range", f"{range_start or 0}-{range_end or ''}"]
+        if image_range := cls.get_range(range_start, range_end):
+            command += ["--range", image_range]
 
-        cmd_result = run_command(command)
+        if interval := rate_limiter.request_interval(get_host(urls[0])):
+            command += ["--sleep-request", str(interval)]
 
-        report = DownloadReportItem()
+        return command
+
+    @classmethod
+    def download_in_process(
+        cls,
+        urls: List[str],
+        range_start: Optional[int] = None,
+        range_end: Optional[int] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> Optional[Dict[str, EngineResult]]:
+        """
+        Download media with the gallery-dl engine, in-process or on a warm
+        worker process.
+
+        Returns:
+            The result of each URL, or None to fall back to the command.
+        """
+        if not engine.enabled:
+            return None
+
+        options: Dict[str, Any] = {"base-directory": str(cls.get_output_dir())}
+        if image_range := cls.get_range(range_start, range_end):
+            options["image-range"] = image_range
+        if interval := rate_limiter.request_interval(get_host(urls[0])):
+            options["sleep-request"] = interval
+
+        return engine.download(urls, options, progress, cancel)
+
+    @classmethod
+    def parse_engine_result(cls, result: EngineResult) -> DownloadReportItem:
+        """
+        Builds a report from an in-process run. The files come straight from
+        the job hooks, only the log lines need to be checked for errors.
+        """
+        report = cls.parse_output(result.log_lines, result.return_code)
+        report.files = result.files
+
+        return report
+
+    @classmethod
+    def download(
+        cls,
+        urls: List[str],
+        range_start: Optional[int] = None,
+        range_end: Optional[int] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> DownloadReportItem:
+        """
+        Download media using 'gallery-dl'.
+
+        The output is parsed while the command runs, so files are reported
+        to the progress tracker as soon as they're written.
+        """
+        host = get_host(urls[0])
+        rate_limiter.acquire(host)
+
+        results = cls.download_in_process(
+            urls, range_start, range_end, progress, cancel
+        )
+        if results is not None:
+            result = EngineResult.combine(results.values())
+            rate_limiter.report(host, cls.is_throttled(result.log_lines))
+
+            return cls.parse_engine_result(result)
+
+        parser = GalleryOutput(cls.file_callback(progress, None))
+        cmd_result = run_command(
+            cls.build_command(urls, range_start, range_end),
+            on_line=parser.feed,
+            cancel=cancel,
+        )
+        rate_limiter.report(host, parser.throttled)
+
+        return parser.report(cmd_result.return_code)
+
+    @classmethod
+    def download_batch(
+        cls,
+        urls: List[str],
+        range_start: Optional[int] = None,
+        range_end: Optional[int] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> Dict[str, DownloadReportItem]:
+        """
+        Download several URLs with a single 'gallery-dl' process.
+
+        The in-process engine runs a job per URL. Otherwise, gallery-dl is told
+        to print a marker line before each input URL, which is used to attribute
+        the output and the written files back to the URL they belong to.
+
+        Batches share a host, which gets a single rate limiter token for the
+        whole process.
+        """
+        if len(urls) == 1:
+            return {
+                urls[0]: cls.download(urls, range_start, range_end, progress, cancel)
+            }
+
+        host = get_host(urls[0])
+        rate_limiter.acquire(host)
+
+        results = cls.download_in_process(
+            urls, range_start, range_end, progress, cancel
+        )
+        if results is not None:
+            rate_limiter.report(
+                host,
+                any(cls.is_throttled(result.log_lines) for result in results.values()),
+            )
+            return {
+                url: cls.parse_engine_result(result) for url, result in results.items()
+            }
+
+        command = cls.build_command(urls, range_start, range_end)
+        command[1:1] = ["-o", f"output.progress={cls.BATCH_MARKER} {{url}}"]
+
+        parsers = {url: GalleryOutput(cls.file_callback(progress, url)) for url in urls}
+        # Lines printed before the first marker can't be attributed to any URL
+        current_parser: Optional[GalleryOutput] = None
+
+        def on_line(line: str) -> None:
+            nonlocal current_parser
+
+            match = cls.BATCH_MARKER_PATTERN.match(line.strip())
+            if match and match.group(1) in parsers:
+                current_parser = parsers[match.group(1)]
+                return
+
+            if current_parser is not None:
+                current_parser.feed(line)
+
+        cmd_result = run_command(command, on_line=on_line, cancel=cancel)
+        rate_limiter.report(host, any(parser.throttled for parser in parsers.values()))
+
+        reports = {}
+        for url, parser in parsers.items():
+            report = parser.report(0)
+
+            # gallery-dl only exits with one code for the whole batch, so a
+            # generic failure is only blamed on the URLs that produced nothing
+            if not cmd_result.success and report.status and not report.files:
+                report.status = False
+                report.error = (
+                    f"[gallery-dl] System command failed "
+                    f"(Code {cmd_result.return_code})"
+                )
+
+            reports[url] = report
+
+        return reports
+
+    @classmethod
+    def is_throttled(cls, lines: List[str]) -> bool:
+        return any(cls.is_throttle_line(line) for line in lines)
 
-        lines = cmd_result.output.splitlines()
-        filtered_output = []
+    @classmethod
+    def is_throttle_line(cls, line: str) -> bool:
+        return bool(cls.LOG_PROBLEM_PATTERN.match(line)) and is_throttle_message(line)
+
+    @staticmethod
+    def file_callback(
+        progress: Optional[ProgressTracker], url: Optional[str]
+    ) -> Optional[Callable[[str], None]]:
+        if progress is None:
+            return None
+
+        return lambda path: progress.file_done(url, path)
 
-        # Extract files & clean output
+    @classmethod
+    def parse_output(cls, lines: List[str], return_code: int) -> DownloadReportItem:
+        """
+        Builds a report from the output lines of a 'gallery-dl' run.
+        """
+        parser = GalleryOutput()
         for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+            parser.feed(line)
+
+        return parser.report(return_code)
+
+
+class GalleryOutput:
+    """
+    Parses the output of a 'gallery-dl' run line by line, as it's printed.
+
+    Only the written files, the first known error and the last MAX_LOG_LINES
+    other lines are kept, however long the run.
+    """
 
-            if line.startswith(("/", "./", "# ")):
-                clean_path = line.lstrip("# ").strip()
-                report.files.append(clean_path)
-            else:
-                # Keep non-file lines for the log
-                filtered_output.append(line)
+    MAX_LOG_LINES = 500
 
-        report.output = "\n".join(filtered_output)
+    def __init__(self, on_file: Optional[Callable[[str], None]] = None) -> None:
+        self.on_file = on_file
+
+        self.files: List[str] = []
+        self.log_lines: collections.deque = collections.deque(maxlen=self.MAX_LOG_LINES)
+        self.error: Optional[str] = None
+        # Whether the host answered with a 429 or 5xx at some point
+        self.throttled = False
+
+    def feed(self, line: str) -> None:
+        # Known error patterns should override the generic "system failed"
+        # error. The first one wins.
+        if self.error is None:
+            self.error = self._match_error(line)
+
+        if not self.throttled:
+            self.throttled = Gallery.is_throttle_line(line)
+
+        line = line.strip()
+        if not line:
+            return
+
+        if line.startswith(("/", "./", "# ")):
+            clean_path = line.lstrip("# ").strip()
+            self.files.append(clean_path)
+
+            if self.on_file is not None:
+                self.on_file(clean_path)
+        else:
+            # Keep non-file lines for the log
+            self.log_lines.append(line)
+
+    def report(self, return_code: int) -> DownloadReportItem:
+        report = DownloadReportItem(files=list(self.files))
+        report.output = "\n".join(self.log_lines)
+
+        if return_code != 0:
+            report.status = False
+            report.error = f"[gallery-dl] System command failed (Code {return_code})"
 
-        if cmd_result.return_code != 0:
+        if self.error is not None:
             report.status = False
-            report.error = (
-                f"[gallery-dl] System command failed (Code {cmd_result.return_code})"
+            report.error = self.error
+
+        return report
+
+    @staticmethod
+    def _match_error(line: str) -> Optional[str]:
+        for pattern, handler in Gallery.ERROR_PATTERNS:
+            if re.search(pattern, line):
+                if callable(handler):
+                    return str(handler(line))
+                return str(handler)
+
+        return None
+
+
+class _YtdlpCollector:
+    """
+    Stands in as the logger of a YoutubeDL instance, keeping what it would have
+    printed, along with the files it produced.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(
+        self,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> None:
+        self.lines: List[str] = []
+        self.errors: List[str] = []
+        self.files: List[str] = []
+        self.progress = progress
+        self.cancel = cancel
+
+    def debug(self, msg: str) -> None:
+        # Regular output is routed through debug as well, only with no prefix
+        if msg.startswith("[debug] "):
+            return
+        self.lines.append(msg)
+
+    def info(self, msg: str) -> None:
+        self.lines.append(msg)
+
+    def warning(self, msg: str) -> None:
+        self.lines.append(f"WARNING: {msg}")
+
+    def error(self, msg: str) -> None:
+        self.lines.append(msg)
+        self.errors.append(msg)
+
+    def add_file(self, filepath: str) -> None:
+        if filepath not in self.files:
+            self.files.append(filepath)
+
+            if self.progress is not None:
+                # Its bytes were counted as it downloaded
+                self.progress.file_done(None, filepath, count_size=False)
+
+    def on_progress(self, status: Dict[str, Any]) -> None:
+        # yt-dlp lets this through, past 'ignoreerrors', to stop the download
+        if self.cancel is not None and self.cancel.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
+
+        if self.progress is None:
+            return
+
+        filename = status.get("filename") or ""
+        downloaded = status.get("downloaded_bytes") or 0
+
+        if status.get("status") == "downloading":
+            if filename:
+                self.progress.file_started(None, filename)
+            self.progress.bytes_progress(None, downloaded, status.get("eta"))
+
+        elif status.get("status") == "finished":
+            self.progress.bytes_finished(None, status.get("total_bytes") or downloaded)
+
+
+class Video(Media):
+    """
+    Downloads media with yt-dlp's Python API.
+
+    Every worker thread keeps its own YoutubeDL instance, so the extractors and
+    the HTTP session are set up once per thread instead of once per item.
+    """
+
+    OUTPUT_DIR_NAME = "Videos"
+    FORMAT = "bestvideo*+bestaudio/best"
+
+    _local = threading.local()
+
+    @classmethod
+    def get_output_dir(cls):
+        return current_app.config.get("DOWNLOAD_DIR", "") / cls.OUTPUT_DIR_NAME
+
+    @classmethod
+    def get_playlist_items(
+        cls, range_start: Optional[int], range_end: Optional[int]
+    ) -> Optional[str]:
+        if range_start or range_end:
+            return f"{range_start or 1}:{range_end or ''}"
+        return None
+
+    @classmethod
+    def get_downloader(cls):
+        """
+        Returns the YoutubeDL instance of the current thread, along with the
+        collector its output goes to.
+        """
+        downloaders = getattr(cls._local, "downloaders", None)
+        if downloaders is None:
+            downloaders = cls._local.downloaders = {}
+
+        if cls.__name__ not in downloaders:
+            collector = _YtdlpCollector()
+            ydl = yt_dlp.YoutubeDL(
+                {
+                    "format": cls.FORMAT,
+                    "outtmpl": "%(title).200B [%(id)s].%(ext)s",
+                    "concurrent_fragment_downloads": current_app.config.get(
+                        "VIDEO_FRAGMENT_WORKERS", 4
+                    ),
+                    # Keep going through playlists, errors are reported below
+                    "ignoreerrors": True,
+                    "noprogress": True,
+                    "color": {"stdout": "no_color", "stderr": "no_color"},
+                    "logger": collector,
+                }
             )
+            ydl.add_post_hook(collector.add_file)
+            ydl.add_progress_hook(collector.on_progress)
+            downloaders[cls.__name__] = (ydl, collector)
 
-        # Known error patterns should override the generic "system failed" error
-        for line in lines:
-            for pattern, handler in cls.ERROR_PATTERNS:
-                if re.search(pattern, line):
-                    report.status = False
+        return downloaders[cls.__name__]
+
+    @classmethod
+    def download(
+        cls,
+        urls: List[str],
+        range_start: Optional[int] = None,
+        range_end: Optional[int] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> DownloadReportItem:
+        """
+        Download media using 'yt-dlp'.
+        """
+        ydl, collector = cls.get_downloader()
+        collector.reset(progress, cancel)
 
-                    if callable(handler):
-                        report.error = str(handler(line))
-                    else:
-                        report.error = str(handler)
+        host = get_host(urls[0])
+        rate_limiter.acquire(host)
 
-                    # If we matched a specific error, return immediately
-                    return report
+        # The instance is only used by this thread, so it's safe to adjust
+        ydl.params["paths"] = {"home": str(cls.get_output_dir())}
+        ydl.params["playlist_items"] = cls.get_playlist_items(range_start, range_end)
+        ydl.params["sleep_interval_requests"] = rate_limiter.request_interval(host)
+
+        report = DownloadReportItem()
+
+        try:
+            ydl.download(urls)
+        except Exception as e:
+            logger.exception(f"yt-dlp failed for {urls}: {e}")
+            collector.error(f"ERROR: {e}")
+
+        rate_limiter.report(
+            host, any(is_throttle_message(error) for error in collector.errors)
+        )
+
+        report.files = list(collector.files)
+        report.output = "\n".join(collector.lines)
+
+        if collector.errors:
+            report.status = False
+            message = collector.errors[-1].removeprefix("ERROR:").strip()
+            report.error = f"[yt-dlp] Error: {message}"
 
         return report
+
+
+class Audio(Video):
+    OUTPUT_DIR_NAME = "Audio"
+    FORMAT = "bestaudio/best"
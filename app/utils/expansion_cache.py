@@ -0,0 +1,161 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app.extensions import db
+from app.models.expansion import ExpansionCacheEntry
+from app.utils.logger import logger
+
+
+def _now() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+class ExpansionCache:
+    """
+    Remembers the direct children of simulated collection URLs, so
+    re-submissions and overlapping collections skip the gallery-dl simulation.
+
+    Entries are stored next to the downloads table. They expire after `ttl`
+    seconds, and the least recently used ones are evicted past `max_entries`.
+    Every operation needs an application context.
+    """
+
+    WRITE_CHUNK_SIZE = 500
+
+    def __init__(self, ttl: int = 6 * 60 * 60, max_entries: int = 5000) -> None:
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+
+        self._lock = threading.Lock()
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Looks up several URLs at once.
+
+        Returns:
+            The children of every URL with a fresh entry.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+
+        now = _now()
+        hits: Dict[str, List[str]] = {}
+
+        try:
+            entries = ExpansionCacheEntry.query.filter(
+                ExpansionCacheEntry.url.in_(urls),
+                ExpansionCacheEntry.create_time > now - self.ttl,
+            ).all()
+
+            for entry in entries:
+                hits[entry.url] = json.loads(entry.children)
+                entry.access_time = now
+
+            if entries:
+                db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Expansion cache lookup failed: {e}")
+            hits = {}
+
+        with self._lock:
+            self._hit_count += len(hits)
+            self._miss_count += len(urls) - len(hits)
+
+        return hits
+
+    def put_many(self, results: Dict[str, List[str]]) -> None:
+        """Stores the children of several URLs, replacing older entries."""
+        if not results:
+            return
+
+        now = _now()
+        rows = [
+            {
+                "url": url,
+                "children": json.dumps(children),
+                "create_time": now,
+                "access_time": now,
+            }
+            for url, children in results.items()
+        ]
+
+        try:
+            # Chunked to stay below SQLite's bound parameter limit
+            for i in range(0, len(rows), self.WRITE_CHUNK_SIZE):
+                stmt = insert(ExpansionCacheEntry).values(
+                    rows[i : i + self.WRITE_CHUNK_SIZE]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ExpansionCacheEntry.url],
+                    set_={
+                        "children": stmt.excluded.children,
+                        "create_time": stmt.excluded.create_time,
+                        "access_time": stmt.excluded.access_time,
+                    },
+                )
+                db.session.execute(stmt)
+
+            evicted = self._evict(now)
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Expansion cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._eviction_count += evicted
+
+    def clear(self) -> None:
+        ExpansionCacheEntry.query.delete()
+        db.session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entry_count = ExpansionCacheEntry.query.count()
+        except Exception as e:
+            logger.warning(f"Expansion cache count failed: {e}")
+            entry_count = None
+
+        with self._lock:
+            lookups = self._hit_count + self._miss_count
+
+            return {
+                "entries": entry_count,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hit_count,
+                "misses": self._miss_count,
+                "hit_rate": round(self._hit_count / lookups, 3) if lookups else 0.0,
+                "evictions": self._eviction_count,
+            }
+
+    def _evict(self, now: int) -> int:
+        """Drops expired entries, then the least recently used ones."""
+        evicted = ExpansionCacheEntry.query.filter(
+            ExpansionCacheEntry.create_time <= now - self.ttl
+        ).delete(synchronize_session=False)
+
+        overflow = ExpansionCacheEntry.query.count() - self.max_entries
+        if overflow > 0:
+            oldest = (
+                db.session.query(ExpansionCacheEntry.url)
+                .order_by(ExpansionCacheEntry.access_time.asc())
+                .limit(overflow)
+                .subquery()
+            )
+            evicted += ExpansionCacheEntry.query.filter(
+                ExpansionCacheEntry.url.in_(db.select(oldest.c.url))
+            ).delete(synchronize_session=False)
+
+        return evicted
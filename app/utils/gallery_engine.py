@@ -0,0 +1,333 @@
+import collections
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils.cancellation import CancelScope
+from app.utils.logger import logger
+from app.utils.process_pool import JobCancelled, WarmProcessPool
+from app.utils.progress import ProgressTracker
+
+try:
+    from gallery_dl import config as gdl_config
+    from gallery_dl import exception as gdl_exception
+    from gallery_dl import job as gdl_job
+    from gallery_dl import output as gdl_output
+except ImportError:  # pragma: no cover
+    gdl_job = None  # type: ignore[assignment]
+
+
+class EngineMode:
+    IN_PROCESS = "inprocess"
+    PROCESS_POOL = "pool"
+    SUBPROCESS = "subprocess"
+
+
+@dataclass
+class EngineResult:
+    """Outcome of one or more in-process gallery-dl jobs."""
+
+    return_code: int = 0
+    files: List[str] = field(default_factory=list)
+    log_lines: List[str] = field(default_factory=list)
+
+    @classmethod
+    def combine(cls, results: Iterable["EngineResult"]) -> "EngineResult":
+        combined = cls()
+        for result in results:
+            combined.return_code |= result.return_code
+            combined.files.extend(result.files)
+            combined.log_lines.extend(result.log_lines)
+
+        return combined
+
+
+class JobCollector:
+    """
+    Gathers what a gallery-dl job (and its child jobs) would have printed,
+    along with the per-job config overrides.
+    """
+
+    def __init__(
+        self,
+        options: Optional[Dict[str, Any]] = None,
+        url: Optional[str] = None,
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> None:
+        self.options = options or {}
+        self.url = url
+        self.progress = progress
+        self.cancel = cancel
+        self.result = EngineResult()
+
+    def log(self, name: str, level: str, msg: str, args: tuple) -> None:
+        # Same layout as gallery-dl's default log format
+        line = f"[{name}][{level}] {msg % args if args else msg}"
+        self.result.log_lines.append(line)
+        logger.debug(line)
+
+    def start_file(self, pathfmt) -> None:
+        # Stops the job and its child jobs before their next file
+        if self.cancel is not None and self.cancel.cancelled:
+            raise gdl_exception.StopExtraction()
+
+        if self.progress is not None:
+            self.progress.file_started(self.url, pathfmt.filename)
+
+    def add_file(self, pathfmt) -> None:
+        self.result.files.append(pathfmt.path)
+
+        if self.progress is not None:
+            self.progress.file_done(self.url, pathfmt.path)
+
+
+if gdl_job is not None:
+
+    class _CollectingLoggerAdapter(gdl_output.LoggerAdapter):
+        """Routes a job's log messages to its collector instead of stderr."""
+
+        __slots__ = ()
+
+        def _collect(self, level: str, msg, args) -> None:
+            collector = getattr(self.extra["job"], "collector", None)
+            if collector is not None:
+                collector.log(self.logger.name, level, str(msg), args)
+
+        def traceback(self, exc):
+            pass
+
+        def debug(self, msg, *args, **kwargs):
+            pass
+
+        def info(self, msg, *args, **kwargs):
+            self._collect("info", msg, args)
+
+        def warning(self, msg, *args, **kwargs):
+            self._collect("warning", msg, args)
+
+        def error(self, msg, *args, **kwargs):
+            self._collect("error", msg, args)
+
+    def _apply_options(job, options: Dict[str, Any]) -> None:
+        """
+        Overrides config values for a single job, so concurrent jobs don't have
+        to share gallery-dl's global config.
+        """
+        if not options:
+            return
+
+        extr = job.extractor
+        base_config = extr.config
+
+        def config(key, default=None):
+            if key in options:
+                return options[key]
+            return base_config(key, default)
+
+        extr.config = config
+
+    class _DownloadJob(gdl_job.DownloadJob):
+        _logger_adapter = _CollectingLoggerAdapter
+
+        def __init__(self, url, parent=None, collector=None):
+            # Needs to be set first, the constructor already logs
+            self.collector = collector or parent.collector
+            super().__init__(url, parent)
+            _apply_options(self, self.collector.options)
+
+        def initialize(self, kwdict=None):
+            super().initialize(kwdict)
+
+            # Without post processors, 'hooks' is an empty tuple
+            if not self.hooks:
+                self.hooks = collections.defaultdict(list)
+
+            self.register_hooks(
+                {
+                    "prepare": self.collector.start_file,
+                    "after": self.collector.add_file,
+                    "skip": self.collector.add_file,
+                }
+            )
+
+    class _DataJob(gdl_job.DataJob):
+        _logger_adapter = _CollectingLoggerAdapter
+
+        def __init__(self, url, collector):
+            self.collector = collector
+            super().__init__(url, file=None)
+
+
+class GalleryEngine:
+    """
+    Runs gallery-dl jobs through its job API, either inside the current
+    process on the caller's thread, or on a pool of warm worker processes.
+
+    Saves the interpreter startup and import cost of a gallery-dl process per
+    call. Callers fall back to the 'gallery-dl' command when the engine is
+    disabled or fails, which is signalled by returning None.
+    """
+
+    def __init__(self, mode: str = EngineMode.SUBPROCESS) -> None:
+        self.mode = mode
+        self.pool: Optional[WarmProcessPool] = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def configure(self, mode: str, pool: Optional[WarmProcessPool] = None) -> None:
+        if mode not in (
+            EngineMode.IN_PROCESS,
+            EngineMode.PROCESS_POOL,
+            EngineMode.SUBPROCESS,
+        ):
+            logger.warning(
+                f"Unknown gallery engine {mode!r}. "
+                f"Defaulting to {EngineMode.SUBPROCESS!r}."
+            )
+            mode = EngineMode.SUBPROCESS
+
+        if mode == EngineMode.PROCESS_POOL and pool is None:
+            pool = WarmProcessPool()
+
+        if self.pool is not None and self.pool is not pool:
+            self.pool.shutdown()
+
+        self.mode = mode
+        self.pool = pool if mode == EngineMode.PROCESS_POOL else None
+
+    @property
+    def in_process(self) -> bool:
+        return self.mode == EngineMode.IN_PROCESS and gdl_job is not None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether calls go through the job API instead of the command."""
+        return self.in_process or self.pool is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "pool": self.pool.stats() if self.pool is not None else None,
+        }
+
+    def _run_in_pool(
+        self, task: str, *args, cancel: Optional[CancelScope] = None
+    ) -> Any:
+        assert self.pool is not None
+
+        try:
+            return self.pool.run(task, *args, cancel=cancel)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Worker process failed to run {task!r}: {e}")
+            return None
+
+    def download(
+        self,
+        urls: List[str],
+        options: Dict[str, Any],
+        progress: Optional[ProgressTracker] = None,
+        cancel: Optional[CancelScope] = None,
+    ) -> Optional[Dict[str, EngineResult]]:
+        """
+        Downloads each URL with its own job.
+
+        Args:
+            options: Config values applied to every job, e.g. 'base-directory'.
+            progress: Told about every file, as it gets downloaded. Jobs on the
+                worker processes only report their files once they're done.
+            cancel: Stops the jobs before their next file. Jobs on the worker
+                processes are stopped right away, by killing their worker.
+
+        Returns:
+            The result of each URL, or None if the engine couldn't run.
+        """
+        if self.pool is not None:
+            try:
+                return self._run_in_pool("download", urls, options, cancel=cancel)
+            except JobCancelled:
+                # Whatever the killed jobs got to download is unknown
+                return {
+                    url: EngineResult(
+                        return_code=1,
+                        log_lines=["[gallery-dl][error] Stopped by a cancellation."],
+                    )
+                    for url in urls
+                }
+
+        if not self._ensure_initialized():
+            return None
+
+        results = {}
+        for url in urls:
+            collector = JobCollector(options, url, progress, cancel)
+
+            try:
+                collector.result.return_code = _DownloadJob(
+                    url, collector=collector
+                ).run()
+
+            except gdl_exception.NoExtractorError:
+                collector.log("gallery-dl", "error", "Unsupported URL '%s'", (url,))
+                collector.result.return_code = 64
+
+            except Exception as e:
+                logger.exception(f"In-process gallery-dl failed for {url}: {e}")
+                return None
+
+            results[url] = collector.result
+
+        return results
+
+    def simulate(self, url: str) -> Optional[List[Any]]:
+        """
+        Collects the extractor messages of a URL, like 'gallery-dl -s -j'.
+
+        Returns:
+            The (level, url) of each message, or None if the engine couldn't run.
+        """
+        if self.pool is not None:
+            return self._run_in_pool("simulate", url)
+
+        if not self._ensure_initialized():
+            return None
+
+        try:
+            job = _DataJob(url, JobCollector())
+            job.run()
+
+        except gdl_exception.NoExtractorError:
+            return []
+
+        except Exception as e:
+            logger.exception(f"In-process gallery-dl simulation failed for {url}: {e}")
+            return None
+
+        # Metadata dicts aren't needed and may not survive a trip through a pipe
+        return [
+            (entry[0], entry[1] if isinstance(entry[1], str) else None)
+            for entry in job.data
+        ]
+
+    def _ensure_initialized(self) -> bool:
+        if not self.in_process:
+            return False
+
+        with self._lock:
+            if not self._initialized:
+                try:
+                    # Same config files the command line tool would read
+                    gdl_config.load()
+                    gdl_config.set(("output",), "mode", "null")
+                except Exception as e:
+                    logger.error(f"In-process gallery-dl setup failed: {e}")
+                    return False
+
+                self._initialized = True
+
+        return True
+
+
+engine = GalleryEngine()
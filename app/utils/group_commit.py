@@ -0,0 +1,238 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from flask import current_app
+
+from app.constants import EventType
+from app.extensions import db
+from app.models.download import Download
+from app.models.queue import QueuedDownload
+from app.schemas.download import DownloadSchema
+from app.utils.logger import logger
+
+
+@dataclass
+class PendingWrite:
+    download_id: int
+    changes: Dict[str, Any]
+    announce_record: bool
+    dequeue: bool
+    app: Any
+    future: Future = field(default_factory=Future)
+
+
+class GroupCommitWriter:
+    """
+    Gathers download record writes from every worker and commits them
+    together, so SQLite's write lock is taken once per batch instead of once
+    per item.
+
+    A batch is flushed once it holds `max_items` writes, or once its oldest
+    write has waited `max_delay` seconds. The records it changed are then
+    announced as a single UPDATE event.
+    """
+
+    def __init__(self, max_items: int = 100, max_delay: float = 0.02) -> None:
+        self.max_items = max(1, max_items)
+        self.max_delay = max(0.0, max_delay)
+
+        self._pending: List[Tuple[float, PendingWrite]] = []
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+        self._write_count = 0
+        self._flush_count = 0
+        self._failed_flush_count = 0
+
+    def write(
+        self,
+        download_id: int,
+        changes: Dict[str, Any],
+        announce_record: bool = False,
+        dequeue: bool = False,
+    ) -> Future:
+        """
+        Queues changes to a download record.
+
+        Args:
+            announce_record: Announce the whole record, instead of only the
+                values that changed.
+            dequeue: Drop the queue state of the download, once it's finalized.
+
+        Returns:
+            A Future for the (success_status, error_message, record_dict) of the
+            write, resolved once its batch has been committed.
+        """
+        pending = PendingWrite(
+            download_id=download_id,
+            changes=changes,
+            announce_record=announce_record,
+            dequeue=dequeue,
+            app=current_app._get_current_object(),  # type: ignore[attr-defined]
+        )
+
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((time.monotonic(), pending))
+
+            if len(self._pending) >= self.max_items or len(self._pending) == 1:
+                self._cond.notify()
+
+        return pending.future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_items": self.max_items,
+                "max_delay": self.max_delay,
+                "pending": len(self._pending),
+                "writes": self._write_count,
+                "flushes": self._flush_count,
+                "failed_flushes": self._failed_flush_count,
+                "average_batch": round(
+                    self._write_count / self._flush_count if self._flush_count else 0,
+                    2,
+                ),
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._work, name="group-commit-writer", daemon=True
+            )
+            self._worker.start()
+
+    def _work(self) -> None:
+        while True:
+            batch = self._next_batch()
+
+            # Writes submitted from different apps can't share a session
+            by_app: Dict[Any, List[PendingWrite]] = {}
+            for pending in batch:
+                by_app.setdefault(pending.app, []).append(pending)
+
+            for app, writes in by_app.items():
+                try:
+                    with app.app_context():
+                        self._flush(writes)
+
+                except Exception as e:
+                    logger.exception(f"Group commit failed: {e}")
+
+                    # Nobody must be left waiting on a lost write
+                    for pending in writes:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+
+    def _next_batch(self) -> List[PendingWrite]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = self._pending[0][0] + self.max_delay
+            while len(self._pending) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [pending for _, pending in self._pending[: self.max_items]]
+            del self._pending[: self.max_items]
+
+            return batch
+
+    def _flush(self, writes: List[PendingWrite]) -> None:
+        try:
+            ids = {pending.download_id for pending in writes}
+            records = {
+                record.id: record
+                for record in Download.query.filter(Download.id.in_(ids)).all()
+            }
+
+            applied: Dict[int, Dict[str, Any]] = {}
+            for pending in writes:
+                record = records.get(pending.download_id)
+                if record is None:
+                    continue
+
+                changed = applied.setdefault(record.id, {})
+                for key, value in pending.changes.items():
+                    if getattr(record, key) != value:
+                        setattr(record, key, value)
+                        changed[key] = value
+
+            dequeue_ids = [pending.download_id for pending in writes if pending.dequeue]
+            if dequeue_ids:
+                QueuedDownload.query.filter(
+                    QueuedDownload.download_id.in_(dequeue_ids)
+                ).delete(synchronize_session=False)
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+
+            err_msg = f"Failed to commit {len(writes)} download writes: {e}"
+            logger.error(err_msg)
+
+            with self._cond:
+                self._failed_flush_count += 1
+
+            for pending in writes:
+                pending.future.set_result((False, err_msg, None))
+            return
+
+        schema = DownloadSchema()
+        dumps = {
+            record_id: cast(Dict[str, Any], schema.dump(record))
+            for record_id, record in records.items()
+        }
+
+        with self._cond:
+            self._write_count += len(writes)
+            self._flush_count += 1
+
+        self._announce(writes, dumps, applied)
+
+        for pending in writes:
+            record_dict = dumps.get(pending.download_id)
+            if record_dict is None:
+                pending.future.set_result(
+                    (False, f"Download ID {pending.download_id} not found.", None)
+                )
+            else:
+                pending.future.set_result((True, None, record_dict))
+
+    @staticmethod
+    def _announce(
+        writes: List[PendingWrite],
+        dumps: Dict[int, Dict[str, Any]],
+        applied: Dict[int, Dict[str, Any]],
+    ) -> None:
+        """
+        Announces every record of the batch once. A whole record covers any
+        partial change made to it in the same batch.
+        """
+        updates: Dict[int, Dict[str, Any]] = {}
+        for pending in writes:
+            record_id = pending.download_id
+            if record_id not in dumps:
+                continue
+
+            if pending.announce_record:
+                updates[record_id] = dumps[record_id]
+            elif record_id not in updates and applied[record_id]:
+                updates[record_id] = {"id": record_id, **applied[record_id]}
+
+        if not updates:
+            return
+
+        try:
+            current_app.config["ANNOUNCER"].announce(
+                EventType.UPDATE, list(updates.values())
+            )
+        except Exception as e:
+            logger.warning(f"Announcer failed: {e}")
@@ -0,0 +1,275 @@
+import codecs
+import html
+import re
+from typing import Dict, List, Optional
+
+# Tags whose content is never markup
+RAW_TEXT_TAGS = {"script", "style", "title", "textarea"}
+
+# A meta charset further in than this is ignored, like browsers do (roughly)
+PRESCAN_BYTES = 4096
+
+# Longer "tags" are treated as a stray '<' instead of waiting for their end
+MAX_TAG_LENGTH = 8 * 1024
+
+_TAG_RE = re.compile(
+    r"<(/?)([a-zA-Z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>",
+)
+_TAG_START_RE = re.compile(r"</?[a-zA-Z]")
+_END_TAG_RES = {tag: re.compile(f"</{tag}", re.IGNORECASE) for tag in RAW_TEXT_TAGS}
+_ATTR_RE = re.compile(r"([^\s/>\"'=]+)(?:\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s>]*))?")
+
+
+def get_charset(content_type: str) -> Optional[str]:
+    """Extracts the charset parameter of a Content-Type value."""
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.strip().lower() == "charset":
+            return value.strip("\"' ") or None
+
+    return None
+
+
+def is_html_content_type(content_type: str) -> bool:
+    """Whether a body might be HTML, generic octet-streams included."""
+    content_type = content_type.lower()
+    return any(
+        kind in content_type
+        for kind in ("text/html", "application/xhtml", "octet-stream")
+    )
+
+
+def normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """Returns the canonical codec name, or None if it isn't supported."""
+    if not name:
+        return None
+
+    try:
+        encoding = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+
+    # A page that could be parsed as ASCII can't actually be UTF-16
+    if encoding.startswith("utf-16"):
+        return "utf-8"
+
+    return encoding
+
+
+class TitleExtractor:
+    """
+    Finds the title of an HTML document, fed in chunks as it downloads.
+
+    Every byte is decoded and scanned once, except for the first
+    PRESCAN_BYTES, which are decoded again if a meta charset switches the
+    encoding. Parsing stops at the first non-empty <title>, the og:title meta
+    tag, or the end of the head, whichever comes first.
+    """
+
+    def __init__(self, encoding: Optional[str] = None) -> None:
+        # An encoding from the headers wins over the document's own
+        self._locked = normalize_encoding(encoding) is not None
+        self._encoding = normalize_encoding(encoding) or "utf-8"
+
+        self._prescan: Optional[bytearray] = bytearray()
+        self._pending_encoding: Optional[str] = None
+        self._text: str
+        self.done: bool
+
+        self._reset()
+
+    @property
+    def title(self) -> Optional[str]:
+        return self._title or self._og_title
+
+    @property
+    def encoding(self) -> str:
+        return self._encoding
+
+    def feed(self, data: bytes) -> bool:
+        """
+        Parses the next chunk of the document.
+
+        Returns:
+            Whether the title has been found, or can't be anymore.
+        """
+        if self.done:
+            return True
+
+        if self._prescan is not None:
+            self._prescan += data
+
+        self._text += self._decoder.decode(data)
+        self._parse()
+
+        if self._pending_encoding is not None and self._prescan is not None:
+            # Start over with the right encoding, it can only happen once
+            self._encoding = self._pending_encoding
+            self._locked = True
+            self._reset()
+
+            self._text = self._decoder.decode(bytes(self._prescan))
+            self._parse()
+
+        if self._prescan is not None and len(self._prescan) > PRESCAN_BYTES:
+            self._prescan = None
+
+        return self.done
+
+    def _reset(self) -> None:
+        self._decoder = codecs.getincrementaldecoder(self._encoding)(errors="replace")
+        self._pending_encoding = None
+
+        # Decoded text that hasn't been consumed yet
+        self._text = ""
+        # Where to resume searching in _text for the end of an open construct
+        self._resume = 0
+
+        self._raw_tag: Optional[str] = None
+        self._title_parts: List[str] = []
+        self._title: Optional[str] = None
+        self._og_title: Optional[str] = None
+
+        self.done = False
+
+    def _parse(self) -> None:
+        while not self.done and self._pending_encoding is None:
+            if self._raw_tag is not None:
+                if not self._parse_raw_text(self._raw_tag):
+                    return
+            elif not self._parse_markup():
+                return
+
+    def _parse_raw_text(self, tag: str) -> bool:
+        """Skips (or collects, for the title) text up to the closing tag."""
+        marker = f"</{tag}"
+        match = _END_TAG_RES[tag].search(self._text, self._resume)
+
+        if match is None:
+            # Keep what could be the start of a split closing tag
+            consumed = max(0, len(self._text) - len(marker) + 1)
+            if tag == "title":
+                self._title_parts.append(self._text[:consumed])
+
+            self._text = self._text[consumed:]
+            self._resume = 0
+            return False
+
+        if tag == "title":
+            self._title_parts.append(self._text[: match.start()])
+
+        # The closing tag itself is handled as markup
+        self._raw_tag = None
+        self._text = self._text[match.start() :]
+        self._resume = 0
+        return True
+
+    def _parse_markup(self) -> bool:
+        text = self._text
+
+        start = text.find("<")
+        if start == -1:
+            self._text = ""
+            return False
+
+        if len(text) - start < 4:
+            # Not enough data to tell what this is yet
+            return self._wait(start, 0)
+
+        if text.startswith("<!--", start):
+            end = text.find("-->", max(start + 4, self._resume))
+            if end == -1:
+                return self._wait(start, len("-->"))
+            return self._consume(end + len("-->"))
+
+        if text.startswith(("<!", "<?"), start):
+            end = text.find(">", max(start, self._resume))
+            if end == -1:
+                return self._wait(start, 1)
+            return self._consume(end + 1)
+
+        match = _TAG_RE.match(text, start)
+        if match is None:
+            if _TAG_START_RE.match(text, start) and len(text) - start < MAX_TAG_LENGTH:
+                # An unfinished tag
+                return self._wait(start, 0)
+
+            # A stray '<'
+            return self._consume(start + 1)
+
+        self._consume(match.end())
+
+        is_end_tag, tag = match.group(1) == "/", match.group(2).lower()
+        if is_end_tag:
+            self._handle_end_tag(tag)
+        else:
+            self._handle_start_tag(tag, self._parse_attrs(match.group(3)))
+
+        return True
+
+    def _wait(self, start: int, needle_length: int) -> bool:
+        """
+        Keeps an unfinished construct around until more data comes in. The
+        search for its `needle_length` long end resumes where it left off.
+        """
+        self._text = self._text[start:]
+        self._resume = (
+            max(0, len(self._text) - needle_length + 1) if needle_length else 0
+        )
+        return False
+
+    def _consume(self, end: int) -> bool:
+        self._text = self._text[end:]
+        self._resume = 0
+        return True
+
+    @staticmethod
+    def _parse_attrs(raw_attrs: str) -> Dict[str, str]:
+        attrs: Dict[str, str] = {}
+        for name, value in _ATTR_RE.findall(raw_attrs):
+            if value[:1] in ("'", '"'):
+                value = value[1:-1]
+            attrs.setdefault(name.lower(), html.unescape(value))
+
+        return attrs
+
+    def _handle_start_tag(self, tag: str, attrs: Dict[str, str]) -> None:
+        if tag in RAW_TEXT_TAGS:
+            self._raw_tag = tag
+            self._title_parts = []
+
+        elif tag == "meta":
+            self._handle_meta(attrs)
+
+        elif tag == "body":
+            self.done = True
+
+    def _handle_end_tag(self, tag: str) -> None:
+        if tag == "title":
+            title = " ".join(html.unescape("".join(self._title_parts)).split())
+            if title:
+                self._title = title
+                self.done = True
+
+        elif tag == "head":
+            self.done = True
+
+    def _handle_meta(self, attrs: Dict[str, str]) -> None:
+        if attrs.get("property", attrs.get("name", "")).lower() == "og:title":
+            og_title = " ".join(attrs.get("content", "").split())
+            if og_title:
+                self._og_title = og_title
+                self.done = True
+            return
+
+        charset = attrs.get("charset")
+        if not charset and attrs.get("http-equiv", "").lower() == "content-type":
+            charset = get_charset(attrs.get("content", ""))
+
+        encoding = normalize_encoding(charset)
+        if self._locked or encoding is None or self._prescan is None:
+            return
+
+        self._locked = True
+        if encoding != self._encoding:
+            self._pending_encoding = encoding
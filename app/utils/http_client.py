@@ -0,0 +1,169 @@
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.constants import ScraperConfig
+from app.utils.rate_limiter import is_throttle_status, parse_retry_after, rate_limiter
+from app.utils.tools import get_host
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that reports every request and every new connection.
+    Requests go through the rate limiter of their host, which is told when
+    the host throttles them.
+    """
+
+    def __init__(
+        self,
+        on_request: Callable[[str], None],
+        on_connection: Callable[[str], None],
+        **kwargs,
+    ) -> None:
+        # Needs to be set first, the constructor already creates the pools
+        self._on_request = on_request
+        self._on_connection = on_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+
+        on_connection = self._on_connection
+
+        def get_pool_host(pool) -> str:
+            # Same key as get_host() gives for the request URL
+            if pool.port in (None, 80, 443):
+                return pool.host.lower()
+            return f"{pool.host.lower()}:{pool.port}"
+
+        class _HTTPPool(HTTPConnectionPool):
+            def _new_conn(self):
+                on_connection(get_pool_host(self))
+                return super()._new_conn()
+
+        class _HTTPSPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                on_connection(get_pool_host(self))
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPPool,
+            "https": _HTTPSPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        host = get_host(request.url or "")
+        rate_limiter.acquire(host)
+
+        self._on_request(host)
+        response = super().send(request, *args, **kwargs)
+
+        if is_throttle_status(response.status_code):
+            rate_limiter.report_throttled(
+                host, parse_retry_after(response.headers.get("Retry-After"))
+            )
+        else:
+            rate_limiter.report_success(host)
+
+        return response
+
+
+class HttpClient:
+    """
+    The HTTP client shared by the scrapers of a process.
+
+    Connections are kept alive in one pool per host and reused across calls
+    and threads. Each thread gets its own Session, since Sessions aren't
+    thread-safe, but they all send through the same connection pools.
+    """
+
+    def __init__(self, pool_connections: int = 32, pool_maxsize: int = 8) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._request_counts: Counter = Counter()
+        self._connection_counts: Counter = Counter()
+
+        self.configure(pool_connections, pool_maxsize)
+
+    def configure(self, pool_connections: int, pool_maxsize: int) -> None:
+        """
+        Args:
+            pool_connections: How many hosts keep a connection pool.
+            pool_maxsize: How many idle connections are kept per host.
+        """
+        self.pool_connections = max(1, pool_connections)
+        self.pool_maxsize = max(1, pool_maxsize)
+
+        adapter = _CountingAdapter(
+            self._count_request,
+            self._count_connection,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+
+        with self._lock:
+            previous = getattr(self, "_adapter", None)
+            self._adapter = adapter
+
+            # Sessions mounted on the old adapter are replaced lazily
+            self._generation = getattr(self, "_generation", 0) + 1
+
+        if previous is not None:
+            previous.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """The Session of the current thread."""
+        session = getattr(self._local, "session", None)
+
+        if session is None or self._local.generation != self._generation:
+            session = requests.Session()
+            session.headers["User-Agent"] = ScraperConfig.USER_AGENT
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+
+            self._local.session = session
+            self._local.generation = self._generation
+
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            request_count = sum(self._request_counts.values())
+            connection_count = sum(self._connection_counts.values())
+
+            return {
+                "pool_connections": self.pool_connections,
+                "pool_maxsize": self.pool_maxsize,
+                "requests": request_count,
+                "connections": connection_count,
+                "reuse_rate": (
+                    round(1 - connection_count / request_count, 3)
+                    if request_count
+                    else 0.0
+                ),
+                "hosts": [
+                    {
+                        "host": host,
+                        "requests": self._request_counts[host],
+                        "connections": self._connection_counts[host],
+                    }
+                    for host in sorted(self._request_counts)
+                ],
+            }
+
+    def _count_request(self, host: str) -> None:
+        with self._lock:
+            self._request_counts[host] += 1
+
+    def _count_connection(self, host: str) -> None:
+        with self._lock:
+            self._connection_counts[host] += 1
+
+
+http_client = HttpClient()
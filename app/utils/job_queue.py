@@ -0,0 +1,163 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from flask import current_app
+
+from app.utils.logger import logger
+from app.utils.worker_pool import aged_priority
+
+
+@dataclass
+class Job:
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    app: Any
+    priority: int = 0
+    # The downloads the job works on, to reprioritize it while it's queued
+    item_ids: FrozenSet[int] = frozenset()
+    submit_time: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a fixed set of background worker threads.
+
+    Jobs are executed by priority, then in FIFO order, inside the application
+    context they were submitted from, so they can use the database and the
+    announcer. Like in the DownloadPool, waiting jobs gain a priority level
+    every `aging_interval` seconds, so a steady flow of urgent requests can't
+    starve the others.
+    """
+
+    def __init__(self, worker_count: int = 2, aging_interval: float = 30.0) -> None:
+        self.worker_count = max(1, worker_count)
+        self.aging_interval = max(0.0, aging_interval)
+
+        self._pending: List[Job] = []
+        # Queued and running jobs
+        self._unfinished = 0
+        self._workers: List[threading.Thread] = []
+        self._cond = threading.Condition()
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        *args,
+        priority: int = 0,
+        item_ids: Iterable[int] = (),
+        **kwargs,
+    ) -> Future:
+        """
+        Enqueues a job and returns a Future for its result.
+        Workers are started lazily on the first submission.
+
+        Args:
+            priority: Higher priority jobs are started first.
+            item_ids: The downloads the job works on, see reprioritize.
+        """
+        job = Job(
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            app=current_app._get_current_object(),  # type: ignore[attr-defined]
+            priority=priority,
+            item_ids=frozenset(item_ids),
+        )
+
+        with self._cond:
+            self._ensure_workers()
+            self._pending.append(job)
+            self._unfinished += 1
+            self._cond.notify_all()
+
+        return job.future
+
+    def reprioritize(self, item_id: int, priority: int) -> bool:
+        """
+        Changes the priority of the queued job working on the given download.
+        A job takes the highest priority of its items.
+
+        Returns:
+            Whether a queued job was found.
+        """
+        with self._cond:
+            for job in self._pending:
+                if item_id in job.item_ids:
+                    job.priority = (
+                        priority
+                        if len(job.item_ids) == 1
+                        else max(job.priority, priority)
+                    )
+                    return True
+
+        return False
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every submitted job has finished.
+
+        Returns:
+            bool: False if the timeout expired before the queue drained.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._unfinished, timeout)
+
+    @property
+    def pending_count(self) -> int:
+        """Number of jobs that are queued or running."""
+        with self._cond:
+            return self._unfinished
+
+    def _ensure_workers(self) -> None:
+        while len(self._workers) < self.worker_count:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"job-worker-{len(self._workers)}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_job(self) -> Job:
+        """Pops the job with the highest effective priority, the oldest on ties."""
+        now = time.monotonic()
+
+        best = max(
+            range(len(self._pending)),
+            key=lambda i: (
+                aged_priority(
+                    self._pending[i].priority,
+                    now - self._pending[i].submit_time,
+                    self.aging_interval,
+                ),
+                -i,
+            ),
+        )
+        return self._pending.pop(best)
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                job = self._next_job()
+
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+
+                with job.app.app_context():
+                    job.future.set_result(job.func(*job.args, **job.kwargs))
+
+            except Exception as e:
+                logger.exception(f"Job {job.func.__name__!r} failed: {e}")
+                job.future.set_exception(e)
+
+            finally:
+                with self._cond:
+                    self._unfinished -= 1
+                    self._cond.notify_all()
@@ -0,0 +1,85 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """Packs the position of a page into an opaque, URL-safe token."""
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Unpacks a token made by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Malformed cursor.") from e
+
+    if not isinstance(data, dict):
+        raise ValueError("Malformed cursor.")
+
+    return data
+
+
+def is_cursor_int(value: Any) -> bool:
+    """Whether a decoded cursor value can be bound as an SQLite integer."""
+    # JSON booleans load as ints, and SQLite integers are 64 bits
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and -(2**63) <= value < 2**63
+    )
+
+
+def keyset_page(
+    query: Any,
+    column: Any,
+    tiebreaker: Any,
+    limit: Optional[int],
+    after: Optional[Tuple[Any, Any]] = None,
+    descending: bool = True,
+) -> Tuple[List[Any], bool]:
+    """
+    Fetches a page of a query ordered by a column, continuing after the
+    (column, tiebreaker) values of the last row of the previous page.
+
+    Unlike an offset, the position is looked up in the column's index, so
+    every page costs the same however deep it is. The tiebreaker must be
+    unique, and the column must not be NULL.
+
+    Without a limit, every remaining row is fetched.
+
+    Returns:
+        A tuple of (rows, has_more).
+    """
+    if after is not None:
+        value, last_id = after
+        if column is tiebreaker:
+            position, last = column, last_id
+        else:
+            # A row value comparison, which SQLite resolves with the index
+            position, last = tuple_(column, tiebreaker), tuple_(value, last_id)
+        query = query.filter(position < last if descending else position > last)
+
+    order = [column.desc() if descending else column.asc()]
+    if column is not tiebreaker:
+        order.append(tiebreaker.desc() if descending else tiebreaker.asc())
+
+    query = query.order_by(*order)
+    if limit is None:
+        return query.all(), False
+
+    # One extra row tells whether there is a next page
+    rows = query.limit(limit + 1).all()
+
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+from app.utils.cancellation import CancelScope
+from app.utils.logger import logger
+
+
+def get_rss_bytes() -> int:
+    """Returns the current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak instead of current usage, but better than nothing (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _worker_main(conn: Connection) -> None:
+    """
+    Entry point of a warm worker process.
+    The downloaders are imported once, then jobs are served until the pipe closes.
+    """
+    from app.utils.gallery_engine import EngineMode, GalleryEngine
+
+    try:
+        import yt_dlp  # noqa: F401
+    except ImportError:
+        pass
+
+    engine = GalleryEngine(EngineMode.IN_PROCESS)
+
+    while True:
+        try:
+            task, args = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        try:
+            result = getattr(engine, task)(*args)
+            conn.send(("ok", result, get_rss_bytes()))
+        except Exception as e:
+            conn.send(("error", f"{e.__class__.__name__}: {e}", get_rss_bytes()))
+
+
+class JobCancelled(Exception):
+    """Raised when a job's worker process was killed by a cancellation."""
+
+
+class _Worker:
+    def __init__(self, context) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.job_count = 0
+        self.rss_bytes = 0
+
+    def stop(self) -> None:
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+
+
+class WarmProcessPool:
+    """
+    A pool of long-lived worker processes that keep gallery-dl (and yt-dlp)
+    imported between jobs.
+
+    Extractor code runs isolated from the server process, without paying the
+    interpreter startup and import cost of a new process per call. A worker is
+    replaced after `max_jobs` jobs, or once its memory grows past `max_rss_mb`.
+
+    A job can't be interrupted from the outside, so cancelling it kills its
+    worker, which then gets replaced like a crashed one.
+    """
+
+    def __init__(
+        self, size: int = 4, max_jobs: int = 200, max_rss_mb: int = 512
+    ) -> None:
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+
+        # Forking a threaded server is unsafe, so workers start from scratch
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+        self._job_count = 0
+        self._recycled_count = 0
+
+    def start(self) -> None:
+        """Pre-starts every worker, so the first jobs don't wait for imports."""
+        with self._lock:
+            while len(self._workers) < self.size:
+                self._spawn()
+
+    def run(self, task: str, *args, cancel: Optional[CancelScope] = None) -> Any:
+        """
+        Runs an engine method in a worker process and returns its result.
+        Blocks until a worker is free.
+
+        Args:
+            cancel: Kills the worker, if the job gets cancelled while it runs.
+
+        Raises:
+            JobCancelled: If the worker got killed that way.
+        """
+        self.start()
+        worker: _Worker = self._idle.get()
+
+        if cancel is not None:
+            cancel.attach(worker.process)
+
+        try:
+            worker.conn.send((task, args))
+            status, result, worker.rss_bytes = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            # The worker died mid-job, it can't be reused
+            self._replace(worker)
+            if cancel is not None and cancel.cancelled:
+                raise JobCancelled(f"Worker process killed: {e}") from e
+            raise RuntimeError(f"Worker process crashed: {e}") from e
+        finally:
+            if cancel is not None:
+                cancel.detach(worker.process)
+
+        if cancel is not None and cancel.cancelled:
+            # Cancelled as the job finished, the worker may be getting killed
+            self._replace(worker)
+            raise JobCancelled("Cancelled while the job finished.")
+
+        worker.job_count += 1
+        with self._lock:
+            self._job_count += 1
+
+        if worker.job_count >= self.max_jobs or worker.rss_bytes > self.max_rss_bytes:
+            logger.debug(
+                f"Recycling worker {worker.process.pid} after {worker.job_count} "
+                f"jobs ({worker.rss_bytes // (1024 * 1024)} MB)"
+            )
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+        if status == "error":
+            raise RuntimeError(result)
+
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "jobs": self._job_count,
+                "recycled": self._recycled_count,
+                "rss_mb": [w.rss_bytes // (1024 * 1024) for w in self._workers],
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers.clear()
+
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context)
+        self._workers.append(worker)
+        self._idle.put(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self._recycled_count += 1
+
+            self._spawn()
+
+        worker.stop()
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from app.constants import EventType
+from app.utils.logger import logger
+
+# Shortest time between two PROGRESS events of the same tracker, in seconds
+MIN_INTERVAL = 1.0
+
+
+def get_file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+@dataclass
+class ItemProgress:
+    id: int
+    total_files: Optional[int] = None
+    files_done: int = 0
+    bytes_done: int = 0
+    # Bytes of the file that is still being downloaded
+    bytes_in_flight: int = 0
+    current_file: Optional[str] = None
+    eta: Optional[float] = None
+    start_time: float = 0.0
+
+    def to_event(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "files_done": self.files_done,
+            "bytes_done": self.bytes_done + self.bytes_in_flight,
+            "current_file": self.current_file,
+            "eta": round(self.eta) if self.eta is not None else None,
+        }
+
+
+class ProgressTracker:
+    """
+    Collects what the downloaders report while they run, and announces it as
+    PROGRESS events, at most once every `interval` seconds.
+
+    Callbacks may come from any thread, e.g. yt-dlp's fragment downloaders,
+    so the announcer is looked up once, up front. A URL the tracker doesn't
+    know about is attributed to its only item, if it has a single one.
+    """
+
+    def __init__(
+        self,
+        ids_by_url: Dict[str, int],
+        total_files: Optional[int] = None,
+        interval: float = MIN_INTERVAL,
+    ) -> None:
+        start_time = time.monotonic()
+        self.items = {
+            url: ItemProgress(
+                id=download_id, total_files=total_files, start_time=start_time
+            )
+            for url, download_id in ids_by_url.items()
+        }
+        self.interval = interval
+
+        self._announcer = current_app.config["ANNOUNCER"]
+        self._dirty: Dict[int, ItemProgress] = {}
+        self._last_announce_time = float("-inf")
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ProgressTracker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def file_started(self, url: Optional[str], name: str) -> None:
+        with self._lock:
+            item = self._get_item(url)
+            if item is None:
+                return
+
+            item.current_file = os.path.basename(name)
+            self._touch(item)
+
+        self._announce_if_due()
+
+    def bytes_progress(
+        self, url: Optional[str], downloaded: int, eta: Optional[float] = None
+    ) -> None:
+        """Reports how much of the current file has been downloaded so far."""
+        with self._lock:
+            item = self._get_item(url)
+            if item is None:
+                return
+
+            item.bytes_in_flight = downloaded
+            if eta is not None:
+                item.eta = eta
+            self._touch(item)
+
+        self._announce_if_due()
+
+    def bytes_finished(self, url: Optional[str], size: int) -> None:
+        """Reports the size of a file once it has been downloaded in full."""
+        with self._lock:
+            item = self._get_item(url)
+            if item is None:
+                return
+
+            item.bytes_done += size
+            item.bytes_in_flight = 0
+            self._touch(item)
+
+        self._announce_if_due()
+
+    def file_done(self, url: Optional[str], path: str, count_size: bool = True) -> None:
+        """
+        Reports a finished output file.
+
+        Args:
+            count_size: Add the size of the file to the downloaded bytes. Off
+                when they have already been reported through bytes_finished.
+        """
+        size = get_file_size(path) if count_size else 0
+
+        with self._lock:
+            item = self._get_item(url)
+            if item is None:
+                return
+
+            item.files_done += 1
+            item.bytes_done += size
+            item.current_file = os.path.basename(path)
+
+            if item.total_files:
+                elapsed = time.monotonic() - item.start_time
+                remaining = max(0, item.total_files - item.files_done)
+                item.eta = elapsed / item.files_done * remaining
+
+            self._touch(item)
+
+        self._announce_if_due()
+
+    def flush(self) -> None:
+        """Announces whatever changed since the last event."""
+        self._announce(force=True)
+
+    def _get_item(self, url: Optional[str]) -> Optional[ItemProgress]:
+        if url in self.items:
+            return self.items[url]
+
+        if len(self.items) == 1:
+            return next(iter(self.items.values()))
+
+        return None
+
+    def _touch(self, item: ItemProgress) -> None:
+        self._dirty[item.id] = item
+
+    def _announce_if_due(self) -> None:
+        self._announce(force=False)
+
+    def _announce(self, force: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty:
+                return
+            if not force and now - self._last_announce_time < self.interval:
+                return
+
+            payload: List[Dict[str, Any]] = [
+                item.to_event() for item in self._dirty.values()
+            ]
+            self._dirty.clear()
+            self._last_announce_time = now
+
+        try:
+            self._announcer.announce(EventType.PROGRESS, payload)
+        except Exception as e:
+            logger.warning(f"Announcer failed: {e}")
@@ -0,0 +1,224 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Errors of gallery-dl and yt-dlp telling that a host throttles us, e.g.
+# "HttpError: '429 Too Many Requests'" or "HTTP Error 503: Service Unavailable"
+THROTTLE_PATTERNS = [
+    re.compile(r"(?:HTTP Error |HTTP |')(?:429|5\d\d)\b"),
+    re.compile(
+        r"too many requests|rate limit(?:ed)? (?:exceeded|reached)", re.IGNORECASE
+    ),
+]
+
+
+def is_throttle_status(status_code: Optional[int]) -> bool:
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def is_throttle_message(line: str) -> bool:
+    return any(pattern.search(line) for pattern in THROTTLE_PATTERNS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Reads a Retry-After header given in seconds. Dates are ignored."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class HostLimit:
+    # Requests per second, None while the host isn't limited
+    rate: Optional[float]
+    tokens: float
+    updated: float
+    backoff_until: float = 0.0
+    # Throttled responses in a row
+    strikes: int = 0
+    throttle_count: int = 0
+    wait_time: float = 0.0
+
+
+class RateLimiter:
+    """
+    Token buckets per host, shared by the scrapers and the downloaders of a
+    process, so they all slow down together once a host pushes back.
+
+    Every host starts at `rate` requests per second, with bursts of up to
+    `burst` requests. A rate of 0 leaves hosts unlimited until they throttle.
+
+    A throttled response halves the rate of its host and pauses it for as long
+    as the host's Retry-After asks for, or an exponential backoff. Each
+    request that goes through raises the rate again by RECOVERY_FACTOR, up to
+    the configured one.
+    """
+
+    MIN_RATE = 0.05
+    # The rate a throttled host gets when it wasn't limited before
+    THROTTLED_RATE = 2.0
+    RECOVERY_FACTOR = 1.1
+    BASE_BACKOFF = 5.0
+    # Even a host asking for no delay at all just pushed back
+    MIN_BACKOFF = 1.0
+
+    def __init__(
+        self, rate: float = 0, burst: int = 1, max_backoff: float = 300.0
+    ) -> None:
+        self._lock = threading.Lock()
+        self.configure(rate, burst, max_backoff)
+
+    def configure(self, rate: float, burst: int, max_backoff: float) -> None:
+        """Applies new limits, forgetting what was learned about the hosts."""
+        with self._lock:
+            self.rate = max(0.0, rate)
+            self.burst = max(1, burst)
+            self.max_backoff = max(self.BASE_BACKOFF, max_backoff)
+            self._hosts: Dict[str, HostLimit] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+    def reserve(self, host: str) -> float:
+        """
+        Takes a token from the bucket of a host, ahead of time if needed.
+
+        Returns:
+            How many seconds the caller has to wait before sending its request.
+        """
+        with self._lock:
+            # Nothing to track until an unlimited host throttles
+            if not self.rate and host not in self._hosts:
+                return 0.0
+
+            now = time.monotonic()
+            limit = self._get_limit(host, now)
+            self._refill(limit, now)
+
+            wait = max(0.0, limit.backoff_until - now)
+            if limit.rate is not None:
+                limit.tokens -= 1
+                if limit.tokens < 0:
+                    wait = max(wait, -limit.tokens / limit.rate)
+
+            limit.wait_time += wait
+            return wait
+
+    def acquire(self, host: str) -> None:
+        """Blocks until a request may be sent to the host."""
+        wait = self.reserve(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff_remaining(self, host: str) -> float:
+        with self._lock:
+            limit = self._hosts.get(host)
+            if limit is None:
+                return 0.0
+            return max(0.0, limit.backoff_until - time.monotonic())
+
+    def request_interval(self, host: str) -> Optional[float]:
+        """
+        The pause to keep between the requests of a tool that sends them on its
+        own, like gallery-dl. None while the host may be hit at full speed.
+        """
+        with self._lock:
+            limit = self._hosts.get(host)
+            if limit is None or limit.rate is None:
+                return None
+            if self.rate and limit.rate >= self.rate:
+                return None
+            return round(1 / limit.rate, 2)
+
+    def report(self, host: str, throttled: bool) -> None:
+        if throttled:
+            self.report_throttled(host)
+        else:
+            self.report_success(host)
+
+    def report_throttled(self, host: str, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            limit = self._get_limit(host, now)
+            self._refill(limit, now)
+
+            limit.strikes += 1
+            limit.throttle_count += 1
+            limit.rate = max(self.MIN_RATE, (limit.rate or self.THROTTLED_RATE) / 2)
+
+            # The host knows best how long it needs
+            if retry_after is not None:
+                backoff = min(self.max_backoff, max(self.MIN_BACKOFF, retry_after))
+            else:
+                backoff = min(
+                    self.max_backoff, self.BASE_BACKOFF * 2 ** (limit.strikes - 1)
+                )
+
+            limit.backoff_until = max(limit.backoff_until, now + backoff)
+
+            # No burst of requests once the backoff is over
+            limit.tokens = min(limit.tokens, 0)
+            limit.updated = limit.backoff_until
+
+    def report_success(self, host: str) -> None:
+        with self._lock:
+            limit = self._hosts.get(host)
+            if limit is None or limit.rate is None:
+                return
+
+            limit.strikes = 0
+
+            if self.rate and limit.rate >= self.rate:
+                return
+
+            limit.rate *= self.RECOVERY_FACTOR
+            if self.rate:
+                limit.rate = min(limit.rate, self.rate)
+            elif limit.rate >= self.THROTTLED_RATE * 2:
+                # Recovered, the host goes back to being unlimited
+                limit.rate = None
+                limit.tokens = self.burst
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "max_backoff": self.max_backoff,
+                "hosts": [
+                    {
+                        "host": host,
+                        "rate": round(limit.rate, 3) if limit.rate else None,
+                        "backoff": round(max(0.0, limit.backoff_until - now), 1),
+                        "throttled": limit.throttle_count,
+                        "wait_time": round(limit.wait_time, 1),
+                    }
+                    for host, limit in sorted(self._hosts.items())
+                ],
+            }
+
+    def _get_limit(self, host: str, now: float) -> HostLimit:
+        limit = self._hosts.get(host)
+        if limit is None:
+            limit = self._hosts[host] = HostLimit(
+                rate=self.rate or None, tokens=self.burst, updated=now
+            )
+        return limit
+
+    def _refill(self, limit: HostLimit, now: float) -> None:
+        if limit.rate is None or now <= limit.updated:
+            return
+
+        limit.tokens = min(
+            self.burst, limit.tokens + (now - limit.updated) * limit.rate
+        )
+        limit.updated = now
+
+
+rate_limiter = RateLimiter()
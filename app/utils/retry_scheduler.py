@@ -0,0 +1,150 @@
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from app.utils.logger import logger
+from app.utils.rate_limiter import THROTTLE_PATTERNS
+
+# Errors that are likely to go away on their own, as opposed to e.g. a 404
+TRANSIENT_ERROR_PATTERNS = [
+    *THROTTLE_PATTERNS,
+    re.compile(r"timed? ?out|timeout", re.IGNORECASE),
+    re.compile(
+        r"connection (?:reset|refused|aborted|error)|remote end closed|"
+        r"temporary failure in name resolution|incomplete ?read",
+        re.IGNORECASE,
+    ),
+]
+
+
+def is_transient_error(error: Optional[str]) -> bool:
+    if not error:
+        return False
+    return any(pattern.search(error) for pattern in TRANSIENT_ERROR_PATTERNS)
+
+
+class RetryScheduler:
+    """
+    Re-enqueues failed downloads whose error looks transient, after an
+    exponential backoff with jitter, up to `max_attempts` times.
+
+    The retry time of a download is stored on its record when it fails, so a
+    background thread only has to wake up once the earliest one is due. The
+    retries themselves are started by the function given to `start`.
+    """
+
+    def __init__(
+        self, max_attempts: int = 3, base_delay: float = 60, max_delay: float = 3600
+    ) -> None:
+        self.max_attempts = max(0, max_attempts)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._wake_time: Optional[float] = None
+
+        self._scheduled_count = 0
+        self._retried_count = 0
+
+    def get_retry_time(
+        self, error: Optional[str], retry_count: int, now: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        Decides when a failed download should be tried again.
+
+        Args:
+            retry_count: How many times it has been retried already.
+
+        Returns:
+            The retry time, in seconds since the epoch, or None if the error
+            isn't transient or the download ran out of attempts.
+        """
+        if retry_count >= self.max_attempts or not is_transient_error(error):
+            return None
+
+        # Half of the delay is random, so a burst of failures spreads out
+        delay = min(self.max_delay, self.base_delay * 2**retry_count)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+
+        with self._cond:
+            self._scheduled_count += 1
+
+        return int((now if now is not None else time.time()) + delay)
+
+    def start(self, retry_due: Callable[[], Optional[int]]) -> None:
+        """
+        Starts the background thread, within the current application context.
+
+        Args:
+            retry_due: Retries the downloads that are due, and returns the
+                retry time of the next one, if any.
+        """
+        app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+        with self._cond:
+            if self._worker is not None:
+                return
+
+            self._worker = threading.Thread(
+                target=self._work,
+                args=(app, retry_due),
+                name="retry-scheduler",
+                daemon=True,
+            )
+            self._worker.start()
+
+    def wake(self, retry_time: int) -> None:
+        """Makes sure the thread is up by the time a new retry is due."""
+        with self._cond:
+            if self._wake_time is None or retry_time < self._wake_time:
+                self._wake_time = retry_time
+                self._cond.notify()
+
+    def record_retries(self, count: int) -> None:
+        with self._cond:
+            self._retried_count += count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_attempts": self.max_attempts,
+                "base_delay": self.base_delay,
+                "max_delay": self.max_delay,
+                "running": self._worker is not None,
+                "next_retry_time": self._wake_time,
+                "scheduled": self._scheduled_count,
+                "retried": self._retried_count,
+            }
+
+    def _work(self, app: Any, retry_due: Callable[[], Optional[int]]) -> None:
+        while True:
+            next_time = None
+            try:
+                with app.app_context():
+                    next_time = retry_due()
+
+            except Exception as e:
+                logger.exception(f"Retrying failed downloads failed: {e}")
+                # Try again later instead of spinning on the same error
+                next_time = int(time.time() + self.base_delay)
+
+            with self._cond:
+                if next_time is not None and (
+                    self._wake_time is None or next_time < self._wake_time
+                ):
+                    self._wake_time = next_time
+
+                while self._wake_time is None or self._wake_time > time.time():
+                    timeout = (
+                        None
+                        if self._wake_time is None
+                        else self._wake_time - time.time()
+                    )
+                    self._cond.wait(timeout)
+
+                self._wake_time = None
@@ -1,19 +1,26 @@
-import html
 import json
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set
 from urllib.parse import unquote, urlparse
 
 import requests
+from flask import current_app, has_app_context
 
 from app.constants import (
     MEDIA_EXTENSIONS,
     NON_COLLECTION_PATTERNS,
     ScraperConfig,
 )
+from app.utils.async_scraper import AsyncTitleEngine
+from app.utils.gallery_engine import engine
+from app.utils.html_title import TitleExtractor, get_charset, is_html_content_type
+from app.utils.http_client import http_client
 from app.utils.logger import logger
-from app.utils.tools import run_command
+from app.utils.rate_limiter import rate_limiter
+from app.utils.tools import get_host, run_command
 
 
 def is_direct_file(url: str) -> bool:
@@ -46,73 +53,239 @@ def get_filename_from_url(url: str) -> str:
 def scrape_title(url: str, headers: Optional[Dict] = None) -> str:
     """
     Scrapes the title of a webpage OR generates a filename for direct files.
+    Titles are looked up in, and saved to, the app's TITLE_CACHE when there is
+    one, including failed lookups.
     """
-    request_headers = headers or {"User-Agent": ScraperConfig.USER_AGENT}
-
     if is_direct_file(url):
         return get_filename_from_url(url)
 
+    cache = current_app.config.get("TITLE_CACHE") if has_app_context() else None
+    if cache is not None:
+        found, cached_title = cache.get(url)
+        if found:
+            return cached_title or get_filename_from_url(url)
+
+    title: Optional[str]
     try:
-        with requests.Session() as session:
-            head_resp = session.head(
-                url,
-                headers=request_headers,
-                timeout=ScraperConfig.TIMEOUT,
-                allow_redirects=True,
-            )
-            head_resp.raise_for_status()
+        title = _fetch_title(url, headers or {"User-Agent": ScraperConfig.USER_AGENT})
+    except Exception:
+        title = None
 
-            content_type = head_resp.headers.get("Content-Type", "").lower()
+    if cache is not None:
+        cache.put(url, title)
 
-            # If explicit non-html type, abort scraping, except for generic octet-stream
-            if (
-                not content_type
-                or "text/html" not in content_type
-                and "application/xhtml" not in content_type
-            ):
-                if "octet-stream" not in content_type:
-                    return get_filename_from_url(url)
+    return title or get_filename_from_url(url)
 
-            response = session.get(
-                url, headers=request_headers, timeout=ScraperConfig.TIMEOUT, stream=True
-            )
-            response.raise_for_status()
 
-            content_accumulated = b""
+def scrape_titles(
+    urls: List[str],
+    time_budget: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, str]:
+    """
+    Bulk version of scrape_title, which resolves every URL that isn't cached
+    concurrently with the async engine.
+
+    Args:
+        time_budget: Seconds the whole batch may take. URLs that didn't finish
+            in time get a filename, and aren't cached.
+        cancel_event: Stops the batch early when set, same as running out of time.
 
-            # Read chunks until we find the title or hit the byte limit
-            for chunk in response.iter_content(chunk_size=1024):
-                content_accumulated += chunk
+    Returns:
+        The title of every URL.
+    """
+    titles: Dict[str, str] = {}
+    to_fetch: List[str] = []
 
-                text_chunk = content_accumulated.decode("utf-8", errors="ignore")
+    cache = current_app.config.get("TITLE_CACHE") if has_app_context() else None
 
-                # re.DOTALL allows matching across newlines
-                match = re.search(
-                    r"<title>(.*?)</title>", text_chunk, re.IGNORECASE | re.DOTALL
-                )
+    for url in dict.fromkeys(urls):
+        if is_direct_file(url):
+            titles[url] = get_filename_from_url(url)
+            continue
+
+        if cache is not None:
+            found, cached_title = cache.get(url)
+            if found:
+                titles[url] = cached_title or get_filename_from_url(url)
+                continue
 
-                if match:
-                    raw_title = match.group(1).strip()
-                    return html.unescape(raw_title)
+        to_fetch.append(url)
 
-                if len(content_accumulated) > ScraperConfig.MAX_BYTES_TO_READ:
-                    break
+    if not to_fetch:
+        return titles
+
+    probes = AsyncTitleEngine().resolve(
+        to_fetch,
+        ScraperConfig.BULK_TIME_BUDGET if time_budget is None else time_budget,
+        cancel_event,
+    )
+
+    to_cache: Dict[str, Optional[str]] = {}
+    for url, probe in probes.items():
+        # Same as scrape_title: failures are None, anything else gets a title
+        title = None if probe.error else probe.title or get_filename_from_url(url)
+        titles[url] = title or get_filename_from_url(url)
+
+        if not probe.cancelled:
+            to_cache[url] = title
+
+    if cache is not None:
+        cache.put_many(to_cache)
+
+    return titles
+
+
+# Statuses telling that the ranged GET itself was rejected. Some servers
+# answer a Range they don't support with a plain 400.
+RANGE_REJECTED_CODES = {400, 405, 416, 501}
+
+# Hosts that need a HEAD request before the GET
+_head_probe_hosts: Set[str] = set()
+_head_probe_lock = threading.Lock()
+
+
+def _fetch_title(url: str, request_headers: Dict) -> str:
+    """
+    Fetches the title of a webpage, falling back to a filename for pages that
+    aren't HTML or have no title. Raises on network and HTTP errors.
 
+    A single ranged GET is tried first. Hosts that reject it, but answer a HEAD
+    followed by a plain GET, get the latter from then on. Any other error,
+    like a 404 or a throttled request, is raised right away.
+    """
+    host = get_host(url)
+    if host in _head_probe_hosts:
+        return _fetch_title_with_head(url, request_headers)
+
+    try:
+        return _fetch_title_with_get(url, request_headers)
+    except requests.HTTPError as e:
+        status_code = e.response.status_code if e.response is not None else None
+        if status_code not in RANGE_REJECTED_CODES:
+            raise
+
+        title = _fetch_title_with_head(url, request_headers)
+
+        logger.debug(f"Probing {host!r} with HEAD requests from now on: {e}")
+        with _head_probe_lock:
+            _head_probe_hosts.add(host)
+
+        return title
+
+
+def _fetch_title_with_get(url: str, request_headers: Dict) -> str:
+    """
+    Decides from the headers of a single GET whether to read the body at all.
+    The Range header keeps servers from sending more than will be parsed.
+    """
+    range_headers = {
+        **request_headers,
+        "Range": f"bytes=0-{ScraperConfig.MAX_BYTES_TO_READ - 1}",
+    }
+
+    with http_client.session.get(
+        url, headers=range_headers, timeout=ScraperConfig.TIMEOUT, stream=True
+    ) as response:
+        response.raise_for_status()
+
+        if not is_html_content_type(response.headers.get("Content-Type", "")):
+            # Leaving the body unread closes the connection, that's still
+            # cheaper than transferring a whole file
             return get_filename_from_url(url)
 
-    except Exception:
+        return _read_title(response) or get_filename_from_url(url)
+
+
+def _fetch_title_with_head(url: str, request_headers: Dict) -> str:
+    """Checks the content type with a HEAD request before sending a GET."""
+    session = http_client.session
+
+    head_resp = session.head(
+        url,
+        headers=request_headers,
+        timeout=ScraperConfig.TIMEOUT,
+        allow_redirects=True,
+    )
+    head_resp.raise_for_status()
+
+    if not is_html_content_type(head_resp.headers.get("Content-Type", "")):
         return get_filename_from_url(url)
 
+    with session.get(
+        url, headers=request_headers, timeout=ScraperConfig.TIMEOUT, stream=True
+    ) as response:
+        response.raise_for_status()
 
-def expand_collection_urls(url: str, depth: int = 0) -> List[str]:
+        return _read_title(response) or get_filename_from_url(url)
+
+
+def _read_title(response: requests.Response) -> Optional[str]:
+    """Parses a streamed response body until its title is found."""
+    extractor = TitleExtractor(get_charset(response.headers.get("Content-Type", "")))
+    bytes_read = 0
+
+    # Parse chunks until we find the title or hit the byte limit
+    chunks = response.iter_content(chunk_size=8 * 1024)
+    for chunk in chunks:
+        bytes_read += len(chunk)
+
+        if extractor.feed(chunk) or bytes_read > ScraperConfig.MAX_BYTES_TO_READ:
+            break
+
+    _drain(chunks)
+
+    return extractor.title
+
+
+def _drain(chunks: Iterator[bytes]) -> None:
     """
-    Determines if a URL is a collection and expands it.
-    Rejects direct file urls and known patterns.
+    Reads the rest of a short response, so its connection goes back to the
+    pool instead of being closed.
+    """
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained > ScraperConfig.MAX_BYTES_TO_DRAIN:
+            break
+
+
+def _simulate_with_command(url: str) -> Optional[List[Any]]:
     """
+    Runs 'gallery-dl -s -j' and parses its JSON output.
+    Returns None if the command failed.
+    """
+    cmd = ["gallery-dl", "-s", "-j", url]
+    result = run_command(cmd)
+    if not result.success:
+        return None
+
+    output_str = result.output.strip() if result.output else ""
+    if not output_str:
+        return []
 
-    if depth > 3:
+    # Filter out lines matching [anything][anything]
+    clean_lines = [
+        line
+        for line in output_str.splitlines()
+        if not re.match(r"\[.+\]\[.+\]", line.strip())
+    ]
+
+    cleaned_output = "\n".join(clean_lines).strip()
+    if not cleaned_output:
         return []
 
+    return json.loads(cleaned_output)
+
+
+def simulate_collection(url: str) -> Optional[List[str]]:
+    """
+    Runs a single gallery-dl simulation and returns the direct children of a
+    collection URL, in the order gallery-dl reports them.
+    Rejects direct file urls and known patterns.
+
+    Returns None if the simulation failed, so the outcome isn't cached.
+    """
     if is_direct_file(url):
         logger.debug(f"Fast-path: skipping expansion for direct file: {url}")
         return []
@@ -121,28 +294,14 @@ def expand_collection_urls(url: str, depth: int = 0) -> List[str]:
         logger.debug(f"Fast-path: skipping expansion for known single-item: {url}")
         return []
 
-    try:
-        cmd = ["gallery-dl", "-s", "-j", url]
-        result = run_command(cmd)
-        if not result.success:
-            return []
+    rate_limiter.acquire(get_host(url))
 
-        output_str = result.output.strip() if result.output else ""
-        if output_str:
-            # Filter out lines matching [anything][anything]
-            clean_lines = [
-                line
-                for line in output_str.splitlines()
-                if not re.match(r"\[.+\]\[.+\]", line.strip())
-            ]
-
-            cleaned_output = "\n".join(clean_lines).strip()
-            if not cleaned_output:
-                return []
-
-            data = json.loads(cleaned_output)
-        else:
-            return []
+    try:
+        data = engine.simulate(url)
+        if data is None:
+            data = _simulate_with_command(url)
+        if data is None:
+            return None
 
         # If there is only ONE unique level (e.g., all are level 6), it is probably
         # a collection of gallery links.
@@ -163,10 +322,84 @@ def expand_collection_urls(url: str, depth: int = 0) -> List[str]:
                 c_url = entry[1]
                 if c_url != url:  # Prevent self-reference loops
                     child_urls.append(c_url)
-                    child_urls.extend(expand_collection_urls(c_url, depth + 1))
 
-        return list(dict.fromkeys(child_urls))
+        return child_urls
 
     except Exception:
         logger.exception(f"Expansion error for {url}")
+        return None
+
+
+def expand_collection_urls(url: str, depth: int = 0) -> List[str]:
+    """
+    Determines if a URL is a collection and expands it, down to
+    ScraperConfig.MAX_EXPANSION_DEPTH.
+
+    Each level of the tree is simulated concurrently and every URL is simulated
+    at most once. Simulations are looked up in, and saved to, the app's
+    EXPANSION_CACHE when there is one. The result keeps the depth-first order:
+    a child is followed by its own descendants before its next sibling.
+    """
+    max_depth = ScraperConfig.MAX_EXPANSION_DEPTH
+    if depth > max_depth:
         return []
+
+    # Shared frontier: URL -> direct children, filled level by level
+    children_map: Dict[str, List[str]] = {}
+
+    frontier = [url]
+    level = depth
+
+    cache = current_app.config.get("EXPANSION_CACHE") if has_app_context() else None
+
+    with ThreadPoolExecutor(max_workers=ScraperConfig.EXPANSION_WORKERS) as executor:
+        while frontier and level <= max_depth:
+            to_expand = [u for u in dict.fromkeys(frontier) if u not in children_map]
+
+            # The fast paths are cheaper than a cache lookup
+            to_simulate = [
+                u
+                for u in to_expand
+                if not (is_direct_file(u) or is_known_single_item(u))
+            ]
+            if cache is not None:
+                children_map.update(cache.get_many(to_simulate))
+                to_simulate = [u for u in to_simulate if u not in children_map]
+
+            simulated = dict(
+                zip(to_simulate, executor.map(simulate_collection, to_simulate))
+            )
+            if cache is not None:
+                cache.put_many(
+                    {
+                        u: children
+                        for u, children in simulated.items()
+                        if children is not None
+                    }
+                )
+
+            for u in to_expand:
+                if u not in children_map:
+                    children_map[u] = simulated.get(u) or []
+
+            frontier = [c for u in to_expand for c in children_map[u]]
+            level += 1
+
+    # Rebuild the depth-first order from the expanded tree
+    child_urls: List[str] = []
+    shallowest_visit: Dict[str, int] = {}
+
+    def walk(parent_url: str, parent_depth: int) -> None:
+        # Revisiting a URL at the same or a deeper level can't add anything new
+        if shallowest_visit.get(parent_url, max_depth + 1) <= parent_depth:
+            return
+        shallowest_visit[parent_url] = parent_depth
+
+        for c_url in children_map.get(parent_url, []):
+            child_urls.append(c_url)
+            if parent_depth + 1 <= max_depth:
+                walk(c_url, parent_depth + 1)
+
+    walk(url, depth)
+
+    return list(dict.fromkeys(child_urls))
@@ -0,0 +1,163 @@
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app.extensions import db
+from app.models.title import TitleCacheEntry
+from app.utils.logger import logger
+from app.utils.tools import get_host
+
+
+def _now() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+class TitleCache:
+    """
+    Remembers scraped titles, with an in-memory LRU in front of a table.
+
+    Failed lookups are cached too, but only for `negative_ttl` seconds, so a
+    broken site isn't hammered while it's down. The table tier needs an
+    application context.
+    """
+
+    _COUNTERS = ("memory_hits", "db_hits", "negative_hits", "misses", "failures")
+    WRITE_CHUNK_SIZE = 500
+
+    def __init__(
+        self,
+        memory_size: int = 2048,
+        ttl: int = 30 * 24 * 60 * 60,
+        negative_ttl: int = 10 * 60,
+    ) -> None:
+        self.memory_size = max(1, memory_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        # URL -> (title, expiry time), most recently used last
+        self._memory: OrderedDict[str, Tuple[Optional[str], int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._counts: Dict[str, Counter] = {}
+
+    def get(self, url: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns:
+            A tuple of (found, title). The title is None for a cached failure.
+        """
+        now = _now()
+
+        with self._lock:
+            cached = self._memory.get(url)
+            if cached is not None and cached[1] > now:
+                self._memory.move_to_end(url)
+                self._count(
+                    url, "negative_hits" if cached[0] is None else "memory_hits"
+                )
+                return True, cached[0]
+
+        try:
+            entry = db.session.get(TitleCacheEntry, url)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Title cache lookup failed: {e}")
+            entry = None
+
+        if entry is not None:
+            expires = entry.create_time + (
+                self.negative_ttl if entry.failed else self.ttl
+            )
+            if expires > now:
+                with self._lock:
+                    self._remember(url, entry.title, expires)
+                    self._count(url, "negative_hits" if entry.failed else "db_hits")
+                return True, entry.title
+
+        with self._lock:
+            self._count(url, "misses")
+
+        return False, None
+
+    def put(self, url: str, title: Optional[str]) -> None:
+        """Stores a title, or a failed lookup if it's None."""
+        self.put_many({url: title})
+
+    def put_many(self, titles: Dict[str, Optional[str]]) -> None:
+        """Stores several titles at once, failed lookups being None."""
+        if not titles:
+            return
+
+        now = _now()
+
+        with self._lock:
+            for url, title in titles.items():
+                failed = title is None
+                self._remember(
+                    url, title, now + (self.negative_ttl if failed else self.ttl)
+                )
+                if failed:
+                    self._count(url, "failures")
+
+        rows = [
+            {"url": url, "title": title, "failed": title is None, "create_time": now}
+            for url, title in titles.items()
+        ]
+
+        try:
+            # Chunked to stay below SQLite's bound parameter limit
+            for i in range(0, len(rows), self.WRITE_CHUNK_SIZE):
+                stmt = insert(TitleCacheEntry).values(
+                    rows[i : i + self.WRITE_CHUNK_SIZE]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[TitleCacheEntry.url],
+                    set_={
+                        "title": stmt.excluded.title,
+                        "failed": stmt.excluded.failed,
+                        "create_time": stmt.excluded.create_time,
+                    },
+                )
+                db.session.execute(stmt)
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Title cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._counts.clear()
+
+        TitleCacheEntry.query.delete()
+        db.session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total: Counter = Counter()
+            for counts in self._counts.values():
+                total.update(counts)
+
+            return {
+                "memory_entries": len(self._memory),
+                "memory_size": self.memory_size,
+                **{key: total[key] for key in self._COUNTERS},
+                "domains": [
+                    {"domain": domain, **{key: counts[key] for key in self._COUNTERS}}
+                    for domain, counts in sorted(self._counts.items())
+                ],
+            }
+
+    def _remember(self, url: str, title: Optional[str], expires: int) -> None:
+        self._memory[url] = (title, expires)
+        self._memory.move_to_end(url)
+
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _count(self, url: str, key: str) -> None:
+        self._counts.setdefault(get_host(url), Counter())[key] += 1
@@ -1,14 +1,19 @@
 import secrets
 import subprocess
 from dataclasses import asdict, dataclass, field
-from typing import List, Optional
+from typing import TYPE_CHECKING, Callable, List, Optional
+from urllib.parse import urlparse
 
 from app.utils.logger import logger
 
+if TYPE_CHECKING:
+    from app.utils.cancellation import CancelScope
+
 
 @dataclass
 class DownloadReportItem:
     url: Optional[str] = None
+    id: Optional[int] = None
     status: bool = True
     error: Optional[str] = None
     warnings: List[str] = field(default_factory=list)
@@ -52,6 +57,14 @@ def recursive_camelize(data):
     return data
 
 
+def get_host(url: str) -> str:
+    """
+    Returns the lowercased netloc of a URL. Work is limited and throttled
+    per host, and downloads are filtered by it.
+    """
+    return urlparse(url).netloc.lower()
+
+
 @dataclass
 class CommandResult:
     return_code: int
@@ -65,8 +78,19 @@ class CommandResult:
         return self.output
 
 
-def run_command(command: List[str]) -> CommandResult:
-    """Run a shell command and return its result."""
+def run_command(
+    command: List[str],
+    on_line: Optional[Callable[[str], None]] = None,
+    cancel: Optional["CancelScope"] = None,
+) -> CommandResult:
+    """
+    Run a shell command and return its result.
+
+    Args:
+        on_line: Called with each output line as soon as it's printed. The
+            output isn't kept then, so the result's output is empty.
+        cancel: Kills the process once cancelled.
+    """
     cmd_identifier = secrets.token_hex(5)  # 8 hex chars
 
     logger.debug(f"Running {command} with id '{cmd_identifier}'")
@@ -79,12 +103,24 @@ def run_command(command: List[str]) -> CommandResult:
         universal_newlines=True,
         bufsize=1,
     ) as process:
-        if process.stdout is not None:
-            for line in process.stdout:
-                output.append(line)
-                logger.debug(line.strip())
+        if cancel is not None:
+            cancel.attach(process)
+
+        try:
+            if process.stdout is not None:
+                for line in process.stdout:
+                    logger.debug(line.strip())
+
+                    if on_line is not None:
+                        on_line(line)
+                    else:
+                        output.append(line)
+
+            return_code = process.wait()
 
-        return_code = process.wait()
+        finally:
+            if cancel is not None:
+                cancel.detach(process)
 
     logger.debug(
         f"Command with id '{cmd_identifier}' finished with return code {return_code}"
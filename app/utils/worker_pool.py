@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from flask import current_app
+
+from app.utils.logger import logger
+from app.utils.rate_limiter import rate_limiter
+from app.utils.tools import get_host
+
+
+def aged_priority(priority: int, waited: float, aging_interval: float) -> float:
+    """A priority, raised by one for every `aging_interval` spent waiting."""
+    if aging_interval <= 0:
+        return priority
+    return priority + waited / aging_interval
+
+
+@dataclass
+class PoolTask:
+    host: str
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    app: Any
+    priority: int = 0
+    # The downloads the task works on, to reprioritize it while it's queued
+    item_ids: FrozenSet[int] = frozenset()
+    submit_time: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+    def effective_priority(self, now: float, aging_interval: float) -> float:
+        """The priority, raised by one for every `aging_interval` spent queued."""
+        return aged_priority(self.priority, now - self.submit_time, aging_interval)
+
+
+class DownloadPool:
+    """
+    A bounded thread pool that also caps how many tasks run against the same
+    host at once.
+
+    Tasks whose host is saturated stay queued without occupying a worker, so
+    items from other hosts can overtake them.
+
+    Queued tasks are picked by priority, then in submission order. Waiting
+    tasks age, gaining a priority level every `aging_interval` seconds, so
+    low priority work can't be starved by a steady flow of urgent items.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        aging_interval: float = 30.0,
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.aging_interval = max(0.0, aging_interval)
+
+        self._pending: List[PoolTask] = []
+        self._active_hosts: Counter = Counter()
+        self._workers: List[threading.Thread] = []
+        self._cond = threading.Condition()
+        self._retry_in: Optional[float] = None
+
+        self._completed_count = 0
+        self._failed_count = 0
+
+    def submit(
+        self,
+        url: str,
+        func: Callable[..., Any],
+        *args,
+        priority: int = 0,
+        item_ids: Iterable[int] = (),
+        **kwargs,
+    ) -> Future:
+        """
+        Enqueues a task for the host of the given URL.
+        The task runs inside the application context it was submitted from.
+
+        Args:
+            priority: Higher priority tasks are started first.
+            item_ids: The downloads the task works on, see reprioritize.
+        """
+        task = PoolTask(
+            host=get_host(url),
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            app=current_app._get_current_object(),  # type: ignore[attr-defined]
+            priority=priority,
+            item_ids=frozenset(item_ids),
+        )
+
+        with self._cond:
+            self._ensure_workers()
+            self._pending.append(task)
+            self._cond.notify()
+
+        return task.future
+
+    def reprioritize(self, item_id: int, priority: int) -> bool:
+        """
+        Changes the priority of the queued task working on the given download.
+        A batch takes the highest priority of its items.
+
+        Returns:
+            Whether a queued task was found.
+        """
+        with self._cond:
+            for task in self._pending:
+                if item_id in task.item_ids:
+                    task.priority = (
+                        priority
+                        if len(task.item_ids) == 1
+                        else max(task.priority, priority)
+                    )
+                    return True
+
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns a snapshot of the pool utilization."""
+        with self._cond:
+            active = sum(self._active_hosts.values())
+            queued_hosts = Counter(task.host for task in self._pending)
+
+            return {
+                "max_workers": self.max_workers,
+                "per_host_limit": self.per_host_limit,
+                "aging_interval": self.aging_interval,
+                "active": active,
+                "queued": len(self._pending),
+                "utilization": round(active / self.max_workers, 3),
+                "completed": self._completed_count,
+                "failed": self._failed_count,
+                "hosts": [
+                    {
+                        "host": host,
+                        "active": self._active_hosts[host],
+                        "queued": queued_hosts[host],
+                    }
+                    for host in sorted(set(self._active_hosts) | set(queued_hosts))
+                ],
+            }
+
+    def _ensure_workers(self) -> None:
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"download-worker-{len(self._workers)}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_task(self) -> Optional[PoolTask]:
+        """
+        Pops the task with the highest effective priority whose host still has
+        a free slot and isn't backing off. Ties go to the oldest one.
+
+        When the only waiting tasks belong to hosts that back off, the time
+        until the first one may run again is left in `_retry_in`.
+        """
+        now = time.monotonic()
+        best_index, best_priority = None, 0.0
+        backoffs: Dict[str, float] = {}
+
+        for i, task in enumerate(self._pending):
+            if self._active_hosts[task.host] >= self.per_host_limit:
+                continue
+
+            if task.host not in backoffs:
+                backoffs[task.host] = rate_limiter.backoff_remaining(task.host)
+            if backoffs[task.host] > 0:
+                continue
+
+            priority = task.effective_priority(now, self.aging_interval)
+            if best_index is None or priority > best_priority:
+                best_index, best_priority = i, priority
+
+        if best_index is None:
+            waits = [wait for wait in backoffs.values() if wait > 0]
+            self._retry_in = min(waits) if waits else None
+            return None
+
+        return self._pending.pop(best_index)
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait(timeout=self._retry_in)
+                    task = self._next_task()
+
+                self._active_hosts[task.host] += 1
+
+            result, error = None, None
+            try:
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+
+                with task.app.app_context():
+                    result = task.func(*task.args, **task.kwargs)
+
+            except Exception as e:
+                logger.exception(f"Pool task for {task.host!r} failed: {e}")
+                error = e
+
+            finally:
+                # Free the slot before resolving, so the stats are already
+                # up to date for whoever waits on the future
+                with self._cond:
+                    self._active_hosts[task.host] -= 1
+                    if self._active_hosts[task.host] <= 0:
+                        del self._active_hosts[task.host]
+
+                    if error is not None:
+                        self._failed_count += 1
+                    elif task.future.running():
+                        self._completed_count += 1
+
+                    # A host slot was freed, so a waiting task may be eligible now
+                    self._cond.notify_all()
+
+            if error is not None:
+                task.future.set_exception(error)
+            else:
+                task.future.set_result(result)
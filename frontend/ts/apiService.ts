@@ -1,17 +1,93 @@
-import { API_SECRET_KEY, API_DOWNLOADS } from "./constants";
+import {
+    API_SECRET_KEY,
+    API_DOWNLOADS,
+    API_DOWNLOADS_CANCEL,
+    API_DOWNLOADS_SEARCH,
+    NEXT_CURSOR_HEADER,
+} from "./constants";
+
+export type DownloadsPage = { payload: any; nextCursor: string | null };
+
+async function fetchPage(
+    endpoint: string,
+    params: URLSearchParams
+): Promise<DownloadsPage> {
+    const response = await fetch(`${endpoint}?${params}`, {
+        method: "GET",
+        headers: {
+            "Content-Type": "application/json",
+            "X-API-Key": API_SECRET_KEY,
+        },
+    });
+
+    if (!response.ok) {
+        throw new Error(`API Error: ${response.status} ${response.statusText}`);
+    }
+
+    return {
+        payload: await response.json(),
+        nextCursor: response.headers.get(NEXT_CURSOR_HEADER),
+    };
+}
+
+/**
+ * Fetches a page of downloads from the API, newest first.
+ * @param limit - The page size.
+ * @param cursor - Where the page starts, as returned with the previous one.
+ * @returns The JSON response payload, and the cursor of the next page, if any.
+ */
+export async function fetchDownloads(
+    limit: number,
+    cursor: string | null = null
+): Promise<DownloadsPage> {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set("cursor", cursor);
+
+    try {
+        return await fetchPage(API_DOWNLOADS, params);
+    } catch (error) {
+        console.error("Failed to fetch downloads:", error);
+        throw error;
+    }
+}
+
+/**
+ * Fetches a page of the downloads matching a search, best matches first.
+ * @param query - The words to look for in titles, URLs and status messages.
+ * @param limit - The page size.
+ * @param cursor - Where the page starts, as returned with the previous one.
+ * @returns The JSON response payload, and the cursor of the next page, if any.
+ */
+export async function searchDownloads(
+    query: string,
+    limit: number,
+    cursor: string | null = null
+): Promise<DownloadsPage> {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    if (cursor) params.set("cursor", cursor);
+
+    try {
+        return await fetchPage(API_DOWNLOADS_SEARCH, params);
+    } catch (error) {
+        console.error("Failed to search downloads:", error);
+        throw error;
+    }
+}
 
 /**
- * Fetches the list of downloads from the API.
+ * Bulk deletes downloads by their IDs.
+ * @param ids - An array of download IDs to delete.
  * @returns The JSON response payload.
  */
-export async function fetchDownloads(): Promise<object> {
+export async function deleteDownloads(ids: Array<number>): Promise<object> {
     try {
         const response = await fetch(API_DOWNLOADS, {
-            method: "GET",
+            method: "DELETE",
             headers: {
                 "Content-Type": "application/json",
                 "X-API-Key": API_SECRET_KEY,
             },
+            body: JSON.stringify({ ids }),
         });
 
         if (!response.ok) {
@@ -22,20 +98,20 @@ export async function fetchDownloads(): Promise<object> {
 
         return await response.json();
     } catch (error) {
-        console.error("Failed to fetch downloads:", error);
+        console.error("Failed to delete downloads:", error);
         throw error;
     }
 }
 
 /**
- * Bulk deletes downloads by their IDs.
- * @param ids - An array of download IDs to delete.
+ * Cancels unfinished downloads by their IDs, along with their queued children.
+ * @param ids - An array of download IDs to cancel.
  * @returns The JSON response payload.
  */
-export async function deleteDownloads(ids: Array<number>): Promise<object> {
+export async function cancelDownloads(ids: Array<number>): Promise<object> {
     try {
-        const response = await fetch(API_DOWNLOADS, {
-            method: "DELETE",
+        const response = await fetch(API_DOWNLOADS_CANCEL, {
+            method: "POST",
             headers: {
                 "Content-Type": "application/json",
                 "X-API-Key": API_SECRET_KEY,
@@ -51,7 +127,7 @@ export async function deleteDownloads(ids: Array<number>): Promise<object> {
 
         return await response.json();
     } catch (error) {
-        console.error("Failed to delete downloads:", error);
+        console.error("Failed to cancel downloads:", error);
         throw error;
     }
 }
@@ -58,10 +58,13 @@ export class BaseDataTable {
         this.dom.container.append(tableWrapper);
     }
 
+    // Rows go to the top of the table, or to the bottom when appending the
+    // older rows of a page that was just loaded
     _addEntries(
         entriesData: any,
         RowClass: typeof BaseDataRow,
-        tableRef: this
+        tableRef: this,
+        append = false
     ) {
         console.log(entriesData);
         const fragment = document.createDocumentFragment();
@@ -81,10 +84,17 @@ export class BaseDataTable {
                 const entry = new RowClass(entryData, tableRef);
 
                 this.entryMap.set(id, entry);
-                this.entryList.unshift(entry);
 
                 const rowEl = entry.render();
 
+                if (append) {
+                    this.entryList.push(entry);
+                    fragment.append(rowEl);
+                    continue;
+                }
+
+                this.entryList.unshift(entry);
+
                 // Handle animations
                 if (!isFirstCall) {
                     rowEl.classList.add("row-fade-in");
@@ -109,7 +119,11 @@ export class BaseDataTable {
         }
 
         if (this.dom.body) {
-            this.dom.body.prepend(fragment);
+            if (append) {
+                this.dom.body.append(fragment);
+            } else {
+                this.dom.body.prepend(fragment);
+            }
         }
 
         this.isSorted = false;
@@ -313,6 +327,16 @@ export class BaseDataTable {
         return deletedIds;
     }
 
+    // Removes every row, e.g. before showing the results of a search
+    clear() {
+        this.entryList.forEach((entry) => entry.remove());
+        this.entryMap.clear();
+        this.entryList = [];
+
+        this.selectedCount = 0;
+        this.updateHeaderCheckbox();
+    }
+
     async copyFields(field: string, unique = true) {
         const processableEntries = this.getProcessableEntries();
         if (processableEntries.length === 0) return false;
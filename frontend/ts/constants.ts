@@ -63,6 +63,11 @@ export const STATUS_CONFIG = Object.freeze({
         icon: "fa-circle-exclamation",
         color: "text-warning",
     },
+    [DOWNLOAD_STATUS.CANCELLED]: {
+        label: "Cancelled",
+        icon: "fa-ban",
+        color: "text-muted",
+    },
     UNKNOWN: { label: "Unknown", icon: "fa-question", color: "text-muted" },
 });
 
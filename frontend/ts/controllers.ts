@@ -1,4 +1,4 @@
-import { deleteDownloads } from "./apiService";
+import { cancelDownloads, deleteDownloads } from "./apiService";
 import { showToast } from "./utils";
 import Swal from "sweetalert2";
 
@@ -78,3 +78,31 @@ export async function handleBulkDelete(ids: number[]) {
         showToast("Network error occurred while deleting.", "error");
     }
 }
+
+export async function handleCancel(ids: number[]) {
+    const uniqueIds = [...new Set(ids)];
+
+    try {
+        const payload = await cancelDownloads(uniqueIds);
+
+        if (!payload.status) {
+            console.error("Cancel failed:", payload);
+            showToast("Could not cancel the download.", "error");
+            return false;
+        }
+
+        // The rows are updated through the UPDATE events of the cancelled records
+        const cancelledCount = payload.data?.ids?.length ?? 0;
+        if (cancelledCount === 0) {
+            showToast("Nothing left to cancel.", "warning");
+        } else {
+            showToast(
+                `Cancelled ${cancelledCount} ${cancelledCount === 1 ? "download" : "downloads"}.`,
+                "success"
+            );
+        }
+    } catch (error) {
+        console.error("Cancel error:", error);
+        showToast("Network error occurred while cancelling.", "error");
+    }
+}
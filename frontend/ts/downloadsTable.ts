@@ -11,7 +11,7 @@ import { createMenuTrigger } from "./dropdownHelper";
 import { ModalManager } from "./modalManager";
 import { copyToClipboard, createIconLabelPair } from "./utils";
 import { showToast } from "./utils";
-import { handleBulkDelete } from "./controllers";
+import { handleBulkDelete, handleCancel } from "./controllers";
 
 export class DownloadsTable extends BaseDataTable {
     constructor(container: HTMLElement) {
@@ -74,8 +74,8 @@ export class DownloadsTable extends BaseDataTable {
         this.init();
     }
 
-    add(entries: any) {
-        this._addEntries(entries, DownloadRow, this);
+    add(entries: any, append = false) {
+        this._addEntries(entries, DownloadRow, this, append);
     }
 
     _createActions() {
@@ -201,6 +201,9 @@ export class DownloadRow extends BaseDataRow {
             Object.values(DOWNLOAD_STATUS)
         );
         this.data.statusMessage = this.#validateTextField(data.statusMessage);
+        this.data.priority = data.priority ?? 0;
+        this.data.retryCount = data.retryCount ?? 0;
+        this.data.nextRetryTime = this.#validateDateField(data.nextRetryTime);
 
         this.displayValues = {
             id: this.data.id >= 0 ? `#${this.data.id}` : "N/A",
@@ -401,11 +404,18 @@ export class DownloadRow extends BaseDataRow {
     #renderStatusContent() {
         const config = STATUS_CONFIG[this.data.status] ?? STATUS_CONFIG.UNKNOWN;
 
+        let title = config.label;
+        if (this.data.nextRetryTime) {
+            title += ` · Retry #${this.data.retryCount + 1} at ${this.#formatDateField(this.data.nextRetryTime)}`;
+        } else if (this.data.retryCount > 0) {
+            title += ` · Retried ${this.data.retryCount} times`;
+        }
+
         return createIconLabelPair({
             icon: config.icon,
             label: config.label,
             extraClasses: [config.color],
-            title: config.label,
+            title,
         });
     }
 
@@ -442,6 +452,13 @@ export class DownloadRow extends BaseDataRow {
                     }
                 },
             },
+            {
+                label: "Cancel Download",
+                icon: "fa-ban",
+                onClick: () => {
+                    handleCancel([this.data.id]);
+                },
+            },
             {
                 label: "Delete Entry",
                 icon: "fa-trash",
@@ -455,8 +472,32 @@ export class DownloadRow extends BaseDataRow {
         return createMenuTrigger(actions);
     }
 
+    setProgress(progress) {
+        if (!this.dom.statusCell) return;
+
+        const parts = [`${progress.filesDone} files`];
+        if (progress.bytesDone > 0) {
+            parts.push(`${(progress.bytesDone / 1024 / 1024).toFixed(1)} MB`);
+        }
+        if (progress.eta !== null) {
+            parts.push(`ETA ${formatDuration(progress.eta * 1000)}`);
+        }
+        if (progress.currentFile) {
+            parts.push(progress.currentFile);
+        }
+
+        this.dom.statusCell.title = parts.join(" · ");
+    }
+
     update(newData) {
-        const supportedFields = ["title", "mediaType", "status"];
+        const supportedFields = [
+            "title",
+            "mediaType",
+            "status",
+            "priority",
+            "retryCount",
+            "nextRetryTime",
+        ];
         const changedFields = Object.keys(newData).filter(
             (key) =>
                 supportedFields.includes(key) &&
@@ -497,6 +538,21 @@ export class DownloadRow extends BaseDataRow {
                             this.#generateTimeDiffTooltip();
                     }
                     break;
+
+                case "priority":
+                    // Not displayed, only kept for the edit modal
+                    this.data.priority = newData.priority;
+                    break;
+
+                case "retryCount":
+                case "nextRetryTime":
+                    this.data[field] = newData[field] ?? 0;
+                    if (this.dom.statusCell) {
+                        this.dom.statusCell.replaceChildren(
+                            this.#renderStatusContent()
+                        );
+                    }
+                    break;
             }
         });
 
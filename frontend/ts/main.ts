@@ -1,18 +1,71 @@
 import { EVENT_TYPE, API_SECRET_KEY } from "./constants";
 import { handleColorScheme, debounce, StreamManager, showToast } from "./utils";
 import { DownloadsTable } from "./downloadsTable";
-import { fetchDownloads } from "./apiService";
+import { fetchDownloads, searchDownloads } from "./apiService";
 
 import "../css/main.css";
 import "../css/dashboard.css";
 
-const debouncedFilter = debounce((searchValue: string) => {
-    requestAnimationFrame(() => {
-        downloadsTable.filter(searchValue);
-    });
-}, 10);
+// Pages are loaded as the table is scrolled, searches go through the API
+const PAGE_SIZE = 100;
+// How close to the bottom of the page the next one starts loading, in pixels
+const LOAD_MARGIN = 800;
+
+let searchQuery = "";
+let nextCursor: string | null = null;
+let isLoading = false;
+// Tells the pages of a previous search, still on their way, to be dropped
+let loadGeneration = 0;
+
+async function loadNextPage() {
+    const generation = loadGeneration;
+    isLoading = true;
+
+    try {
+        const page = searchQuery
+            ? await searchDownloads(searchQuery, PAGE_SIZE, nextCursor)
+            : await fetchDownloads(PAGE_SIZE, nextCursor);
+        if (generation !== loadGeneration) return;
+
+        downloadsTable.add(page.payload.data, true);
+        nextCursor = page.nextCursor;
+    } catch (error) {
+        if (generation === loadGeneration) nextCursor = null;
+    } finally {
+        if (generation === loadGeneration) isLoading = false;
+    }
+
+    if (generation === loadGeneration) loadMoreIfNeeded();
+}
+
+// Keeps loading until the page can be scrolled, or there is nothing left
+function loadMoreIfNeeded() {
+    if (isLoading || !nextCursor) return;
 
-// Only starts filtering after a small delay
+    const bottom = window.innerHeight + window.scrollY;
+    if (bottom >= document.documentElement.scrollHeight - LOAD_MARGIN) {
+        loadNextPage();
+    }
+}
+
+// Starts over from the first page of the table, or of the search results
+function loadTableData() {
+    loadGeneration += 1;
+    nextCursor = null;
+    downloadsTable.clear();
+
+    return loadNextPage();
+}
+
+const debouncedSearch = debounce((searchValue: string) => {
+    const query = searchValue.trim();
+    if (query === searchQuery) return;
+
+    searchQuery = query;
+    loadTableData();
+}, 300);
+
+// Only starts searching after a small delay
 function filterTable() {
     const searchInput = document.getElementById(
         "searchInput"
@@ -28,10 +81,10 @@ function filterTable() {
         clearBtn.classList.toggle("show", searchValue.length > 0);
     }
 
-    debouncedFilter(searchValue);
+    debouncedSearch(searchValue);
 }
 
-// Updates UI and filters the table instantly
+// Updates UI and shows the whole table again instantly
 function clearSearch() {
     const searchInput = document.getElementById(
         "searchInput"
@@ -49,22 +102,18 @@ function clearSearch() {
         clearBtn.classList.remove("show");
     }
 
-    downloadsTable.filter("");
+    debouncedSearch("");
+    if (searchQuery !== "") {
+        searchQuery = "";
+        loadTableData();
+    }
 }
 
 function showTableInfo() {
     console.log(downloadsTable.getStatsString());
 }
 
-async function loadTableData() {
-    try {
-        const payload = await fetchDownloads();
-        downloadsTable.add(payload.data);
-    } catch (error) {}
-}
-
 function refreshData() {
-    // TODO: add a refreshData method to the data table
     loadTableData();
     showToast("Table data refreshed!", "success");
 }
@@ -85,6 +134,13 @@ function handleUpdates(payload: any[]) {
     });
 }
 
+function handleProgress(payload: any[]) {
+    payload.forEach((progressData) => {
+        // Progress of rows that aren't loaded is of no interest
+        downloadsTable.entryMap.get(progressData.id)?.setProgress(progressData);
+    });
+}
+
 // MAIN
 
 const downloadsTableContainer = document.getElementById("downloadsTable");
@@ -100,19 +156,26 @@ document.addEventListener("DOMContentLoaded", () => {
     handleColorScheme();
 
     loadTableData();
+    window.addEventListener("scroll", loadMoreIfNeeded, { passive: true });
 
     // SSE Listener
     const stream = new StreamManager(`/api/events?apiKey=${API_SECRET_KEY}`);
     stream.connect(({ type, data }) => {
         switch (type) {
             case EVENT_TYPE.CREATE:
-                downloadsTable.add(data);
+                // New downloads may not match the search, they show up once
+                // it's cleared
+                if (!searchQuery) downloadsTable.add(data);
                 break;
 
             case EVENT_TYPE.UPDATE:
                 handleUpdates(data);
                 break;
 
+            case EVENT_TYPE.PROGRESS:
+                handleProgress(data);
+                break;
+
             case EVENT_TYPE.DELETE:
                 downloadsTable.deleteEntries(data.ids);
                 break;
@@ -64,6 +64,13 @@ export const ModalManager = {
             )
         );
 
+        const priorityValue = isBulk ? "" : (items[0].data.priority ?? 0);
+        this.dom.form.appendChild(
+            this._createField("Priority", "number", "editPriority", priorityValue)
+        );
+        // Saving only sends the priority if the user changed it
+        this.initialPriority = document.getElementById("editPriority").value;
+
         // Store the targets for the save function
         this.currentTargets = items.map((item) => item.data.id);
 
@@ -81,6 +88,11 @@ export const ModalManager = {
             if (typeVal !== "") data.mediaType = parseInt(typeVal);
             if (statusVal !== "") data.status = parseInt(statusVal);
 
+            const priorityVal = document.getElementById("editPriority").value;
+            if (priorityVal !== "" && priorityVal !== this.initialPriority) {
+                data.priority = parseInt(priorityVal);
+            }
+
             // Only add title if it's a single edit
             if (!isBulk) {
                 data.title = document.getElementById("editTitle").value;
@@ -7,10 +7,24 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 from app import app
+from app.constants import RecoveryPolicy
 from app.extensions import db
+from app.services.execution_service import recover_downloads, retry_failed_downloads
+from app.utils.cancellation import CancellationRegistry
 from app.utils.database import init_db, seed_db
+from app.utils.expansion_cache import ExpansionCache
+from app.utils.gallery_engine import EngineMode
+from app.utils.gallery_engine import engine as gallery_engine
+from app.utils.group_commit import GroupCommitWriter
+from app.utils.http_client import http_client
+from app.utils.job_queue import JobQueue
 from app.utils.logger import logger, setup_logging
+from app.utils.process_pool import WarmProcessPool
+from app.utils.rate_limiter import rate_limiter
+from app.utils.retry_scheduler import RetryScheduler
 from app.utils.sse import MessageAnnouncer
+from app.utils.title_cache import TitleCache
+from app.utils.worker_pool import DownloadPool
 
 ENV_PATH = ".env"
 
@@ -57,14 +71,86 @@ def main():
         SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         ANNOUNCER=MessageAnnouncer(),
+        DOWNLOAD_QUEUE=JobQueue(
+            worker_count=int(os.getenv("QUEUE_WORKERS", 2)),
+            aging_interval=float(os.getenv("PRIORITY_AGING_SECONDS", 30)),
+        ),
+        DOWNLOAD_POOL=DownloadPool(
+            max_workers=int(os.getenv("DOWNLOAD_WORKERS", 8)),
+            per_host_limit=int(os.getenv("DOWNLOAD_WORKERS_PER_HOST", 2)),
+            aging_interval=float(os.getenv("PRIORITY_AGING_SECONDS", 30)),
+        ),
+        TITLE_POOL=DownloadPool(
+            max_workers=int(os.getenv("TITLE_WORKERS", 8)),
+            per_host_limit=int(os.getenv("TITLE_WORKERS_PER_HOST", 4)),
+        ),
+        DOWNLOAD_WRITER=GroupCommitWriter(
+            max_items=int(os.getenv("DB_WRITE_BATCH_SIZE", 100)),
+            max_delay=int(os.getenv("DB_WRITE_DELAY_MS", 20)) / 1000,
+        ),
+        CANCELLATIONS=CancellationRegistry(),
+        RETRY_SCHEDULER=RetryScheduler(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", 3)),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", 60)),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", 60 * 60)),
+        ),
         DOWNLOAD_DIR=download_dir,
+        GALLERY_BATCH_SIZE=int(os.getenv("GALLERY_BATCH_SIZE", 20)),
+        VIDEO_FRAGMENT_WORKERS=int(os.getenv("VIDEO_FRAGMENT_WORKERS", 4)),
+        EXPANSION_CACHE=ExpansionCache(
+            ttl=int(os.getenv("EXPANSION_CACHE_TTL", 6 * 60 * 60)),
+            max_entries=int(os.getenv("EXPANSION_CACHE_SIZE", 5000)),
+        ),
+        TITLE_CACHE=TitleCache(
+            memory_size=int(os.getenv("TITLE_CACHE_MEMORY_SIZE", 2048)),
+            ttl=int(os.getenv("TITLE_CACHE_TTL", 30 * 24 * 60 * 60)),
+            negative_ttl=int(os.getenv("TITLE_CACHE_NEGATIVE_TTL", 10 * 60)),
+        ),
     )
 
+    http_client.configure(
+        pool_connections=int(os.getenv("SCRAPER_POOL_CONNECTIONS", 32)),
+        pool_maxsize=int(os.getenv("SCRAPER_POOL_MAXSIZE", 8)),
+    )
+    rate_limiter.configure(
+        rate=float(os.getenv("RATE_LIMIT_PER_SECOND", 0)),
+        burst=int(os.getenv("RATE_LIMIT_BURST", 5)),
+        max_backoff=float(os.getenv("RATE_LIMIT_MAX_BACKOFF", 300)),
+    )
+
+    engine_mode = os.getenv("GALLERY_ENGINE", EngineMode.IN_PROCESS)
+    engine_pool = None
+    if engine_mode == EngineMode.PROCESS_POOL:
+        engine_pool = WarmProcessPool(
+            size=int(os.getenv("ENGINE_POOL_SIZE", 4)),
+            max_jobs=int(os.getenv("ENGINE_POOL_MAX_JOBS", 200)),
+            max_rss_mb=int(os.getenv("ENGINE_POOL_MAX_RSS_MB", 512)),
+        )
+
+    gallery_engine.configure(engine_mode, engine_pool)
+    logger.debug(f"Gallery engine: {gallery_engine.mode!r}")
+
+    # In debug mode, the reloader runs this in a watcher process as well.
+    # Only the process that serves may start workers and pick up downloads,
+    # or they'd run twice against the same files and records.
+    serving = not debug_mode or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+    if serving and gallery_engine.pool is not None:
+        gallery_engine.pool.start()
+
     db.init_app(app)
 
     with app.app_context():
         init_db(app)
 
+        if serving:
+            # Whatever a previous run left unfinished
+            recover_downloads(
+                policy=os.getenv("RECOVERY_POLICY", RecoveryPolicy.RESUME),
+                max_age=int(os.getenv("RECOVERY_MAX_AGE", 0)),
+            )
+            app.config["RETRY_SCHEDULER"].start(retry_failed_downloads)
+
         if demo_mode:
             logger.info("Demo mode enabled!")
 
@@ -0,0 +1,122 @@
+"""
+Measures the throughput of bulk title scraping against a local stand-in
+server, which answers every request with a small HTML page after a delay.
+
+Usage:
+    python -m scripts.benchmark_titles [--latency 0.05] [--hosts 50]
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from app.utils.async_scraper import AsyncTitleEngine
+from app.utils.scraper import scrape_title
+
+SIZES = [1_000, 10_000]
+THREADED_WORKERS = 8  # Same as the default TITLE_WORKERS
+
+PAGE = (
+    "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+    "<title>Benchmark page</title></head><body>{padding}</body></html>"
+).format(padding="x" * 8 * 1024)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency):
+    try:
+        # Request line and headers
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+
+        await asyncio.sleep(latency)
+
+        body = PAGE.encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/html; charset=utf-8\r\n"
+            b"Content-Length: %d\r\n"
+            b"Connection: close\r\n\r\n%s" % (len(body), body)
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def start_server(latency: float, host_count: int) -> List[int]:
+    """Serves on `host_count` ports, so the per-host limits apply like in prod."""
+    ports: List[int] = []
+    ready = threading.Event()
+
+    async def serve():
+        for _ in range(host_count):
+            server = await asyncio.start_server(
+                lambda r, w: handle(r, w, latency), "127.0.0.1", 0, backlog=1024
+            )
+            ports.append(server.sockets[0].getsockname()[1])
+
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+
+    return ports
+
+
+def build_urls(ports: List[int], count: int) -> List[str]:
+    return [f"http://127.0.0.1:{ports[i % len(ports)]}/page/{i}" for i in range(count)]
+
+
+def report(name: str, count: int, elapsed: float, resolved: int) -> None:
+    print(
+        f"{name:<10} {count:>6} URLs  {elapsed:>7.2f}s  "
+        f"{count / elapsed:>8.1f} URLs/s  ({resolved} titled)"
+    )
+
+
+def benchmark_async(urls: List[str]) -> None:
+    start = time.perf_counter()
+    probes = AsyncTitleEngine().resolve(urls)
+    elapsed = time.perf_counter() - start
+
+    resolved = sum(1 for probe in probes.values() if probe.title)
+    report("async", len(urls), elapsed, resolved)
+
+
+def benchmark_threaded(urls: List[str]) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADED_WORKERS) as executor:
+        titles = list(executor.map(scrape_title, urls))
+    elapsed = time.perf_counter() - start
+
+    resolved = sum(1 for title in titles if title == "Benchmark page")
+    report("threaded", len(urls), elapsed, resolved)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument(
+        "--threaded", action="store_true", help="Also run the thread pool baseline"
+    )
+    args = parser.parse_args()
+
+    ports = start_server(args.latency, args.hosts)
+    print(f"Stand-in server: {args.hosts} hosts, {args.latency * 1000:.0f} ms latency")
+
+    for size in SIZES:
+        urls = build_urls(ports, size)
+
+        benchmark_async(urls)
+        if args.threaded:
+            benchmark_threaded(urls)
+
+
+if __name__ == "__main__":
+    main()
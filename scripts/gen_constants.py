@@ -8,7 +8,10 @@ from dotenv import load_dotenv
 
 from app.constants import (
     API_DOWNLOADS,
+    API_DOWNLOADS_CANCEL,
+    API_DOWNLOADS_SEARCH,
     API_MEDIA_DOWNLOAD,
+    NEXT_CURSOR_HEADER,
     PAGE_DASHBOARD,
     DownloadStatus,
     EventType,
@@ -30,8 +33,11 @@ CONSTANTS_TO_EXPORT = {
     "SERVER_PORT": os.getenv("SERVER_PORT"),
     "API_SECRET_KEY": os.getenv("API_SECRET_KEY"),
     "API_DOWNLOADS": API_DOWNLOADS,
+    "API_DOWNLOADS_CANCEL": API_DOWNLOADS_CANCEL,
+    "API_DOWNLOADS_SEARCH": API_DOWNLOADS_SEARCH,
     "API_MEDIA_DOWNLOAD": API_MEDIA_DOWNLOAD,
     "PAGE_DASHBOARD": PAGE_DASHBOARD,
+    "NEXT_CURSOR_HEADER": NEXT_CURSOR_HEADER,
 }
 
 # GENERATOR
@@ -0,0 +1,165 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.constants import (
+    API_DOWNLOADS_CANCEL,
+    DownloadStatus,
+    EventType,
+    MediaType,
+    QueueStage,
+)
+from app.extensions import db
+from app.models.download import Download
+from app.models.queue import QueuedDownload
+from app.services.download_service import cancel_downloads, record_expansion
+from app.services.execution_service import enqueue_download_request
+from app.utils.tools import DownloadReportItem
+
+
+@pytest.mark.parametrize(
+    "cancel_ids, error_msg",
+    [
+        (None, "field may not be null."),
+        ([], "Shorter than minimum length"),
+        (["123"], "Not a valid integer"),
+    ],
+)
+def test_invalid_scenarios(cancel_ids, error_msg, client, auth_headers):
+    res = client.post(
+        API_DOWNLOADS_CANCEL, headers=auth_headers, json={"ids": cancel_ids}
+    )
+    assert res.status_code == 400
+
+    data = res.get_json()
+    assert not data["status"]
+    assert error_msg.lower() in data["error"].lower()
+
+
+def test_finished_downloads_are_ignored(client, auth_headers, seed, announcer):
+    pending, done = seed(
+        [{"status": DownloadStatus.PENDING}, {"status": DownloadStatus.DONE}]
+    )
+
+    with patch.object(announcer, "announce") as mock_announce:
+        res = client.post(
+            API_DOWNLOADS_CANCEL,
+            headers=auth_headers,
+            json={"ids": [pending.id, done.id, 999]},
+        )
+
+    assert res.status_code == 200
+    assert res.get_json()["data"]["ids"] == [pending.id]
+
+    db.session.expire_all()
+    assert db.session.get(Download, pending.id).status == DownloadStatus.CANCELLED
+    assert db.session.get(Download, done.id).status == DownloadStatus.DONE
+
+    event_type, payload = mock_announce.call_args.args
+    assert event_type == EventType.UPDATE
+    assert [record["id"] for record in payload] == [pending.id]
+    assert payload[0]["statusMessage"] == "Cancelled by the user."
+
+
+def test_queued_children_are_dropped(client, auth_headers, seed):
+    parent, child, other = seed(
+        [
+            {"status": DownloadStatus.IN_PROGRESS},
+            {"url": "https://c.com/1"},
+            {"url": "https://c.com/2"},
+        ]
+    )
+    db.session.add_all(
+        [
+            QueuedDownload(
+                download_id=child.id, stage=QueueStage.DOWNLOAD, parent_id=parent.id
+            ),
+            QueuedDownload(download_id=other.id, stage=QueueStage.DOWNLOAD),
+        ]
+    )
+    db.session.commit()
+
+    res = client.post(
+        API_DOWNLOADS_CANCEL, headers=auth_headers, json={"ids": [parent.id]}
+    )
+
+    assert res.get_json()["data"]["ids"] == [parent.id, child.id]
+    assert [queued.download_id for queued in QueuedDownload.query.all()] == [other.id]
+
+
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_running_download_is_stopped(_mock_title, client, auth_headers, download_queue):
+    started = threading.Event()
+
+    def download(urls, range_start, range_end, progress, cancel):
+        started.set()
+
+        deadline = time.monotonic() + 5
+        while not cancel.cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return DownloadReportItem(status=False, error="[yt-dlp] Error: Cancelled")
+
+    with patch("app.services.execution_service.Video.download", side_effect=download):
+        (item,) = enqueue_download_request(
+            [{"url": "https://v.com/1", "media_type": MediaType.VIDEO}], None, None
+        )
+        assert started.wait(timeout=5)
+
+        res = client.post(
+            API_DOWNLOADS_CANCEL, headers=auth_headers, json={"ids": [item["id"]]}
+        )
+        assert res.get_json()["data"]["ids"] == [item["id"]]
+        assert download_queue.join(timeout=5)
+
+    # The worker's final write keeps it cancelled
+    db.session.expire_all()
+    download = db.session.get(Download, item["id"])
+    assert download.status == DownloadStatus.CANCELLED
+    assert download.status_message == "Cancelled by the user."
+
+
+@patch("app.services.execution_service.Gallery.download_batch")
+@patch("app.services.execution_service.expand_collection_urls")
+def test_cancel_during_expansion_drops_the_children(
+    mock_expand, mock_batch, announcer, download_queue
+):
+    parent_url = "https://g.com/collection"
+    child_urls = ["https://g.com/1", "https://g.com/2"]
+    mock_expand.return_value = child_urls
+
+    def cancel_then_record(parent_id, *args):
+        # Lands after the job's own check, right before the children are added
+        assert cancel_downloads([parent_id]) == [parent_id]
+        return record_expansion(parent_id, *args)
+
+    with (
+        patch(
+            "app.services.execution_service.record_expansion",
+            side_effect=cancel_then_record,
+        ),
+        patch.object(announcer, "announce") as mock_announce,
+    ):
+        (item,) = enqueue_download_request(
+            [{"url": parent_url, "media_type": MediaType.GALLERY}], None, None
+        )
+        assert download_queue.join(timeout=5)
+
+    db.session.expire_all()
+    parent = db.session.get(Download, item["id"])
+    assert parent.status == DownloadStatus.CANCELLED
+    assert parent.status_message == "Cancelled by the user."
+
+    assert Download.query.filter(Download.url.in_(child_urls)).count() == 0
+    assert QueuedDownload.query.count() == 0
+    mock_batch.assert_not_called()
+
+    # Only the collection itself was ever announced as created
+    creates = [
+        record["url"]
+        for call in mock_announce.call_args_list
+        if call.args[0] == EventType.CREATE
+        for record in call.args[1]
+    ]
+    assert creates == [parent_url]
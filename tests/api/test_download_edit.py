@@ -38,6 +38,10 @@ from app.constants import API_DOWNLOADS, MediaType
             [{"id": 1, "status": "123"}],
             "not a valid integer",
         ),
+        (
+            [{"id": 1, "priority": 101}],
+            "less than or equal to 100",
+        ),
     ],
     ids=[
         "not_a_list",
@@ -48,6 +52,7 @@ from app.constants import API_DOWNLOADS, MediaType
         "title_too_long",
         "media_type_wrong_type",
         "status_wrong_type",
+        "priority_out_of_range",
     ],
 )
 def test_invalid_scenarios(payload, error_msg, client, auth_headers, seed):
@@ -109,6 +114,11 @@ def test_invalid_scenarios(payload, error_msg, client, auth_headers, seed):
             [{"id": 1, "mediaType": 1}],
             [{"id": 1, "status": True, "error": None, "updates": {"mediaType": 1}}],
         ),
+        (
+            [{"id": 1}],
+            [{"id": 1, "priority": -5}],
+            [{"id": 1, "status": True, "error": None, "updates": {"priority": -5}}],
+        ),
     ],
     ids=[
         "single_valid",
@@ -116,6 +126,7 @@ def test_invalid_scenarios(payload, error_msg, client, auth_headers, seed):
         "mixed_status",
         "no_field_to_update",
         "media_type_none",
+        "priority",
     ],
 )
 def test_valid_scenarios(
@@ -1,7 +1,15 @@
 import pytest
 
-from app.constants import API_DOWNLOADS
+from app.constants import (
+    API_DOWNLOADS,
+    DOWNLOAD_SORT_FIELDS,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    DownloadStatus,
+    MediaType,
+)
 from app.schemas.download import DownloadSchema
+from app.utils.pagination import encode_cursor
 
 
 def test_download_response_structure(client, auth_headers, seed, sample_download_row):
@@ -109,3 +117,159 @@ def test_get_downloads_invalid_ids_format(client, auth_headers):
     response = client.get(f"{API_DOWNLOADS}?ids=1,abc,3", headers=auth_headers)
     assert response.status_code == 400
     assert response.json["error"] is not None
+
+
+def fetch_pages(client, auth_headers, **params):
+    """Follows the cursors of a paginated listing, returning every page."""
+    pages = []
+    cursor = None
+
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = client.get(API_DOWNLOADS, headers=auth_headers, query_string=query)
+        assert response.status_code == 200
+
+        pages.append([item["id"] for item in response.json["data"]])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def test_pages_follow_the_cursor(client, auth_headers, seed):
+    seeded_ids = [row.id for row in seed([{} for _ in range(7)])]
+
+    pages = fetch_pages(client, auth_headers, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == sorted(seeded_ids, reverse=True)
+
+
+def test_pages_of_a_sort_column(client, auth_headers, seed):
+    rows = seed([{"priority": priority} for priority in [1, 5, 1, 5, 1]])
+
+    pages = fetch_pages(client, auth_headers, limit=2, sortBy="priority")
+
+    # Ties are broken by ID, so no row is skipped or repeated
+    expected = sorted(rows, key=lambda row: (row.priority, row.id), reverse=True)
+    assert sum(pages, []) == [row.id for row in expected]
+
+
+def test_last_page_has_no_cursor(client, auth_headers, seed):
+    seed([{} for _ in range(2)])
+
+    response = client.get(f"{API_DOWNLOADS}?limit=2", headers=auth_headers)
+
+    assert len(response.json["data"]) == 2
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        "limit=0",
+        f"limit={MAX_PAGE_SIZE + 1}",
+        "sortBy=title",
+        "cursor=not-a-cursor",
+        # Made for another sort
+        f"sortBy=priority&cursor={encode_cursor({'sort_by': 'id', 'after': [1, 1]})}",
+    ],
+)
+def test_invalid_pagination(client, auth_headers, query_string):
+    response = client.get(f"{API_DOWNLOADS}?{query_string}", headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "sort_by, after",
+    [
+        ("start_time", [{"a": 1}, 5]),
+        ("status", [{"a": 1}, 5]),
+        ("id", [None, None]),
+        ("id", [1, [2]]),
+        ("priority", [1, [2]]),
+        ("priority", [1, "2"]),
+        ("priority", [True, 2]),
+        ("id", [2**63, 1]),
+        ("id", [1, 2, 3]),
+        ("id", {"0": 1, "1": 2}),
+    ],
+)
+def test_tampered_cursor(client, auth_headers, seed, sort_by, after):
+    seed([{}, {}, {}])
+    api_names = {column: name for name, column in DOWNLOAD_SORT_FIELDS.items()}
+    cursor = encode_cursor({"sort_by": sort_by, "descending": True, "after": after})
+
+    response = client.get(
+        API_DOWNLOADS,
+        headers=auth_headers,
+        query_string={"limit": 2, "sortBy": api_names[sort_by], "cursor": cursor},
+    )
+    assert response.status_code == 400
+    assert "cursor" in response.json["error"]
+
+
+def get_ids(client, auth_headers, query_string):
+    response = client.get(f"{API_DOWNLOADS}?{query_string}", headers=auth_headers)
+    assert response.status_code == 200, response.json["error"]
+    return [item["id"] for item in response.json["data"]]
+
+
+def test_filters(client, auth_headers, seed):
+    video, gallery, failed, other_host = seed(
+        [
+            {"url": "https://a.com/1", "media_type": MediaType.VIDEO},
+            {"url": "https://A.com/2", "media_type": MediaType.GALLERY},
+            {
+                "url": "https://a.com/3",
+                "status": DownloadStatus.FAILED,
+                "start_time": 500,
+                "end_time": 900,
+            },
+            {"url": "https://b.com/1", "start_time": 1000},
+        ]
+    )
+
+    assert get_ids(client, auth_headers, "host=a.com&order=asc") == [
+        video.id,
+        gallery.id,
+        failed.id,
+    ]
+    assert get_ids(client, auth_headers, f"mediaType={MediaType.VIDEO}") == [video.id]
+    assert get_ids(
+        client, auth_headers, f"status={DownloadStatus.FAILED},{DownloadStatus.DONE}"
+    ) == [failed.id]
+    assert get_ids(client, auth_headers, "startTimeMin=400&startTimeMax=1000") == [
+        other_host.id,
+        failed.id,
+    ]
+    assert get_ids(client, auth_headers, "endTimeMax=900") == [failed.id]
+
+    # An empty list doesn't filter anything
+    assert len(get_ids(client, auth_headers, "status=")) == 4
+
+
+def test_pages_in_ascending_order(client, auth_headers, seed):
+    rows = seed([{"start_time": start_time} for start_time in [30, 10, 20, 10]])
+
+    pages = fetch_pages(client, auth_headers, limit=3, sortBy="startTime", order="asc")
+
+    expected = sorted(rows, key=lambda row: (row.start_time, row.id))
+    assert sum(pages, []) == [row.id for row in expected]
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        "status=99",
+        "mediaType=abc",
+        "order=up",
+        "host=",
+        "startTimeMin=10&startTimeMax=5",
+        # Made for the other order
+        "order=asc&cursor="
+        + encode_cursor({"sort_by": "id", "descending": True, "after": [1, 1]}),
+    ],
+)
+def test_invalid_filters(client, auth_headers, query_string):
+    response = client.get(f"{API_DOWNLOADS}?{query_string}", headers=auth_headers)
+    assert response.status_code == 400
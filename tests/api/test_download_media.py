@@ -1,9 +1,20 @@
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 
-from app.constants import API_DOWNLOADS, API_MEDIA_DOWNLOAD, DownloadStatus, MediaType
+from app import app
+from app.constants import (
+    API_DOWNLOADS,
+    API_MEDIA_DOWNLOAD,
+    DownloadStatus,
+    EventType,
+    MediaType,
+)
+from app.extensions import db
 from app.models.download import Download
+from app.services.execution_service import process_download_request
 from app.utils.tools import DownloadReportItem
 
 
@@ -14,8 +25,11 @@ class MockCmdResult:
         self.success = return_code == 0
 
 
-def test_simple_download(client, auth_headers):
+@patch("app.services.execution_service.Video.download")
+def test_simple_download(mock_video, client, auth_headers, download_queue):
     """Test the download endpoint with mocked external requests."""
+    mock_video.return_value = DownloadReportItem(files=["/downloads/Videos/a.mp4"])
+
     with patch("requests.get") as mock_get:
         mock_title = "Mocked Title"
         mock_url = "https://example.com"
@@ -37,17 +51,43 @@ def test_simple_download(client, auth_headers):
 
         first_download = resp_data["data"][0]
         assert first_download["url"] == mock_url
+        assert isinstance(first_download["id"], int)
         # TODO: when we'll return Download, then we can check for a title match
         # assert first_download["title"] == mock_title
 
+        assert download_queue.join(timeout=5)
+
         # Persistence
         history = client.get(API_DOWNLOADS, headers=auth_headers).json
         assert len(history["data"]) == 1
         assert history["data"][0]["status"] == DownloadStatus.DONE
 
+    mock_video.assert_called_once_with([mock_url], None, None, ANY, ANY)
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.Audio.download")
+def test_download_routes_by_media_type(mock_audio, mock_video, client):
+    mock_video.return_value = DownloadReportItem(files=["/downloads/Videos/v.mp4"])
+    mock_audio.return_value = DownloadReportItem(status=False, error="[yt-dlp] Error")
+
+    report, _ = process_download_request(
+        [
+            {"url": "https://v.com/1", "media_type": MediaType.VIDEO},
+            {"url": "https://a.com/1", "media_type": MediaType.AUDIO},
+        ],
+        None,
+        None,
+    )
+
+    assert report[0]["files"] == ["/downloads/Videos/v.mp4"]
+    assert report[0]["status"]
+    assert not report[1]["status"]
+    assert report[1]["error"] == "[yt-dlp] Error"
+
 
 @pytest.mark.slow
-def test_stress(client, auth_headers):
+def test_stress(client, auth_headers, download_queue):
     """Ensure the system doesn't crash or lock up under high request volume."""
 
     url_count = 50
@@ -60,6 +100,8 @@ def test_stress(client, auth_headers):
         )
         assert res.status_code == 200
 
+    assert download_queue.join(timeout=30)
+
     count = Download.query.count()
     assert count == url_count
 
@@ -91,6 +133,10 @@ def test_stress(client, auth_headers):
             {"items": [{"url": "https://example.com", "media_type": MediaType.IMAGE}]},
             "unknown field",
         ),
+        (
+            {"items": [{"url": "https://example.com", "priority": 1000}]},
+            "must be greater than or equal to -100 and less than or equal to 100",
+        ),
         (
             {"items": [{"url": "https://example.com"}], "rangeStart": "123"},
             "not a valid integer",
@@ -110,6 +156,7 @@ def test_stress(client, auth_headers):
         "media_type_wrong_type",
         "media_type_negative_id",
         "field_snake_case",
+        "priority_out_of_range",
         "range_start_wrong_type",
         "range_end_wrong_type",
     ],
@@ -124,10 +171,10 @@ def test_invalid_scenarios(payload, error_msg, client, auth_headers):
     assert error_msg.lower() in data["error"].lower()
 
 
-@patch("app.services.execution_service.initialize_download")
+@patch("app.services.execution_service.initialize_downloads")
 def test_initial_recording_deduplication(mock_start, client, auth_headers):
     """Verify that the initial recording phase uses list(set(urls))."""
-    mock_start.return_value = (True, 1, None)
+    mock_start.return_value = (False, "Not recorded", [])
     urls = ["http://dup.com", "http://dup.com", "http://unique.com"]
 
     items_data = [{"url": url, "mediaType": MediaType.IMAGE} for url in urls]
@@ -138,22 +185,31 @@ def test_initial_recording_deduplication(mock_start, client, auth_headers):
         json={"items": items_data},
     )
 
-    # Should only be called twice because of the set()
-    assert mock_start.call_count == 2
+    # Recorded at once, with the duplicate left out
+    mock_start.assert_called_once()
+    assert mock_start.call_args.args[0] == [
+        ("http://dup.com", MediaType.IMAGE),
+        ("http://unique.com", MediaType.IMAGE),
+    ]
 
 
 @patch("app.services.execution_service.expand_collection_urls")
-@patch("app.services.execution_service.Gallery.download")
+@patch("app.services.execution_service.Gallery.download_batch")
 @patch("requests.get")
 def test_gallery_expansion_flow(
-    mock_get, mock_gallery, mock_expand, client, auth_headers
+    mock_get, mock_batch, mock_expand, client, auth_headers, download_queue
 ):
     """Verify Phase 2 correctly expands one URL into multiple child records."""
     parent_url = "http://gallery.com/main"
     child_urls = ["http://gallery.com/1", "http://gallery.com/2"]
 
     mock_expand.return_value = child_urls
-    mock_gallery.return_value = DownloadReportItem(status=True)
+
+    # Children of the same host share a single gallery-dl process
+    mock_batch.return_value = {
+        url: DownloadReportItem(status=True, files=[f"./{i}.jpg"])
+        for i, url in enumerate(child_urls)
+    }
 
     # Mock title scrape response
     mock_response = MagicMock()
@@ -165,15 +221,163 @@ def test_gallery_expansion_flow(
     resp_data = client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
 
     data = resp_data.get_json()
-    assert any(parent_url == download_data["url"] for download_data in data["data"])
-    assert any(child_urls[0] == download_data["url"] for download_data in data["data"])
+    assert [download_data["url"] for download_data in data["data"]] == [parent_url]
+
+    assert download_queue.join(timeout=5)
+
+    recorded_urls = {download.url for download in Download.query.all()}
+    assert recorded_urls == {parent_url, *child_urls}
+
+    mock_batch.assert_called_once_with(child_urls, None, None, ANY, ANY)
+    children = Download.query.filter(Download.url.in_(child_urls)).all()
+    assert {d.status for d in children} == {DownloadStatus.DONE}
 
-    # TODO: When we'll return Download, then we can check for more details
+
+@patch("app.services.execution_service.expand_collection_urls")
+@patch("app.services.execution_service.Gallery.download_batch")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_expanded_children_are_created_at_once(
+    _mock_title,
+    mock_batch,
+    mock_expand,
+    client,
+    auth_headers,
+    announcer,
+    download_queue,
+):
+    parent_url = "http://gallery.com/main"
+    child_urls = [f"http://gallery.com/{i}" for i in range(5)]
+
+    mock_expand.return_value = child_urls
+    mock_batch.return_value = {
+        url: DownloadReportItem(status=True, files=[]) for url in child_urls
+    }
+
+    with patch.object(announcer, "announce") as mock_announce:
+        payload = {"items": [{"url": parent_url, "mediaType": MediaType.GALLERY}]}
+        client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
+        assert download_queue.join(timeout=5)
+
+    creates = [
+        call.args[1]
+        for call in mock_announce.call_args_list
+        if call.args[0] == EventType.CREATE
+    ]
+
+    # One event for the parent, one for all of its children
+    assert [[record["url"] for record in records] for records in creates] == [
+        [parent_url],
+        child_urls,
+    ]
+
+    children = Download.query.filter(Download.url.in_(child_urls)).all()
+    assert sorted(d.id for d in children) == [record["id"] for record in creates[1]]
+
+
+@patch("app.services.execution_service.expand_collection_urls")
+@patch("app.services.execution_service.Gallery.download_batch")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_children_inherit_the_priority(
+    _mock_title, mock_batch, mock_expand, client, auth_headers, download_queue
+):
+    parent_url = "http://gallery.com/urgent"
+    child_urls = ["http://gallery.com/1", "http://gallery.com/2"]
+
+    mock_expand.return_value = child_urls
+    mock_batch.return_value = {url: DownloadReportItem() for url in child_urls}
+
+    pool = app.config["DOWNLOAD_POOL"]
+    with patch.object(pool, "submit", wraps=pool.submit) as mock_submit:
+        payload = {
+            "items": [
+                {"url": parent_url, "mediaType": MediaType.GALLERY, "priority": 7}
+            ]
+        }
+        client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
+        assert download_queue.join(timeout=5)
+
+    records = Download.query.filter(Download.url.in_([parent_url, *child_urls]))
+    assert {record.priority for record in records} == {7}
+
+    (call,) = mock_submit.call_args_list
+    assert call.kwargs["priority"] == 7
+    assert len(call.kwargs["item_ids"]) == 2
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_urgent_request_overtakes_queued_jobs(
+    _mock_title, mock_video, client, auth_headers, download_queue
+):
+    """With every job worker busy, a later urgent request still starts first."""
+    started = []
+    mock_video.side_effect = lambda urls, *args: started.append(urls[0])
+
+    releases = [threading.Event() for _ in range(download_queue.worker_count)]
+    for release in releases:
+        download_queue.submit(release.wait, 5)
+
+    for url, priority in [("https://v.com/low", 0), ("https://v.com/high", 9)]:
+        payload = {
+            "items": [{"url": url, "mediaType": MediaType.VIDEO, "priority": priority}]
+        }
+        client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
+
+    # A single free worker runs the queued jobs one after the other
+    releases[0].set()
+    for _ in range(50):
+        if len(started) == 2:
+            break
+        time.sleep(0.1)
+
+    for release in releases:
+        release.set()
+    assert download_queue.join(timeout=5)
+
+    assert started == ["https://v.com/high", "https://v.com/low"]
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_reprioritized_request_overtakes_queued_jobs(
+    _mock_title, mock_video, client, auth_headers, download_queue
+):
+    started = []
+    mock_video.side_effect = lambda urls, *args: started.append(urls[0])
+
+    releases = [threading.Event() for _ in range(download_queue.worker_count)]
+    for release in releases:
+        download_queue.submit(release.wait, 5)
+
+    ids = []
+    for url in ["https://v.com/first", "https://v.com/second"]:
+        payload = {"items": [{"url": url, "mediaType": MediaType.VIDEO}]}
+        response = client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
+        ids.append(response.json["data"][0]["id"])
+
+    # Bumped while its job is still waiting for a worker
+    client.patch(
+        API_DOWNLOADS, headers=auth_headers, json=[{"id": ids[1], "priority": 9}]
+    )
+
+    releases[0].set()
+    for _ in range(50):
+        if len(started) == 2:
+            break
+        time.sleep(0.1)
+
+    for release in releases:
+        release.set()
+    assert download_queue.join(timeout=5)
+
+    assert started == ["https://v.com/second", "https://v.com/first"]
 
 
 @patch("requests.get")
 @patch("app.services.execution_service.Gallery.download")
-def test_title_scrape_failure_handling(mock_gallery, mock_get, client, auth_headers):
+def test_title_scrape_failure_handling(
+    mock_gallery, mock_get, client, auth_headers, download_queue
+):
     """
     Verify that a failed title scrape adds a warning but doesn't fail the
     download.
@@ -193,6 +397,9 @@ def test_title_scrape_failure_handling(mock_gallery, mock_get, client, auth_head
 
     assert first_download["status"] is True
 
+    assert download_queue.join(timeout=5)
+    assert Download.query.one().status == DownloadStatus.DONE
+
 
 @patch("app.services.execution_service.Gallery.download")
 def test_gallery_dl_failure_reporting(mock_gallery, client, auth_headers):
@@ -203,20 +410,42 @@ def test_gallery_dl_failure_reporting(mock_gallery, client, auth_headers):
     )
 
     url = "https://example.com"
-    resp_data = client.post(
-        API_MEDIA_DOWNLOAD,
-        headers=auth_headers,
-        json={"items": [{"url": url, "mediaType": MediaType.GALLERY}]},
+    report, _ = process_download_request(
+        [{"url": url, "media_type": MediaType.GALLERY}], None, None
     )
 
-    data = resp_data.get_json()
-    first_download = data["data"][0]
+    first_download = report[0]
 
     assert first_download["status"] is False
     assert first_download["output"] == "403 Forbidden"
     assert "Command failed".lower() in first_download["error"].lower()
 
 
+@patch("app.services.execution_service.Gallery.download")
+def test_queued_failure_is_persisted(
+    mock_gallery, client, auth_headers, download_queue
+):
+    """Verify that a failure in a background job ends up on the record."""
+    mock_gallery.return_value = DownloadReportItem(
+        status=False, error="System command failed"
+    )
+
+    url = "https://example.com"
+    res = client.post(
+        API_MEDIA_DOWNLOAD,
+        headers=auth_headers,
+        json={"items": [{"url": url, "mediaType": MediaType.GALLERY}]},
+    )
+
+    # The job only gets queued, so the response can't know about the failure yet
+    assert res.get_json()["data"][0]["status"] is True
+    assert download_queue.join(timeout=5)
+
+    record = Download.query.one()
+    assert record.status == DownloadStatus.FAILED
+    assert record.status_message == "System command failed"
+
+
 @patch("app.services.execution_service.Gallery.download")
 def test_gallery_dl_failure_patterns(mock_gallery, client, auth_headers):
     """Verify that if failure patterns are matched return status is False."""
@@ -228,14 +457,11 @@ def test_gallery_dl_failure_patterns(mock_gallery, client, auth_headers):
     )
 
     url = "https://example.com"
-    resp_data = client.post(
-        API_MEDIA_DOWNLOAD,
-        headers=auth_headers,
-        json={"items": [{"url": url, "mediaType": MediaType.GALLERY}]},
+    report, _ = process_download_request(
+        [{"url": url, "media_type": MediaType.GALLERY}], None, None
     )
 
-    data = resp_data.get_json()
-    first_download = data["data"][0]
+    first_download = report[0]
 
     assert not first_download["status"]
     assert "No results found" in first_download["error"]
@@ -253,15 +479,93 @@ def test_return_files(mock_gallery, client, auth_headers):
     mock_gallery.return_value = DownloadReportItem(status=True, files=files)
 
     url = "https://example.com"
-    res = client.post(
-        API_MEDIA_DOWNLOAD,
-        headers=auth_headers,
-        json={"items": [{"url": url, "mediaType": MediaType.GALLERY}]},
+    report, _ = process_download_request(
+        [{"url": url, "media_type": MediaType.GALLERY}], None, None
     )
 
-    data = res.get_json()
-    first_download = data["data"][0]
+    first_download = report[0]
 
     assert first_download["status"]
     assert len(first_download["files"]) == 3
     assert first_download["files"][0] == "./dir1/image-1.jpg"
+
+
+@patch("app.services.execution_service.scrape_title")
+@patch("app.services.execution_service.Gallery.download")
+def test_download_does_not_wait_for_title(
+    mock_gallery, mock_scrape, client, auth_headers, download_queue
+):
+    """A slow title lookup must not hold back the download nor its finalization."""
+    title_released = threading.Event()
+    download_finalized = threading.Event()
+
+    def slow_scrape(url):
+        title_released.wait(timeout=5)
+        return "Late Title"
+
+    def fast_download(*args, **kwargs):
+        return DownloadReportItem(status=True)
+
+    mock_scrape.side_effect = slow_scrape
+    mock_gallery.side_effect = fast_download
+
+    url = "https://example.com/slow-title"
+    client.post(
+        API_MEDIA_DOWNLOAD,
+        headers=auth_headers,
+        json={"items": [{"url": url, "mediaType": MediaType.GALLERY}]},
+    )
+
+    # The record gets finalized while the title is still pending
+    for _ in range(50):
+        db.session.expire_all()
+        record = Download.query.one()
+        if record.status == DownloadStatus.DONE:
+            download_finalized.set()
+            break
+        time.sleep(0.1)
+
+    assert download_finalized.is_set()
+    assert record.title is None
+
+    title_released.set()
+    assert download_queue.join(timeout=5)
+
+    db.session.expire_all()
+    record = Download.query.one()
+    assert record.title == "Late Title"
+    assert record.status == DownloadStatus.DONE
+
+
+@patch("app.services.execution_service.ScraperConfig.BULK_TITLE_THRESHOLD", 3)
+@patch("app.services.execution_service.scrape_titles")
+@patch("app.services.execution_service.scrape_title")
+@patch("app.services.execution_service.Video.download")
+def test_many_titles_are_scraped_in_bulk(
+    mock_video, mock_scrape, mock_scrape_bulk, client, announcer
+):
+    urls = [f"https://bulk.com/{i}" for i in range(3)]
+    mock_video.return_value = DownloadReportItem()
+    mock_scrape_bulk.side_effect = lambda urls: {url: f"Title {url}" for url in urls}
+
+    with patch.object(announcer, "announce") as mock_announce:
+        process_download_request(
+            [{"url": url, "media_type": MediaType.VIDEO} for url in urls], None, None
+        )
+
+    mock_scrape.assert_not_called()
+    mock_scrape_bulk.assert_called_once_with(urls)
+
+    titles = {d.url: d.title for d in Download.query.all()}
+    assert titles == {url: f"Title {url}" for url in urls}
+
+    # Titles may share an announcement with the finalized records
+    ids = {d.id: d.url for d in Download.query.all()}
+    announced_titles = {
+        ids[record["id"]]: record["title"]
+        for call in mock_announce.call_args_list
+        if call.args[0] == EventType.UPDATE
+        for record in call.args[1]
+        if record.get("title")
+    }
+    assert announced_titles == titles
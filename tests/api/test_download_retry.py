@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from app.constants import API_DOWNLOADS_CANCEL, DownloadStatus, MediaType
+from app.extensions import db
+from app.models.download import Download
+from app.models.queue import QueuedDownload
+from app.services.execution_service import (
+    process_download_request,
+    retry_failed_downloads,
+)
+from app.utils.tools import DownloadReportItem
+
+TRANSIENT_ERROR = "ERROR: Unable to download: HTTP Error 503: Service Unavailable"
+
+
+def make_due(download_id):
+    """Moves the retry of a download into the past."""
+    db.session.get(Download, download_id).next_retry_time = 1
+    db.session.commit()
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_transient_failure_is_retried(_mock_title, mock_video, download_queue):
+    mock_video.side_effect = [
+        DownloadReportItem(status=False, error=TRANSIENT_ERROR),
+        DownloadReportItem(files=["/downloads/Videos/a.mp4"]),
+    ]
+
+    report, _ = process_download_request(
+        [{"url": "https://v.com/1", "media_type": MediaType.VIDEO}], 2, 4
+    )
+    download_id = report[0]["id"]
+
+    download = db.session.get(Download, download_id)
+    assert download.status == DownloadStatus.FAILED
+    assert download.next_retry_time is not None
+    assert download.retry_count == 0
+
+    # The queue state is kept for the retry
+    assert db.session.get(QueuedDownload, download_id).range_end == 4
+
+    make_due(download_id)
+    assert retry_failed_downloads() is None
+    assert download_queue.join(timeout=5)
+
+    db.session.expire_all()
+    download = db.session.get(Download, download_id)
+    assert download.status == DownloadStatus.DONE
+    assert download.retry_count == 1
+    assert download.next_retry_time is None
+    assert QueuedDownload.query.count() == 0
+
+    assert mock_video.call_args.args[1:3] == (2, 4)
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_retries_run_out(_mock_title, mock_video, download_queue):
+    mock_video.return_value = DownloadReportItem(status=False, error=TRANSIENT_ERROR)
+
+    report, _ = process_download_request(
+        [{"url": "https://v.com/2", "media_type": MediaType.VIDEO}], None, None
+    )
+    download_id = report[0]["id"]
+
+    # The test scheduler allows 2 retries
+    for _ in range(2):
+        make_due(download_id)
+        retry_failed_downloads()
+        assert download_queue.join(timeout=5)
+
+    db.session.expire_all()
+    download = db.session.get(Download, download_id)
+    assert download.status == DownloadStatus.FAILED
+    assert download.retry_count == 2
+    assert download.next_retry_time is None
+    assert mock_video.call_count == 3
+
+
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_permanent_failure_is_not_retried(_mock_title, mock_video):
+    mock_video.return_value = DownloadReportItem(
+        status=False, error="ERROR: Unable to download: HTTP Error 404: Not Found"
+    )
+
+    report, _ = process_download_request(
+        [{"url": "https://v.com/3", "media_type": MediaType.VIDEO}], None, None
+    )
+
+    download = db.session.get(Download, report[0]["id"])
+    assert download.status == DownloadStatus.FAILED
+    assert download.next_retry_time is None
+    assert QueuedDownload.query.count() == 0
+
+
+def test_cancel_drops_the_retry(client, auth_headers, seed):
+    (download,) = seed([{"status": DownloadStatus.FAILED, "next_retry_time": 5000}])
+
+    res = client.post(
+        API_DOWNLOADS_CANCEL, headers=auth_headers, json={"ids": [download.id]}
+    )
+    assert res.get_json()["data"]["ids"] == [download.id]
+
+    db.session.expire_all()
+    download = db.session.get(Download, download.id)
+    assert download.status == DownloadStatus.CANCELLED
+    assert download.next_retry_time is None
@@ -0,0 +1,106 @@
+import pytest
+
+from app.constants import API_DOWNLOADS, API_DOWNLOADS_SEARCH, NEXT_CURSOR_HEADER
+from app.extensions import db
+from app.models.download import Download
+from app.utils.pagination import encode_cursor
+
+
+def search(client, auth_headers, **params):
+    response = client.get(
+        API_DOWNLOADS_SEARCH, headers=auth_headers, query_string=params
+    )
+    assert response.status_code == 200, response.json["error"]
+    return response
+
+
+def search_ids(client, auth_headers, q):
+    return [item["id"] for item in search(client, auth_headers, q=q).json["data"]]
+
+
+def test_words_match_as_prefixes(client, auth_headers, seed):
+    cats, dogs, _ = seed(
+        [
+            {"title": "Funny Cats Compilation", "url": "https://v.com/1"},
+            {"title": "Dogs", "url": "https://cats.example/dogs"},
+            {"title": "Birds", "url": "https://v.com/3"},
+        ]
+    )
+
+    # A match in the title ranks above one in the URL
+    assert search_ids(client, auth_headers, "cat") == [cats.id, dogs.id]
+    assert search_ids(client, auth_headers, "FUN comp") == [cats.id]
+    assert search_ids(client, auth_headers, "cats fish") == []
+
+
+def test_status_messages_are_searched(client, auth_headers, seed):
+    (failed,) = seed([{"status_message": "HttpError: '404 Not Found'"}])
+
+    assert search_ids(client, auth_headers, "not found") == [failed.id]
+
+
+def test_index_follows_writes(client, auth_headers, seed):
+    (download,) = seed([{"title": "Old Title"}])
+
+    res = client.patch(
+        API_DOWNLOADS, headers=auth_headers, json=[{"id": download.id, "title": "New"}]
+    )
+    assert res.status_code == 200
+
+    assert search_ids(client, auth_headers, "old") == []
+    assert search_ids(client, auth_headers, "new") == [download.id]
+
+    Download.query.filter_by(id=download.id).delete()
+    db.session.commit()
+
+    assert search_ids(client, auth_headers, "new") == []
+
+
+def test_results_are_paginated(client, auth_headers, seed):
+    seeded_ids = {row.id for row in seed([{"title": f"Clip {i}"} for i in range(5)])}
+
+    response = search(client, auth_headers, q="clip", limit=3)
+    first_page = [item["id"] for item in response.json["data"]]
+
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+    response = search(client, auth_headers, q="clip", limit=3, cursor=cursor)
+    second_page = [item["id"] for item in response.json["data"]]
+
+    assert len(first_page) == 3
+    assert set(first_page + second_page) == seeded_ids
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_query_without_words(client, auth_headers, seed):
+    seed([{"title": "Something"}])
+    assert search_ids(client, auth_headers, '"*:-') == []
+
+
+@pytest.mark.parametrize("query_string", ["", "q=", "q=a&limit=0", "q=a&cursor=x"])
+def test_invalid_search(client, auth_headers, query_string):
+    response = client.get(
+        f"{API_DOWNLOADS_SEARCH}?{query_string}", headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "position",
+    [
+        {"q": "a", "offset": "x"},
+        {"q": "a", "offset": [3]},
+        {"q": "a", "offset": -1},
+        {"q": "a", "offset": True},
+        {"q": "a", "offset": 2**63},
+        {"q": "b", "offset": 3},
+        {"offset": 3},
+    ],
+)
+def test_invalid_search_cursor(client, auth_headers, position):
+    response = client.get(
+        API_DOWNLOADS_SEARCH,
+        headers=auth_headers,
+        query_string={"q": "a", "cursor": encode_cursor(position)},
+    )
+    assert response.status_code == 400
+    assert "cursor" in response.json["error"]
@@ -0,0 +1,187 @@
+from unittest.mock import patch
+
+from app.constants import DownloadStatus, MediaType, QueueStage, RecoveryPolicy
+from app.extensions import db
+from app.models.download import Download
+from app.models.queue import QueuedDownload
+from app.services.execution_service import (
+    process_download_request,
+    record_download_request,
+    recover_downloads,
+)
+from app.utils.tools import DownloadReportItem
+
+
+def add_unfinished(url, status=DownloadStatus.PENDING, start_time=None, **queued):
+    download = Download(url=url, media_type=MediaType.GALLERY, status=status)
+    if start_time is not None:
+        download.start_time = start_time
+
+    db.session.add(download)
+    db.session.flush()
+
+    if queued:
+        db.session.add(QueuedDownload(download_id=download.id, **queued))
+
+    db.session.commit()
+    return download.id
+
+
+def test_requests_are_persisted_with_their_queue_state(client):
+    items = [{"url": "https://q.com/a", "title": "Given", "media_type": None}]
+
+    report, _ = record_download_request(items, 2, 9)
+
+    queued = db.session.get(QueuedDownload, report["https://q.com/a"].id)
+    assert queued.stage == QueueStage.EXPAND
+    assert queued.title == "Given"
+    assert (queued.range_start, queued.range_end) == (2, 9)
+
+
+@patch("app.services.execution_service.expand_collection_urls")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_queue_state_follows_the_job(_mock_title, mock_expand, client):
+    parent_url = "https://q.com/gallery"
+    child_urls = ["https://q.com/1", "https://q.com/2"]
+
+    mock_expand.return_value = child_urls
+
+    # Children stay queued as their downloads never happen
+    with patch("app.services.execution_service.process_items") as mock_process:
+        mock_process.return_value = []
+        process_download_request(
+            [{"url": parent_url, "media_type": MediaType.GALLERY}], None, 3
+        )
+
+    # Expanded in one go, the children are only waiting to be downloaded
+    parent = Download.query.filter_by(url=parent_url).one()
+    assert parent.status == DownloadStatus.DONE
+    assert parent.status_message == "Expanded into 2 new items."
+    assert db.session.get(QueuedDownload, parent.id) is None
+
+    children = QueuedDownload.query.all()
+    assert {queued.stage for queued in children} == {QueueStage.DOWNLOAD}
+    assert {queued.parent_id for queued in children} == {parent.id}
+    assert {queued.range_end for queued in children} == {3}
+
+    # Finalizing drops the queue state
+    with patch("app.services.execution_service.Video.download") as mock_video:
+        mock_video.return_value = DownloadReportItem()
+        process_download_request(
+            [{"url": "https://q.com/video", "media_type": MediaType.VIDEO}], None, None
+        )
+
+    video = Download.query.filter_by(url="https://q.com/video").one()
+    assert video.status == DownloadStatus.DONE
+    assert db.session.get(QueuedDownload, video.id) is None
+
+
+def test_resume_policy(download_queue):
+    parent_id = add_unfinished(
+        "https://r.com/gallery", stage=QueueStage.EXPAND, range_start=1, range_end=5
+    )
+    child_id = add_unfinished(
+        "https://r.com/1",
+        status=DownloadStatus.IN_PROGRESS,
+        stage=QueueStage.DOWNLOAD,
+        title="Child",
+        range_start=1,
+        range_end=5,
+    )
+    legacy_id = add_unfinished("https://r.com/legacy")
+
+    with patch("app.services.execution_service.run_download_job") as mock_job:
+        recover_downloads(RecoveryPolicy.RESUME)
+        assert download_queue.join(timeout=5)
+
+    jobs = {call.args[2:4]: call.args for call in mock_job.call_args_list}
+    assert set(jobs) == {(1, 5), (None, None)}
+
+    report, initial_queue, _, _, expanded_queue = jobs[(1, 5)]
+    assert set(report) == {"https://r.com/gallery", "https://r.com/1"}
+    assert initial_queue == [
+        (parent_id, "https://r.com/gallery", MediaType.GALLERY, None)
+    ]
+    assert expanded_queue == [(child_id, "https://r.com/1", MediaType.GALLERY, "Child")]
+
+    assert jobs[(None, None)][1] == [
+        (legacy_id, "https://r.com/legacy", MediaType.GALLERY, None)
+    ]
+
+    # Everything is pending again, and survives another restart
+    db.session.expire_all()
+    assert {d.status for d in Download.query.all()} == {DownloadStatus.PENDING}
+    assert db.session.get(QueuedDownload, legacy_id).stage == QueueStage.EXPAND
+
+
+def test_same_url_is_split_across_jobs(download_queue):
+    for _ in range(2):
+        add_unfinished("https://r.com/twice", stage=QueueStage.EXPAND)
+
+    with patch("app.services.execution_service.run_download_job") as mock_job:
+        recover_downloads(RecoveryPolicy.RESUME)
+        assert download_queue.join(timeout=5)
+
+    assert mock_job.call_count == 2
+
+
+def test_fail_policy():
+    ids = [
+        add_unfinished("https://f.com/1", stage=QueueStage.EXPAND),
+        add_unfinished("https://f.com/2", status=DownloadStatus.IN_PROGRESS),
+    ]
+
+    with patch("app.services.execution_service.run_download_job") as mock_job:
+        recover_downloads(RecoveryPolicy.FAIL)
+
+    mock_job.assert_not_called()
+
+    for download_id in ids:
+        download = db.session.get(Download, download_id)
+        assert download.status == DownloadStatus.FAILED
+        assert download.status_message == "Interrupted by a restart."
+        assert download.end_time is not None
+
+    assert QueuedDownload.query.count() == 0
+
+
+def test_old_downloads_are_failed(download_queue):
+    old_id = add_unfinished("https://o.com/old", start_time=1000)
+    new_id = add_unfinished("https://o.com/new")
+
+    with patch("app.services.execution_service.run_download_job") as mock_job:
+        recover_downloads(RecoveryPolicy.RESUME, max_age=60 * 60)
+        assert download_queue.join(timeout=5)
+
+    assert db.session.get(Download, old_id).status == DownloadStatus.FAILED
+
+    (report,) = [call.args[0] for call in mock_job.call_args_list]
+    assert [item.id for item in report.values()] == [new_id]
+
+
+@patch("app.services.execution_service.expand_collection_urls")
+@patch("app.services.execution_service.Video.download")
+@patch("app.services.execution_service.scrape_title", return_value=None)
+def test_resumed_children_are_not_expanded(
+    _mock_title, mock_video, mock_expand, download_queue
+):
+    mock_video.return_value = DownloadReportItem(files=["/downloads/a.mp4"])
+
+    download = Download(url="https://v.com/1", media_type=MediaType.VIDEO)
+    db.session.add(download)
+    db.session.flush()
+    db.session.add(
+        QueuedDownload(download_id=download.id, stage=QueueStage.DOWNLOAD, title="Kept")
+    )
+    db.session.commit()
+
+    recover_downloads()
+    assert download_queue.join(timeout=5)
+
+    mock_expand.assert_not_called()
+
+    db.session.expire_all()
+    download = db.session.get(Download, download.id)
+    assert download.status == DownloadStatus.DONE
+    assert download.title == "Kept"
+    assert QueuedDownload.query.count() == 0
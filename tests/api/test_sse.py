@@ -18,7 +18,7 @@ def parse_sse(raw_msg: str) -> dict:
     return json.loads(json_str.strip())
 
 
-def test_download_announcements(client, announcer, auth_headers):
+def test_download_announcements(client, announcer, auth_headers, download_queue):
     """
     Test the full chain of events for a download:
     create -> update (success)
@@ -39,6 +39,7 @@ def test_download_announcements(client, announcer, auth_headers):
             payload = {"items": [{"url": target_url, "mediaType": target_media_type}]}
             res = client.post(API_MEDIA_DOWNLOAD, headers=auth_headers, json=payload)
             assert res.status_code == 200
+            assert download_queue.join(timeout=5)
 
             mock_scrape.assert_called_once_with(target_url)
 
@@ -54,18 +55,28 @@ def test_download_announcements(client, announcer, auth_headers):
     assert create_data["mediaType"] == target_media_type
     assert isinstance(create_data["startTime"], int)
 
-    # Expect UPDATE
-    msg_update = parse_sse(test_queue.get(timeout=2))
-    assert msg_update["type"] == EventType.UPDATE
-
-    update_data = msg_update["data"][0]
-    print("Update data: ", update_data)
-
-    assert update_data["id"] == create_data["id"]
-    assert update_data["title"] == mock_title
-    assert isinstance(update_data["endTime"], int)
-    assert update_data["status"] == DownloadStatus.DONE
-    assert "statusMessage" in update_data
+    # Expect UPDATEs. The title stage and the download run concurrently, so the
+    # title may arrive in its own event, before or after the final one. The
+    # item may also be announced as in progress first.
+    merged_update: dict = {}
+    while (
+        merged_update.get("status") != DownloadStatus.DONE
+        or "title" not in merged_update
+    ):
+        msg_update = parse_sse(test_queue.get(timeout=2))
+        assert msg_update["type"] == EventType.UPDATE
+
+        update_data = msg_update["data"][0]
+        print("Update data: ", update_data)
+
+        assert update_data["id"] == create_data["id"]
+        merged_update.update(
+            {key: value for key, value in update_data.items() if value is not None}
+        )
+
+    assert merged_update["title"] == mock_title
+    assert isinstance(merged_update["endTime"], int)
+    assert merged_update["status"] == DownloadStatus.DONE
 
 
 def test_system_resilience_to_announcer_failure(client, auth_headers, seed):
@@ -1,3 +1,5 @@
+import functools
+import http.server
 import os
 import shutil
 import tempfile
@@ -14,8 +16,18 @@ from app import app
 from app.constants import MediaType
 from app.extensions import db
 from app.models.download import Download
+from app.models.expansion import ExpansionCacheEntry
+from app.models.queue import QueuedDownload
+from app.utils.cancellation import CancellationRegistry
 from app.utils.database import seed_db
+from app.utils.expansion_cache import ExpansionCache
+from app.utils.group_commit import GroupCommitWriter
+from app.utils.job_queue import JobQueue
+from app.utils.rate_limiter import rate_limiter
+from app.utils.retry_scheduler import RetryScheduler
 from app.utils.sse import MessageAnnouncer
+from app.utils.title_cache import TitleCache
+from app.utils.worker_pool import DownloadPool
 
 # --- CONFIGURATION ---
 TEST_PORT = 5002
@@ -44,6 +56,16 @@ def db_instance():
             "TESTING": True,
             "DOWNLOAD_DIR": Path(tmp_dir_path),
             "ANNOUNCER": announcer,
+            "DOWNLOAD_QUEUE": JobQueue(worker_count=2),
+            "DOWNLOAD_POOL": DownloadPool(max_workers=4, per_host_limit=2),
+            "TITLE_POOL": DownloadPool(max_workers=4, per_host_limit=2),
+            "DOWNLOAD_WRITER": GroupCommitWriter(max_items=50, max_delay=0.01),
+            "CANCELLATIONS": CancellationRegistry(),
+            "RETRY_SCHEDULER": RetryScheduler(max_attempts=2, base_delay=60),
+            "GALLERY_BATCH_SIZE": 20,
+            "VIDEO_FRAGMENT_WORKERS": 4,
+            "EXPANSION_CACHE": ExpansionCache(ttl=60, max_entries=100),
+            "TITLE_CACHE": TitleCache(memory_size=100, ttl=60, negative_ttl=10),
         }
     )
 
@@ -96,9 +118,18 @@ def clean_db(db_instance):
     """
     yield  # Run the test
 
+    # Let background jobs settle so they don't write into the next test
+    app.config["DOWNLOAD_QUEUE"].join(timeout=10)
+
     db.session.query(Download).delete()
+    db.session.query(QueuedDownload).delete()
+    db.session.query(ExpansionCacheEntry).delete()
     db.session.commit()
 
+    app.config["TITLE_CACHE"].clear()
+    # Throttled responses of one test shouldn't slow down the next ones
+    rate_limiter.reset()
+
 
 @pytest.fixture
 def seed(db_instance):
@@ -127,6 +158,34 @@ def announcer(db_instance):
     return app.config["ANNOUNCER"]
 
 
+@pytest.fixture
+def download_queue(db_instance):
+    """
+    Provides access to the background JobQueue stored in the app config.
+    """
+    return app.config["DOWNLOAD_QUEUE"]
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """Serves a few media files over HTTP, for the downloaders to fetch."""
+    (tmp_path / "image-1.jpg").write_bytes(b"\xff\xd8\xff" + b"0" * 128)
+    (tmp_path / "clip.mp4").write_bytes(b"\x00\x00\x00\x18ftypmp42" + b"0" * 256)
+
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=str(tmp_path)
+    )
+    handler.log_message = lambda *args: None  # type: ignore[attr-defined]
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+
+
 @pytest.fixture
 def auth_headers():
     return {"X-API-Key": "test-secret-key"}
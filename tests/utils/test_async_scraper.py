@@ -0,0 +1,176 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+from app.utils.async_scraper import AsyncTitleEngine
+from app.utils.rate_limiter import rate_limiter
+from app.utils.scraper import scrape_titles
+
+
+class BulkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/page/target")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        elif self.path == "/throttled":
+            self.send_response(429)
+            self.send_header("Retry-After", "60")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        elif self.path == "/missing":
+            self.send_error(404)
+
+        elif self.path == "/slow":
+            time.sleep(1)
+            self.send_page(b"<title>Slow</title>")
+
+        elif self.path == "/archive.bin":
+            self.send_page(b"\0" * 1024, content_type="application/zip")
+
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in (b"<html><head><ti", b"tle>Chunked</title>"):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+
+        else:
+            self.track_active()
+            self.send_page(f"<title>Title of {self.path}</title>".encode())
+
+    def track_active(self):
+        # Left before responding, the client may reconnect as soon as it's done
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+
+        time.sleep(0.01)
+
+        with cls.lock:
+            cls.active -= 1
+
+    def send_page(self, content, content_type="text/html; charset=utf-8"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+@pytest.fixture
+def bulk_server():
+    handler = type("Handler", (BulkHandler,), {"active": 0, "max_active": 0})
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield handler, f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+
+
+def test_resolves_batch(bulk_server):
+    _, base_url = bulk_server
+    urls = [
+        f"{base_url}/page/1",
+        f"{base_url}/redirect",
+        f"{base_url}/missing",
+        f"{base_url}/archive.bin",
+        f"{base_url}/chunked",
+        "ftp://unsupported.invalid/file",
+    ]
+
+    probes = AsyncTitleEngine().resolve(urls)
+
+    assert list(probes) == urls
+    assert probes[urls[0]].title == "Title of /page/1"
+    assert probes[urls[1]].title == "Title of /page/target"
+    assert probes[urls[2]].error == "HTTP Error 404"
+    assert probes[urls[3]].title is None
+    assert probes[urls[3]].content_type == "application/zip"
+    assert probes[urls[4]].title == "Chunked"
+    assert probes[urls[5]].error.startswith("ValueError")
+
+
+def test_throttled_host_backs_off_as_asked(bulk_server):
+    _, base_url = bulk_server
+
+    probes = AsyncTitleEngine().resolve([f"{base_url}/throttled"])
+
+    assert probes[f"{base_url}/throttled"].retry_after == 60
+    # Longer than the backoff a host gets without a Retry-After
+    assert rate_limiter.backoff_remaining(base_url[7:]) > rate_limiter.BASE_BACKOFF
+
+
+def test_per_host_limit(bulk_server):
+    handler, base_url = bulk_server
+    urls = [f"{base_url}/page/{i}" for i in range(40)]
+
+    probes = AsyncTitleEngine(max_concurrency=50, per_host_limit=3).resolve(urls)
+
+    assert all(probe.title for probe in probes.values())
+    assert handler.max_active <= 3
+
+
+def test_time_budget_cancels_unfinished(bulk_server):
+    _, base_url = bulk_server
+    urls = [f"{base_url}/page/fast", f"{base_url}/slow"]
+
+    probes = AsyncTitleEngine().resolve(urls, time_budget=0.5)
+
+    assert probes[urls[0]].title == "Title of /page/fast"
+    assert probes[urls[1]].cancelled
+    assert probes[urls[1]].title is None
+
+
+def test_cancel_event(bulk_server):
+    _, base_url = bulk_server
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    probes = AsyncTitleEngine().resolve([f"{base_url}/slow"], cancel_event=cancel_event)
+
+    assert all(probe.cancelled for probe in probes.values())
+
+
+def test_scrape_titles_uses_cache(bulk_server, monkeypatch):
+    _, base_url = bulk_server
+    urls = [f"{base_url}/page/a", f"{base_url}/missing", f"{base_url}/slow"]
+
+    titles = scrape_titles(urls, time_budget=0.5)
+
+    assert titles[urls[0]] == "Title of /page/a"
+    assert titles[urls[1]] == "missing - " + base_url[7:]
+    assert titles[urls[2]] == "slow - " + base_url[7:]
+
+    # Cached, except for the URL that ran out of time
+    resolved = []
+    original = AsyncTitleEngine.resolve
+
+    def spy(self, to_fetch, *args):
+        resolved.extend(to_fetch)
+        return original(self, to_fetch, *args)
+
+    monkeypatch.setattr(AsyncTitleEngine, "resolve", spy)
+    scrape_titles(urls, time_budget=0.5)
+
+    assert resolved == [urls[2]]
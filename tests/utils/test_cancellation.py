@@ -0,0 +1,60 @@
+import threading
+import time
+
+from app.utils.cancellation import CancellationRegistry
+from app.utils.downloaders import Video
+from app.utils.tools import run_command
+
+
+def test_scope_is_cancelled_once_all_its_items_are():
+    registry = CancellationRegistry()
+
+    with registry.scope([1, 2]) as scope:
+        registry.cancel([1])
+        assert not scope.cancelled
+        assert registry.is_cancelled(1)
+
+        registry.cancel([2])
+        assert scope.cancelled
+
+    registry.forget([1, 2])
+    assert not registry.is_cancelled(1)
+
+
+def test_scope_of_cancelled_items_starts_cancelled():
+    registry = CancellationRegistry()
+    registry.cancel([3])
+
+    with registry.scope([3]) as scope:
+        assert scope.cancelled
+
+
+def test_run_command_is_killed():
+    registry = CancellationRegistry()
+    results = []
+
+    with registry.scope([1]) as scope:
+        thread = threading.Thread(
+            target=lambda: results.append(run_command(["sleep", "30"], cancel=scope))
+        )
+        start_time = time.monotonic()
+        thread.start()
+
+        # Give the process a moment to start
+        time.sleep(0.2)
+        registry.cancel([1])
+        thread.join(timeout=5)
+
+    assert time.monotonic() - start_time < 5
+    assert not results[0].success
+
+
+def test_cancelled_video_download_stops(file_server):
+    registry = CancellationRegistry()
+    registry.cancel([1])
+
+    with registry.scope([1]) as scope:
+        report = Video.download([f"{file_server}/clip.mp4"], cancel=scope)
+
+    assert not report.status
+    assert report.files == []
@@ -0,0 +1,60 @@
+from flask import Flask
+from sqlalchemy import inspect, text
+
+from app.extensions import db
+from app.utils.database import (
+    add_missing_columns,
+    add_missing_indexes,
+    add_search_index,
+    backfill_hosts,
+)
+
+
+def test_missing_columns_are_added(tmp_path):
+    # A database of its own, the shared one must keep its schema
+    old_app = Flask(__name__)
+    old_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'old.db'}"
+    db.init_app(old_app)
+
+    with old_app.app_context():
+        # As if the table was created before the column existed
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE downloads (id INTEGER PRIMARY KEY, url VARCHAR, "
+                    "order_number INTEGER, start_time BIGINT, status INTEGER)"
+                )
+            )
+            connection.execute(
+                text("INSERT INTO downloads (url) VALUES ('https://A.com/1')")
+            )
+
+        add_missing_columns()
+        add_missing_indexes()
+        backfill_hosts()
+        add_search_index()
+
+        columns = {c["name"] for c in inspect(db.engine).get_columns("downloads")}
+        assert {"priority", "title", "status_message", "next_retry_time"} <= columns
+
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                text("SELECT priority, retry_count, next_retry_time FROM downloads")
+            )
+            assert row.one() == (0, 0, None)
+
+            host = connection.execute(text("SELECT host FROM downloads"))
+            assert host.scalar() == "a.com"
+
+            # Existing downloads are searchable right away
+            match = connection.execute(
+                text("SELECT rowid FROM downloads_fts WHERE downloads_fts MATCH 'a'")
+            )
+            assert match.scalar() == 1
+
+        # Along with the indexes of old and new columns
+        indexes = inspect(db.engine).get_indexes("downloads")
+        indexed = {column for index in indexes for column in index["column_names"]}
+        assert {"start_time", "next_retry_time"} <= indexed
+
+        db.engine.dispose()
@@ -0,0 +1,223 @@
+from unittest.mock import patch
+
+from app.constants import EventType, MediaType
+from app.services.execution_service import plan_batches
+from app.utils.downloaders import Gallery, GalleryOutput, Video
+from app.utils.progress import ProgressTracker
+from app.utils.rate_limiter import RateLimiter
+from app.utils.tools import CommandResult, run_command
+
+BATCH_OUTPUT = """
+[media-server][batch] https://s.com/1
+/downloads/Galleries/s/1/image-1.jpg
+/downloads/Galleries/s/1/image-2.jpg
+[media-server][batch] https://s.com/2
+[s][error] HttpError: '404 Not Found'
+[media-server][batch] https://s.com/3
+# /downloads/Galleries/s/3/image-1.jpg
+"""
+
+
+def stream_output(output, return_code=0):
+    """Stands in for run_command, printing the output line by line."""
+
+    def run(command, on_line=None, cancel=None):
+        for line in output.splitlines(keepends=True):
+            on_line(line)
+        return CommandResult(return_code=return_code, output="")
+
+    return run
+
+
+def test_download_batch_attributes_output():
+    """Files and errors are attributed to the URL they were printed under."""
+    urls = ["https://s.com/1", "https://s.com/2", "https://s.com/3"]
+
+    with patch("app.utils.downloaders.run_command") as mock_run:
+        mock_run.side_effect = stream_output(BATCH_OUTPUT, return_code=4)
+        reports = Gallery.download_batch(urls, 1, 5)
+
+    command = mock_run.call_args.args[0]
+    assert command.count("https://s.com/1") == 1
+    assert "output.progress=[media-server][batch] {url}" in command
+    assert command[-2:] == ["--range", "1-5"]
+
+    assert reports["https://s.com/1"].status
+    assert reports["https://s.com/1"].files == [
+        "/downloads/Galleries/s/1/image-1.jpg",
+        "/downloads/Galleries/s/1/image-2.jpg",
+    ]
+
+    assert not reports["https://s.com/2"].status
+    assert reports["https://s.com/2"].error == (
+        "[gallery-dl] Error: HttpError: '404 Not Found'"
+    )
+    assert reports["https://s.com/2"].files == []
+
+    # Skipped files still count as written
+    assert reports["https://s.com/3"].status
+    assert reports["https://s.com/3"].files == ["/downloads/Galleries/s/3/image-1.jpg"]
+
+
+def test_download_batch_generic_failure():
+    """Without a specific error, a failing batch blames the URLs without files."""
+    output = "[media-server][batch] https://s.com/1\n/a.jpg\n"
+    output += "[media-server][batch] https://s.com/2\n"
+
+    with patch("app.utils.downloaders.run_command") as mock_run:
+        mock_run.side_effect = stream_output(output, return_code=1)
+        reports = Gallery.download_batch(["https://s.com/1", "https://s.com/2"])
+
+    assert reports["https://s.com/1"].status
+    assert not reports["https://s.com/2"].status
+    assert "Code 1" in reports["https://s.com/2"].error
+
+
+def test_plan_batches():
+    entries = [
+        (1, "https://a.com/1", MediaType.GALLERY, None),
+        (2, "https://b.com/1", None, None),
+        (3, "https://a.com/2", MediaType.GALLERY, None),
+        (4, "https://a.com/3", MediaType.VIDEO, None),
+        (5, "https://a.com/4", MediaType.GALLERY, None),
+    ]
+
+    batches = plan_batches(entries, batch_size=2)
+    assert [[entry[0] for entry in batch] for batch in batches] == [
+        [1, 3],
+        [2],
+        [4],
+        [5],
+    ]
+
+    assert len(plan_batches(entries, batch_size=1)) == len(entries)
+
+    # Items of a different priority don't share a batch
+    batches = plan_batches(entries, batch_size=3, priorities={3: 5})
+    assert [[entry[0] for entry in batch] for batch in batches] == [
+        [1, 5],
+        [2],
+        [3],
+        [4],
+    ]
+
+
+def test_video_download_reports_files(file_server):
+    url = f"{file_server}/clip.mp4"
+
+    report = Video.download([url])
+
+    assert report.status, report.error
+    assert len(report.files) == 1
+    assert report.files[0].endswith(".mp4")
+    assert "Videos" in report.files[0]
+
+    # Already downloaded files are still reported, by the same instance
+    ydl, _ = Video.get_downloader()
+    assert Video.download([url]).files == report.files
+    assert Video.get_downloader()[0] is ydl
+
+
+def test_video_download_failure(file_server):
+    report = Video.download([f"{file_server}/missing.mp4"])
+
+    assert not report.status
+    assert report.files == []
+    assert report.error.startswith("[yt-dlp] Error:")
+    assert "404" in report.error
+
+
+def test_video_playlist_items():
+    assert Video.get_playlist_items(None, None) is None
+    assert Video.get_playlist_items(2, None) == "2:"
+    assert Video.get_playlist_items(None, 5) == "1:5"
+
+
+def test_gallery_output_is_parsed_while_streaming():
+    files = []
+    lines = [f"[s][info] Line {i}\n" for i in range(GalleryOutput.MAX_LOG_LINES + 10)]
+    lines[5:5] = ["/downloads/Galleries/s/a.jpg\n", "[s][error] Boom\n"]
+
+    parser = GalleryOutput(on_file=files.append)
+    for line in lines:
+        parser.feed(line)
+
+        # Files are reported as soon as they're printed
+        if line.startswith("/"):
+            assert files == ["/downloads/Galleries/s/a.jpg"]
+
+    report = parser.report(0)
+
+    assert not report.status
+    assert report.error == "[gallery-dl] Error: Boom"
+    assert report.files == files
+
+    # Only the tail of a long log is kept
+    log_lines = report.output.splitlines()
+    assert len(log_lines) == GalleryOutput.MAX_LOG_LINES
+    assert log_lines[-1] == f"[s][info] Line {GalleryOutput.MAX_LOG_LINES + 9}"
+
+
+def test_throttled_gallery_output_is_reported():
+    limiter = RateLimiter()
+    output = "[s][error] HttpError: '429 Too Many Requests' for 'https://s.com/1'\n"
+
+    with (
+        patch("app.utils.downloaders.rate_limiter", limiter),
+        patch("app.utils.downloaders.run_command") as mock_run,
+    ):
+        mock_run.side_effect = stream_output(output, return_code=4)
+        Gallery.download(["https://s.com/1"])
+
+        assert limiter.backoff_remaining("s.com") > 0
+
+        # The next runs are told to slow down
+        command = Gallery.build_command(["https://s.com/2"])
+        assert command[command.index("--sleep-request") + 1] == "1.0"
+
+
+def test_file_names_are_not_mistaken_for_throttling():
+    lines = [
+        "/downloads/Galleries/s/abc Rate Limit explained.jpg",
+        "/downloads/Galleries/s/HTTP Error 429 Too Many Requests.png",
+        "[s][info] Saved 'HTTP 503 postmortem'",
+    ]
+
+    parser = GalleryOutput()
+    for line in lines:
+        parser.feed(line)
+
+    assert not parser.throttled
+    assert not Gallery.is_throttled(lines)
+    assert Gallery.is_throttled([*lines, "[s][warning] HTTP 429 from the API"])
+
+
+def test_run_command_streams_lines():
+    lines = []
+
+    result = run_command(["printf", "a\\nb\\n"], on_line=lines.append)
+
+    assert result.success
+    assert lines == ["a\n", "b\n"]
+    assert result.output == ""
+
+
+def test_video_download_reports_progress(file_server, announcer):
+    url = f"{file_server}/clip.mp4"
+
+    with patch.object(announcer, "announce") as mock_announce:
+        with ProgressTracker({url: 42}, interval=0) as progress:
+            Video.download([url], progress=progress)
+
+    events = [
+        event
+        for call in mock_announce.call_args_list
+        if call.args[0] == EventType.PROGRESS
+        for event in call.args[1]
+    ]
+
+    assert events
+    assert {event["id"] for event in events} == {42}
+    assert events[-1]["files_done"] == 1
+    assert events[-1]["bytes_done"] > 0
+    assert events[-1]["current_file"].endswith(".mp4")
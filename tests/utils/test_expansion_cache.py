@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.extensions import db
+from app.models.expansion import ExpansionCacheEntry
+from app.utils.expansion_cache import ExpansionCache
+from app.utils.scraper import expand_collection_urls
+
+
+@pytest.fixture
+def cache(db_instance):
+    return ExpansionCache(ttl=60, max_entries=3)
+
+
+def test_hits_and_misses(cache):
+    cache.put_many({"https://s.com/a": ["https://s.com/a/1"], "https://s.com/b": []})
+
+    hits = cache.get_many(["https://s.com/a", "https://s.com/b", "https://s.com/c"])
+
+    assert hits == {"https://s.com/a": ["https://s.com/a/1"], "https://s.com/b": []}
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["entries"] == 2
+
+
+def test_expired_entries_are_ignored(cache):
+    with patch("app.utils.expansion_cache._now", return_value=1000):
+        cache.put_many({"https://s.com/a": ["https://s.com/a/1"]})
+
+    with patch("app.utils.expansion_cache._now", return_value=1000 + 61):
+        assert cache.get_many(["https://s.com/a"]) == {}
+
+        # Dropped on the next write
+        cache.put_many({"https://s.com/b": []})
+
+    assert db.session.get(ExpansionCacheEntry, "https://s.com/a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i, url in enumerate(["https://s.com/1", "https://s.com/2", "https://s.com/3"]):
+        with patch("app.utils.expansion_cache._now", return_value=1000 + i):
+            cache.put_many({url: []})
+
+    with patch("app.utils.expansion_cache._now", return_value=1010):
+        cache.get_many(["https://s.com/1"])
+
+    with patch("app.utils.expansion_cache._now", return_value=1020):
+        cache.put_many({"https://s.com/4": []})
+
+    urls = {entry.url for entry in ExpansionCacheEntry.query.all()}
+    assert urls == {"https://s.com/1", "https://s.com/3", "https://s.com/4"}
+
+
+def test_expansion_skips_cached_simulations():
+    tree = {
+        "http://s.com/root": ["http://s.com/a", "http://s.com/b"],
+        "http://s.com/a": ["http://s.com/a1"],
+    }
+    calls = []
+
+    def fake_simulate(url):
+        calls.append(url)
+        # A failed simulation must not be cached
+        return None if url == "http://s.com/b" else tree.get(url, [])
+
+    with patch("app.utils.scraper.simulate_collection", side_effect=fake_simulate):
+        first = expand_collection_urls("http://s.com/root")
+        simulated_count = len(calls)
+
+        # An overlapping collection only simulates what it hasn't seen
+        assert expand_collection_urls("http://s.com/a") == ["http://s.com/a1"]
+        assert len(calls) == simulated_count
+
+        assert expand_collection_urls("http://s.com/root") == first
+
+    assert first == ["http://s.com/a", "http://s.com/a1", "http://s.com/b"]
+    assert calls[simulated_count:] == ["http://s.com/b"]
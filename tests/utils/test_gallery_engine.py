@@ -0,0 +1,167 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+from app import app
+from app.utils.cancellation import CancellationRegistry
+from app.utils.downloaders import Gallery
+from app.utils.gallery_engine import EngineMode, engine
+from app.utils.process_pool import WarmProcessPool
+from app.utils.scraper import simulate_collection
+
+
+@pytest.fixture
+def in_process_engine():
+    pytest.importorskip("gallery_dl")
+
+    engine.configure(EngineMode.IN_PROCESS)
+    yield engine
+    engine.configure(EngineMode.SUBPROCESS)
+
+
+def test_download_collects_files_through_hooks(in_process_engine, file_server):
+    url = f"{file_server}/image-1.jpg"
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.utils.downloaders.run_command", None)  # Must not be used
+        report = Gallery.download([url])
+
+    assert report.status
+    assert report.error is None
+    assert len(report.files) == 1
+    assert report.files[0].endswith("image-1.jpg")
+
+    # Already downloaded files are still reported
+    assert Gallery.download([url]).files == report.files
+
+
+def test_download_batch_attributes_errors(in_process_engine, file_server):
+    ok_url = f"{file_server}/image-1.jpg"
+    missing_url = f"{file_server}/missing.jpg"
+    unsupported_url = "https://unsupported.invalid/page"
+
+    reports = Gallery.download_batch([ok_url, missing_url, unsupported_url])
+
+    assert reports[ok_url].status
+    assert len(reports[ok_url].files) == 1
+
+    assert not reports[missing_url].status
+    assert reports[missing_url].files == []
+    assert "Failed to download" in reports[missing_url].error
+
+    assert not reports[unsupported_url].status
+    assert "Unsupported URL" in reports[unsupported_url].error
+
+
+def test_cancelled_job_stops_before_its_files(in_process_engine, file_server):
+    registry = CancellationRegistry()
+    registry.cancel([1])
+
+    with registry.scope([1]) as scope:
+        report = Gallery.download([f"{file_server}/image-1.jpg"], cancel=scope)
+
+    assert report.files == []
+
+
+def test_simulate_in_process(in_process_engine, file_server):
+    # A single file is not a collection
+    assert simulate_collection(f"{file_server}/image-1.jpg") == []
+    assert in_process_engine.simulate(f"{file_server}/image-1.jpg")[-1][0] == 3
+
+
+def test_unknown_mode_falls_back_to_subprocess():
+    engine.configure("bogus")
+    assert engine.mode == EngineMode.SUBPROCESS
+    assert not engine.in_process
+    assert engine.download(["https://a.com"], {}) is None
+
+
+@pytest.fixture
+def pool_engine():
+    pytest.importorskip("gallery_dl")
+
+    pool = WarmProcessPool(size=1, max_jobs=2)
+    engine.configure(EngineMode.PROCESS_POOL, pool)
+    yield engine
+    engine.configure(EngineMode.SUBPROCESS)
+
+
+def test_download_on_warm_process(pool_engine, file_server):
+    url = f"{file_server}/image-1.jpg"
+
+    report = Gallery.download([url])
+    assert report.status
+    assert report.files[0].endswith("image-1.jpg")
+
+    assert pool_engine.simulate(url)[-1][0] == 3
+
+    stats = pool_engine.stats()["pool"]
+    assert stats["jobs"] == 2
+    # The only worker hit its job limit and got replaced
+    assert stats["recycled"] == 1
+    assert stats["idle"] == 1
+
+
+def test_crashed_worker_is_replaced(pool_engine):
+    pool = pool_engine.pool
+    pool.start()
+    pool._workers[0].process.kill()
+    pool._workers[0].process.join()
+
+    assert pool_engine.simulate("https://a.com") is None
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["idle"] == 1
+
+
+class StallingHandler(http.server.BaseHTTPRequestHandler):
+    """Never answers, like a host that hangs in the middle of a download."""
+
+    def do_GET(self):
+        time.sleep(30)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cancel_kills_the_busy_worker(pool_engine):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    pool = pool_engine.pool
+    pool.start()
+    process = pool._workers[0].process
+
+    registry = CancellationRegistry()
+    reports = []
+
+    def download():
+        with app.app_context(), registry.scope([1]) as scope:
+            url = f"http://127.0.0.1:{server.server_port}/image.jpg"
+            reports.append(Gallery.download([url], cancel=scope))
+
+    thread = threading.Thread(target=download)
+    thread.start()
+
+    # Wait for the worker to pick up the job
+    for _ in range(50):
+        if pool.stats()["idle"] == 0:
+            break
+        time.sleep(0.1)
+
+    registry.cancel([1])
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert not process.is_alive()
+    assert not reports[0].status
+    assert "cancellation" in reports[0].error
+
+    # The killed worker was replaced by a fresh one
+    assert pool.stats()["recycled"] == 1
+    assert pool._workers[0].process is not process
+    assert pool._workers[0].process.is_alive()
+
+    server.shutdown()
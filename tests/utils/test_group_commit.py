@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.constants import DownloadStatus, EventType
+from app.extensions import db
+from app.models.download import Download
+from app.utils.group_commit import GroupCommitWriter
+
+
+@pytest.fixture
+def records(db_instance):
+    downloads = [Download(url=f"https://w.com/{i}") for i in range(20)]
+    db.session.add_all(downloads)
+    db.session.commit()
+
+    return [download.id for download in downloads]
+
+
+def test_writes_share_a_commit(records, announcer):
+    writer = GroupCommitWriter(max_items=len(records), max_delay=5)
+
+    with patch.object(announcer, "announce") as mock_announce:
+        futures = [
+            writer.write(i, {"status": DownloadStatus.DONE}, announce_record=True)
+            for i in records
+        ]
+
+        # A full batch is flushed without waiting for the delay
+        results = [future.result(timeout=2) for future in futures]
+
+    assert all(success for success, _, _ in results)
+    assert writer.stats()["flushes"] == 1
+
+    mock_announce.assert_called_once()
+    event_type, announced = mock_announce.call_args.args
+    assert event_type == EventType.UPDATE
+    assert sorted(record["id"] for record in announced) == records
+
+    db.session.expire_all()
+    assert {d.status for d in Download.query.all()} == {DownloadStatus.DONE}
+
+
+def test_partial_writes_only_announce_changes(records, announcer):
+    writer = GroupCommitWriter(max_items=3, max_delay=5)
+    first, second = records[:2]
+
+    with patch.object(announcer, "announce") as mock_announce:
+        futures = [
+            writer.write(first, {"title": "First"}),
+            writer.write(second, {"title": None}),
+            writer.write(first, {"status": DownloadStatus.FAILED}),
+        ]
+        for future in futures:
+            future.result(timeout=2)
+
+    # The unchanged record isn't announced, the other one only once
+    mock_announce.assert_called_once_with(
+        EventType.UPDATE,
+        [{"id": first, "title": "First", "status": DownloadStatus.FAILED}],
+    )
+
+
+def test_whole_record_covers_partial_writes(records, announcer):
+    writer = GroupCommitWriter(max_items=2, max_delay=5)
+    download_id = records[0]
+
+    with patch.object(announcer, "announce") as mock_announce:
+        title_future = writer.write(download_id, {"title": "Title"})
+        writer.write(
+            download_id, {"status": DownloadStatus.DONE}, announce_record=True
+        ).result(timeout=2)
+
+    success, _, record_dict = title_future.result()
+    assert success
+    assert record_dict["title"] == "Title"
+
+    (announced,) = mock_announce.call_args.args[1:]
+    assert len(announced) == 1
+    assert announced[0]["title"] == "Title"
+    assert announced[0]["url"] == "https://w.com/0"
+
+
+def test_flushes_after_delay(records):
+    writer = GroupCommitWriter(max_items=100, max_delay=0.01)
+
+    success, error, _ = writer.write(records[0], {"title": "Alone"}).result(timeout=2)
+
+    assert success
+    assert error is None
+    assert writer.stats()["pending"] == 0
+
+
+def test_missing_record(records):
+    writer = GroupCommitWriter(max_items=2, max_delay=5)
+
+    missing = writer.write(-1, {"title": "Nope"})
+    found = writer.write(records[0], {"title": "Yes"})
+
+    assert missing.result(timeout=2) == (False, "Download ID -1 not found.", None)
+    assert found.result(timeout=2)[0]
+
+
+def test_failed_commit_is_reported(records):
+    writer = GroupCommitWriter(max_items=1, max_delay=0)
+
+    with patch.object(db.session, "commit", side_effect=RuntimeError("locked")):
+        success, error, record_dict = writer.write(
+            records[0], {"title": "Lost"}
+        ).result(timeout=2)
+
+    assert not success
+    assert "locked" in error
+    assert record_dict is None
+    assert writer.stats()["failed_flushes"] == 1
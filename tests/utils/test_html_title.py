@@ -0,0 +1,85 @@
+import pytest
+
+from app.utils.html_title import TitleExtractor, get_charset
+
+
+def extract(document, chunk_size=7, encoding=None):
+    extractor = TitleExtractor(encoding)
+    data = document if isinstance(document, bytes) else document.encode()
+
+    for i in range(0, len(data), chunk_size):
+        if extractor.feed(data[i : i + chunk_size]):
+            break
+
+    return extractor
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+def test_title_split_across_chunks(chunk_size):
+    document = (
+        "<!DOCTYPE html><html><head><!-- <title>Comment</title> -->"
+        "<script>var s = '<title>Script</title>';</script>"
+        "<TITLE>\n  Tom &amp; Jerry\n</Title></head>"
+    )
+
+    assert extract(document, chunk_size).title == "Tom & Jerry"
+
+
+def test_og_title():
+    document = (
+        '<head><meta property="og:title" content="Open &quot;Graph&quot;">'
+        "<title>Later</title>"
+    )
+
+    assert extract(document).title == 'Open "Graph"'
+
+
+def test_stops_at_end_of_head():
+    extractor = TitleExtractor()
+
+    assert extractor.feed(b"<html><head><meta name=x></head>")
+    assert extractor.title is None
+
+    # The body isn't parsed anymore
+    assert extractor.feed(b"<title>Body</title>")
+    assert extractor.title is None
+
+
+def test_empty_title_falls_through_to_og_title():
+    document = '<head><title> </title><meta name="og:title" content="OG"></head>'
+
+    assert extract(document).title == "OG"
+
+
+def test_huge_inline_script_is_skipped():
+    document = "<head><script>" + "x < y; " * 100_000 + "</script><title>T</title>"
+
+    assert extract(document, chunk_size=8192).title == "T"
+
+
+@pytest.mark.parametrize(
+    "meta",
+    [
+        '<meta charset="windows-1251">',
+        '<meta http-equiv="Content-Type" content="text/html; charset=windows-1251">',
+    ],
+)
+def test_meta_charset(meta):
+    document = f"<head>{meta}<title>Привет</title>".encode("windows-1251")
+
+    extractor = extract(document)
+    assert extractor.encoding == "cp1251"
+    assert extractor.title == "Привет"
+
+
+def test_header_charset_wins():
+    document = '<head><meta charset="windows-1251"><title>Grüße</title>'
+
+    extractor = extract(document.encode("latin-1"), encoding="ISO-8859-1")
+    assert extractor.encoding == "iso8859-1"
+    assert extractor.title == "Grüße"
+
+
+def test_get_charset():
+    assert get_charset('text/html; charset="UTF-8"') == "UTF-8"
+    assert get_charset("text/html") is None
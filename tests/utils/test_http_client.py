@@ -0,0 +1,73 @@
+import functools
+import http.server
+import threading
+
+import pytest
+
+from app.utils.http_client import HttpClient
+from app.utils.scraper import scrape_title
+
+
+@pytest.fixture
+def page_server(tmp_path):
+    """Serves a few HTML pages with keep-alive connections."""
+    for i in range(5):
+        (tmp_path / f"page-{i}.html").write_text(
+            f"<html><head><title>Page {i}</title></head><body>{'x' * 4096}</body>"
+        )
+
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=str(tmp_path)
+    )
+    handler.protocol_version = "HTTP/1.1"  # type: ignore[attr-defined]
+    handler.log_message = lambda *args: None  # type: ignore[attr-defined]
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+
+
+def test_connections_are_reused(page_server, monkeypatch):
+    client = HttpClient(pool_connections=4, pool_maxsize=2)
+    monkeypatch.setattr("app.utils.scraper.http_client", client)
+
+    titles = [scrape_title(f"{page_server}/page-{i}.html") for i in range(5)]
+
+    assert titles == [f"Page {i}" for i in range(5)]
+
+    stats = client.stats()
+    # A single GET per page, all over the same connection
+    assert stats["requests"] == 5
+    assert stats["connections"] == 1
+    assert stats["reuse_rate"] == 0.8
+    assert stats["hosts"][0]["host"] == page_server.removeprefix("http://")
+
+
+def test_sessions_are_per_thread():
+    client = HttpClient()
+    sessions = []
+
+    thread = threading.Thread(target=lambda: sessions.append(client.session))
+    thread.start()
+    thread.join()
+
+    assert client.session is client.session
+    assert sessions[0] is not client.session
+
+    # Every session sends through the same connection pools
+    assert sessions[0].get_adapter("https://a.com") is client._adapter
+    assert client.session.get_adapter("https://a.com") is client._adapter
+
+
+def test_configure_replaces_sessions():
+    client = HttpClient(pool_connections=4, pool_maxsize=2)
+    session = client.session
+
+    client.configure(pool_connections=8, pool_maxsize=4)
+
+    assert client.session is not session
+    assert client.stats()["pool_maxsize"] == 4
@@ -0,0 +1,67 @@
+import threading
+
+from app.utils.job_queue import JobQueue
+
+
+def run_blocked(job_queue, submit):
+    """
+    Keeps the only worker of the queue busy while `submit` queues jobs, so they
+    are all picked in one go once it's released.
+    """
+    release = threading.Event()
+    order = []
+
+    blocker = job_queue.submit(release.wait, 5)
+    futures = submit(order.append)
+
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+
+    assert job_queue.join(timeout=5)
+    return order
+
+
+def test_higher_priority_goes_first():
+    job_queue = JobQueue(worker_count=1, aging_interval=0)
+
+    order = run_blocked(
+        job_queue,
+        lambda record: [
+            job_queue.submit(record, "low"),
+            job_queue.submit(record, "high", priority=5),
+            job_queue.submit(record, "low-2"),
+        ],
+    )
+
+    assert order == ["high", "low", "low-2"]
+
+
+def test_waiting_jobs_age():
+    job_queue = JobQueue(worker_count=1, aging_interval=10)
+
+    def submit(record):
+        old = job_queue.submit(record, "old")
+        # Waited for long enough to catch up with 3 priority levels
+        with job_queue._cond:
+            job_queue._pending[-1].submit_time -= 35
+
+        return [old, job_queue.submit(record, "new", priority=3)]
+
+    assert run_blocked(job_queue, submit) == ["old", "new"]
+
+
+def test_reprioritize_queued_job():
+    job_queue = JobQueue(worker_count=1, aging_interval=0)
+
+    def submit(record):
+        futures = [
+            job_queue.submit(record, 1, item_ids=[1]),
+            job_queue.submit(record, 2, item_ids=[2, 3]),
+        ]
+        assert job_queue.reprioritize(3, 10)
+        assert not job_queue.reprioritize(4, 10)
+        return futures
+
+    assert run_blocked(job_queue, submit) == [2, 1]
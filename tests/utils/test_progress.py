@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.constants import EventType
+from app.utils.progress import ProgressTracker
+
+
+@pytest.fixture
+def announced(announcer):
+    with patch.object(announcer, "announce") as mock_announce:
+        yield mock_announce
+
+
+def payloads(mock_announce):
+    return [
+        call.args[1]
+        for call in mock_announce.call_args_list
+        if call.args[0] == EventType.PROGRESS
+    ]
+
+
+def test_events_are_rate_limited(announced, tmp_path):
+    image = tmp_path / "image.jpg"
+    image.write_bytes(b"0" * 100)
+
+    with ProgressTracker({"https://p.com/1": 7}, interval=60) as progress:
+        for _ in range(5):
+            progress.file_done("https://p.com/1", str(image))
+
+    # The first file goes out right away, the rest once the tracker is done
+    assert payloads(announced) == [
+        [
+            {
+                "id": 7,
+                "files_done": 1,
+                "bytes_done": 100,
+                "current_file": "image.jpg",
+                "eta": None,
+            }
+        ],
+        [
+            {
+                "id": 7,
+                "files_done": 5,
+                "bytes_done": 500,
+                "current_file": "image.jpg",
+                "eta": None,
+            }
+        ],
+    ]
+
+
+def test_only_changed_items_are_announced(announced):
+    progress = ProgressTracker({"https://p.com/1": 1, "https://p.com/2": 2}, interval=0)
+
+    progress.file_started("https://p.com/2", "/downloads/p/2/a.jpg")
+    progress.file_started("https://unknown.com", "/downloads/b.jpg")
+    progress.flush()
+
+    assert payloads(announced) == [
+        [
+            {
+                "id": 2,
+                "files_done": 0,
+                "bytes_done": 0,
+                "current_file": "a.jpg",
+                "eta": None,
+            }
+        ]
+    ]
+
+
+def test_bytes_in_flight(announced):
+    progress = ProgressTracker({"https://p.com/v": 3}, interval=0)
+
+    # A single item takes whatever can't be attributed
+    progress.bytes_progress(None, 50, eta=9.6)
+    progress.bytes_finished(None, 80)
+    progress.bytes_progress(None, 20)
+    progress.file_done(None, "/downloads/v.mp4", count_size=False)
+
+    events = [payload[0] for payload in payloads(announced)]
+    assert [event["bytes_done"] for event in events] == [50, 80, 100, 100]
+    assert events[0]["eta"] == 10
+    assert events[-1]["files_done"] == 1
+
+
+def test_eta_from_file_count(announced):
+    with patch("app.utils.progress.time.monotonic", return_value=100):
+        progress = ProgressTracker({"https://p.com/1": 1}, total_files=4, interval=0)
+
+    with patch("app.utils.progress.time.monotonic", return_value=110):
+        progress.file_done("https://p.com/1", "/missing/1.jpg")
+
+    # 10 seconds per file, 3 more to go
+    assert payloads(announced)[-1][0]["eta"] == 30
@@ -0,0 +1,156 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.utils.rate_limiter import (
+    RateLimiter,
+    is_throttle_message,
+    is_throttle_status,
+    parse_retry_after,
+)
+from app.utils.worker_pool import DownloadPool
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("[s][error] HttpError: '429 Too Many Requests' for 'https://s.com'", True),
+        ("ERROR: [generic] Unable to download: HTTP Error 503: Unavailable", True),
+        ("[s][warning] Rate limit reached, waiting", True),
+        ("[s][error] HttpError: '404 Not Found'", False),
+        ("/downloads/Galleries/s/429/image-503.jpg", False),
+        ("/downloads/Galleries/s/abc Rate Limit explained.jpg", False),
+        ("[s][warning] Rate limit exceeded, retrying", True),
+    ],
+)
+def test_is_throttle_message(line, expected):
+    assert is_throttle_message(line) == expected
+
+
+def test_is_throttle_status():
+    assert is_throttle_status(429)
+    assert is_throttle_status(502)
+    assert not is_throttle_status(404)
+    assert not is_throttle_status(None)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
+
+
+def test_bucket_allows_bursts_then_spaces_requests():
+    limiter = RateLimiter(rate=10, burst=2)
+
+    assert limiter.reserve("a.com") == 0
+    assert limiter.reserve("a.com") == 0
+    assert limiter.reserve("a.com") == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve("a.com") == pytest.approx(0.2, abs=0.01)
+
+    # Each host has its own bucket
+    assert limiter.reserve("b.com") == 0
+
+
+def test_unlimited_hosts_are_not_tracked():
+    limiter = RateLimiter()
+
+    assert all(limiter.reserve("a.com") == 0 for _ in range(100))
+    assert limiter.request_interval("a.com") is None
+    assert limiter.stats()["hosts"] == []
+
+
+def test_throttling_slows_the_host_down():
+    limiter = RateLimiter(rate=8, burst=1, max_backoff=60)
+
+    limiter.report_throttled("a.com")
+    assert limiter.backoff_remaining("a.com") == pytest.approx(5, abs=0.1)
+    assert limiter.request_interval("a.com") == 0.25
+
+    # Consecutive throttled responses back off exponentially
+    limiter.report_throttled("a.com")
+    assert limiter.backoff_remaining("a.com") == pytest.approx(10, abs=0.1)
+    assert limiter.request_interval("a.com") == 0.5
+
+    # The next request waits for the backoff
+    assert limiter.reserve("a.com") == pytest.approx(10, abs=0.1)
+    assert limiter.backoff_remaining("b.com") == 0
+
+
+def test_retry_after_is_honored_up_to_the_max_backoff():
+    limiter = RateLimiter(max_backoff=30)
+
+    limiter.report_throttled("a.com", retry_after=20)
+    assert limiter.backoff_remaining("a.com") == pytest.approx(20, abs=0.1)
+
+    limiter.report_throttled("b.com", retry_after=600)
+    assert limiter.backoff_remaining("b.com") == pytest.approx(30, abs=0.1)
+
+    # Even when it's shorter than the default backoff
+    limiter.report_throttled("c.com", retry_after=2)
+    assert limiter.backoff_remaining("c.com") == pytest.approx(2, abs=0.1)
+
+    # But a throttled host always gets a short pause
+    limiter.report_throttled("d.com", retry_after=0)
+    assert limiter.backoff_remaining("d.com") == pytest.approx(
+        RateLimiter.MIN_BACKOFF, abs=0.1
+    )
+
+
+def test_host_recovers_after_successes():
+    limiter = RateLimiter()
+
+    limiter.report_throttled("a.com")
+    assert limiter.request_interval("a.com") == 1
+
+    for _ in range(20):
+        limiter.report_success("a.com")
+
+    # Back to full speed once enough requests went through
+    assert limiter.request_interval("a.com") is None
+    assert limiter.stats()["hosts"][0]["throttled"] == 1
+
+
+def test_pool_skips_hosts_that_back_off():
+    limiter = RateLimiter()
+    limiter.report_throttled("slow.com", retry_after=60)
+
+    with patch("app.utils.worker_pool.rate_limiter", limiter):
+        pool = DownloadPool(max_workers=1)
+        finished = []
+
+        slow = pool.submit(
+            "https://slow.com/1", finished.append, "slow.com", priority=10
+        )
+        fast = pool.submit("https://fast.com/1", finished.append, "fast.com")
+
+        # The urgent task waits for its host, the other one overtakes it
+        fast.result(timeout=5)
+        assert not slow.done()
+
+        # Once the backoff is over, the waiting task runs
+        limiter.reset()
+        with pool._cond:
+            pool._cond.notify_all()
+        slow.result(timeout=5)
+
+    assert finished == ["fast.com", "slow.com"]
+
+
+def test_limiter_is_thread_safe():
+    limiter = RateLimiter(rate=1000, burst=1)
+    waits = []
+
+    def reserve():
+        for _ in range(50):
+            waits.append(limiter.reserve("a.com"))
+
+    threads = [threading.Thread(target=reserve) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every request got its own slot
+    assert len(set(round(wait, 4) for wait in waits)) > 150
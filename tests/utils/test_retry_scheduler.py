@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.retry_scheduler import RetryScheduler, is_transient_error
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        ("[gallery-dl] Error: HttpError: '503 Service Unavailable'", True),
+        (
+            "ERROR: [generic] Unable to download: HTTP Error 429: Too Many Requests",
+            True,
+        ),
+        ("ERROR: Read timed out. (read timeout=30)", True),
+        ("ConnectionError: Connection reset by peer", True),
+        ("[gallery-dl] Error: HttpError: '404 Not Found'", False),
+        ("[gallery-dl] Error: Unsupported URL 'https://s.com/rate-limits'", False),
+        ("[gallery-dl] No results found for url.", False),
+        ("Cancelled by the user.", False),
+        (None, False),
+    ],
+)
+def test_is_transient_error(error, expected):
+    assert is_transient_error(error) == expected
+
+
+def test_backoff_grows_with_jitter():
+    scheduler = RetryScheduler(max_attempts=3, base_delay=10, max_delay=25)
+    error = "HTTP Error 503: Service Unavailable"
+
+    for retry_count, (low, high) in enumerate([(5, 10), (10, 20), (12, 25)]):
+        retry_time = scheduler.get_retry_time(error, retry_count, now=1000)
+        assert 1000 + low <= retry_time <= 1000 + high
+
+    # Out of attempts
+    assert scheduler.get_retry_time(error, 3, now=1000) is None
+    assert scheduler.stats()["scheduled"] == 3
+
+
+def test_permanent_errors_are_not_retried():
+    scheduler = RetryScheduler()
+    assert scheduler.get_retry_time("HttpError: '404 Not Found'", 0) is None
+    assert RetryScheduler(max_attempts=0).get_retry_time("timed out", 0) is None
+
+
+def test_thread_wakes_up_for_due_retries():
+    scheduler = RetryScheduler()
+    calls = []
+    called = threading.Event()
+
+    def retry_due():
+        calls.append(time.time())
+        called.set()
+        return None
+
+    scheduler.start(retry_due)
+    assert called.wait(timeout=5)
+
+    # Nothing is due, so it sleeps until told about a retry
+    called.clear()
+    scheduler.wake(int(time.time()))
+    assert called.wait(timeout=5)
+
+    assert len(calls) == 2
+    assert scheduler.stats()["running"]
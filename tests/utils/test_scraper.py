@@ -1,6 +1,7 @@
 from unittest.mock import patch
 
-from app.utils.scraper import expand_collection_urls
+from app.utils.scraper import expand_collection_urls, simulate_collection
+from app.utils.tools import CommandResult
 
 
 def test_expand_collection_urls_depth_limit():
@@ -11,3 +12,61 @@ def test_expand_collection_urls_depth_limit():
         result = expand_collection_urls("http://test.com", depth=4)
         assert result == []
         assert mock_run.call_count == 0
+
+
+def _legacy_expand(tree, url, depth=0):
+    """Reference implementation of the original depth-first expansion."""
+    if depth > 3:
+        return []
+
+    child_urls = []
+    for c_url in tree.get(url, []):
+        child_urls.append(c_url)
+        child_urls.extend(_legacy_expand(tree, c_url, depth + 1))
+
+    return list(dict.fromkeys(child_urls))
+
+
+def test_expand_collection_urls_keeps_depth_first_order():
+    """The breadth-first engine must return the same list as the recursive one."""
+    tree = {
+        "http://s.com/root": ["http://s.com/a", "http://s.com/b", "http://s.com/c"],
+        "http://s.com/a": ["http://s.com/a1", "http://s.com/b"],
+        "http://s.com/b": ["http://s.com/b1", "http://s.com/b2"],
+        "http://s.com/b1": ["http://s.com/deep"],
+        "http://s.com/deep": ["http://s.com/deeper"],
+        "http://s.com/deeper": ["http://s.com/too-deep"],
+        "http://s.com/c": ["http://s.com/root", "http://s.com/a1"],
+    }
+    calls = []
+
+    def fake_simulate(url):
+        calls.append(url)
+        return tree.get(url, [])
+
+    with patch("app.utils.scraper.simulate_collection", side_effect=fake_simulate):
+        result = expand_collection_urls("http://s.com/root")
+
+    assert result == _legacy_expand(tree, "http://s.com/root")
+    assert "http://s.com/too-deep" not in result
+
+    # Every URL is simulated at most once
+    assert len(calls) == len(set(calls))
+
+
+def test_simulate_collection_level_homogeneity():
+    """Only flat, single-level outputs are treated as collections."""
+    collection = (
+        '[[6, "https://s.com/chapter/1", {}], [6, "https://s.com/chapter/2", {}]]'
+    )
+    gallery = '[[2, {"title": "Ch.1"}], [3, "https://s.com/img_01.webp", {}]]'
+
+    with patch("app.utils.scraper.run_command") as mock_run:
+        mock_run.return_value = CommandResult(return_code=0, output=collection)
+        assert simulate_collection("https://s.com/series") == [
+            "https://s.com/chapter/1",
+            "https://s.com/chapter/2",
+        ]
+
+        mock_run.return_value = CommandResult(return_code=0, output=gallery)
+        assert simulate_collection("https://s.com/chapter/1") == []
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from app import app
+from app.utils.scraper import scrape_title
+from app.utils.title_cache import TitleCache
+
+
+@pytest.fixture
+def cache(db_instance):
+    return TitleCache(memory_size=2, ttl=60, negative_ttl=10)
+
+
+def test_memory_and_table_tiers(cache):
+    cache.put("https://a.com/1", "First")
+
+    assert cache.get("https://a.com/1") == (True, "First")
+    assert cache.get("https://a.com/2") == (False, None)
+
+    # A fresh instance only has the table to go on
+    cold = TitleCache(memory_size=2, ttl=60, negative_ttl=10)
+    assert cold.get("https://a.com/1") == (True, "First")
+    assert cold.get("https://a.com/1") == (True, "First")
+
+    stats = cold.stats()
+    assert stats["db_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["domains"][0]["domain"] == "a.com"
+
+
+def test_memory_tier_is_bounded(cache):
+    for i in range(3):
+        cache.put(f"https://a.com/{i}", f"Title {i}")
+
+    assert cache.stats()["memory_entries"] == 2
+    assert "https://a.com/0" not in cache._memory
+
+
+def test_failures_expire_sooner(cache):
+    with patch("app.utils.title_cache._now", return_value=1000):
+        cache.put("https://down.com/1", None)
+        cache.put("https://up.com/1", "Up")
+
+    with patch("app.utils.title_cache._now", return_value=1005):
+        assert cache.get("https://down.com/1") == (True, None)
+
+    with patch("app.utils.title_cache._now", return_value=1011):
+        assert cache.get("https://down.com/1") == (False, None)
+        assert cache.get("https://up.com/1") == (True, "Up")
+
+    domains = {d["domain"]: d for d in cache.stats()["domains"]}
+    assert domains["down.com"]["failures"] == 1
+    assert domains["down.com"]["negative_hits"] == 1
+
+
+def test_scrape_title_uses_cache():
+    url = "https://cached.com/page"
+
+    with patch("app.utils.scraper._fetch_title", return_value="Page") as mock_fetch:
+        assert scrape_title(url) == "Page"
+        assert scrape_title(url) == "Page"
+
+    assert mock_fetch.call_count == 1
+
+
+def test_scrape_title_caches_failures():
+    url = "https://broken.com/page"
+    error = requests.ConnectionError("down")
+
+    with patch("app.utils.scraper._fetch_title", side_effect=error) as mock_fetch:
+        assert scrape_title(url) == "page - broken.com"
+        assert scrape_title(url) == "page - broken.com"
+
+    assert mock_fetch.call_count == 1
+    assert app.config["TITLE_CACHE"].get(url) == (True, None)
@@ -0,0 +1,112 @@
+import http.server
+import threading
+
+import pytest
+
+from app.utils import scraper
+from app.utils.http_client import HttpClient
+from app.utils.scraper import scrape_title
+
+PAGE = b"<html><head><title>Probed</title></head><body>" + b"x" * 4096 + b"</body>"
+
+
+class ProbeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    reject_ranges = False
+    status_code = 200
+    requests: list = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        type(self).requests.append((self.command, self.path, self.headers["Range"]))
+
+        if self.headers["Range"] and self.reject_ranges:
+            self.send_response(416)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.status_code != 200:
+            self.send_response(self.status_code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path.endswith(".bin"):
+            content_type, content = "application/zip", b"\0" * 1024 * 1024
+        else:
+            content_type, content = "text/html; charset=utf-8", PAGE
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if body:
+            try:
+                self.wfile.write(content)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+
+@pytest.fixture
+def probe_server(monkeypatch):
+    handler = type("Handler", (ProbeHandler,), {"requests": []})
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr("app.utils.scraper.http_client", HttpClient())
+    monkeypatch.setattr("app.utils.scraper._head_probe_hosts", set())
+
+    yield handler, f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+
+
+def test_single_ranged_get(probe_server):
+    handler, base_url = probe_server
+
+    assert scrape_title(f"{base_url}/page") == "Probed"
+    assert handler.requests == [("GET", "/page", "bytes=0-524287")]
+
+
+def test_non_html_body_is_not_read(probe_server):
+    handler, base_url = probe_server
+
+    assert scrape_title(f"{base_url}/archive.bin") == "archive.bin - " + base_url[7:]
+    assert [r[0] for r in handler.requests] == ["GET"]
+
+
+def test_head_fallback_is_remembered_per_host(probe_server):
+    handler, base_url = probe_server
+    handler.reject_ranges = True
+
+    assert scrape_title(f"{base_url}/first") == "Probed"
+    assert [r[0] for r in handler.requests] == ["GET", "HEAD", "GET"]
+    assert base_url[7:] in scraper._head_probe_hosts
+
+    handler.requests.clear()
+    assert scrape_title(f"{base_url}/second") == "Probed"
+    assert [r[0] for r in handler.requests] == ["HEAD", "GET"]
+
+
+@pytest.mark.parametrize("status_code", [404, 429, 503])
+def test_other_errors_do_not_fall_back(probe_server, status_code):
+    handler, base_url = probe_server
+    handler.status_code = status_code
+
+    # Falls back to a filename, without probing with HEAD
+    assert scrape_title(f"{base_url}/gone") == scraper.get_filename_from_url(
+        f"{base_url}/gone"
+    )
+    assert [r[0] for r in handler.requests] == ["GET"]
+    assert base_url[7:] not in scraper._head_probe_hosts
@@ -0,0 +1,133 @@
+import threading
+
+from app.constants import API_STATS
+from app.utils.tools import get_host
+from app.utils.worker_pool import DownloadPool
+
+
+def test_get_host():
+    assert get_host("https://WWW.Example.com:8080/a?b=c") == "www.example.com:8080"
+
+
+def test_per_host_limit_is_respected():
+    """A saturated host should never exceed its limit, while other hosts proceed."""
+    pool = DownloadPool(max_workers=4, per_host_limit=1)
+
+    release = threading.Event()
+    lock = threading.Lock()
+    running = {"slow.com": 0, "fast.com": 0}
+    peak = {"slow.com": 0, "fast.com": 0}
+
+    def task(host):
+        with lock:
+            running[host] += 1
+            peak[host] = max(peak[host], running[host])
+
+        if host == "slow.com":
+            release.wait(timeout=5)
+
+        with lock:
+            running[host] -= 1
+        return host
+
+    slow = [pool.submit("https://slow.com/1", task, "slow.com") for _ in range(3)]
+    fast = [pool.submit("https://fast.com/1", task, "fast.com") for _ in range(3)]
+
+    # Items from another host overtake the blocked ones
+    assert [f.result(timeout=5) for f in fast] == ["fast.com"] * 3
+
+    stats = pool.stats()
+    assert stats["active"] == 1
+    assert stats["queued"] == 2
+    assert stats["hosts"] == [{"host": "slow.com", "active": 1, "queued": 2}]
+
+    release.set()
+    assert [f.result(timeout=5) for f in slow] == ["slow.com"] * 3
+
+    assert peak == {"slow.com": 1, "fast.com": 1}
+    assert pool.stats()["completed"] == 6
+
+
+def test_failed_task_sets_exception():
+    pool = DownloadPool(max_workers=1)
+
+    def boom():
+        raise ValueError("bad")
+
+    future = pool.submit("https://a.com", boom)
+
+    assert isinstance(future.exception(timeout=5), ValueError)
+    assert pool.stats()["failed"] == 1
+
+
+def run_blocked(pool, submit):
+    """
+    Keeps the only worker of the pool busy while `submit` queues tasks, so they
+    are all picked in one go once it's released.
+    """
+    release = threading.Event()
+    order = []
+
+    blocker = pool.submit("https://block.com", release.wait, 5)
+    futures = submit(order.append)
+
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+
+    return order
+
+
+def test_higher_priority_goes_first():
+    pool = DownloadPool(max_workers=1, aging_interval=0)
+
+    order = run_blocked(
+        pool,
+        lambda record: [
+            pool.submit("https://a.com/low", record, "low"),
+            pool.submit("https://a.com/high", record, "high", priority=5),
+            pool.submit("https://a.com/low-2", record, "low-2"),
+        ],
+    )
+
+    assert order == ["high", "low", "low-2"]
+
+
+def test_waiting_tasks_age():
+    pool = DownloadPool(max_workers=1, aging_interval=10)
+
+    def submit(record):
+        old = pool.submit("https://a.com/old", record, "old")
+        # Waited for long enough to catch up with 3 priority levels
+        with pool._cond:
+            pool._pending[-1].submit_time -= 35
+
+        return [old, pool.submit("https://a.com/new", record, "new", priority=3)]
+
+    assert run_blocked(pool, submit) == ["old", "new"]
+
+
+def test_reprioritize_queued_task():
+    pool = DownloadPool(max_workers=1, aging_interval=0)
+
+    def submit(record):
+        futures = [
+            pool.submit("https://a.com/1", record, 1, item_ids=[1]),
+            pool.submit("https://a.com/2", record, 2, item_ids=[2]),
+        ]
+        assert pool.reprioritize(2, 10)
+        assert not pool.reprioritize(3, 10)
+        return futures
+
+    assert run_blocked(pool, submit) == [2, 1]
+
+
+def test_stats_endpoint(client, auth_headers):
+    res = client.get(API_STATS, headers=auth_headers)
+    assert res.status_code == 200
+
+    data = res.get_json()["data"]
+    assert data["pool"]["maxWorkers"] > 0
+    assert "utilization" in data["pool"]
+    assert data["queue"]["pending"] >= 0